@@ -0,0 +1,314 @@
+"""
+Benchmarks for command latency and acquisition throughput, run against the
+simulated devices in src.sim so no hardware is needed.
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --compare bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+from src.acquisition_process import AcquisitionProcess
+from src.hvps.hvps_api import HVPSv3
+from src.rf.rf_data_acquisition import DataAcquisition
+from src.rf.rfgenerator_control import RFGenerator
+from src.rf.sample_history import Sample
+from src.sim.hvps_sim import SimulatedHVPS, SimulatedHVPSServer
+from src.sim.vrg_sim import SimulatedVRGResource
+
+Results = dict[str, Any]
+
+
+def summarize(durations: list[float]) -> dict[str, float]:
+    """Latency distribution of a list of durations in seconds, reported in ms"""
+    ordered = sorted(durations)
+    n = len(ordered)
+
+    def percentile(p: float) -> float:
+        return ordered[min(n - 1, int(p * n))] * 1e3
+
+    return {
+        'count': n,
+        'mean_ms': statistics.fmean(ordered) * 1e3,
+        'min_ms': ordered[0] * 1e3,
+        'p50_ms': percentile(0.50),
+        'p90_ms': percentile(0.90),
+        'p99_ms': percentile(0.99),
+        'max_ms': ordered[-1] * 1e3,
+    }
+
+
+def time_calls(func: Callable[[], Any], iterations: int) -> dict[str, float]:
+    durations: list[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+
+def make_rf_generator(args: argparse.Namespace) -> RFGenerator:
+    resource = SimulatedVRGResource(latency=args.vrg_latency, baud=args.baud, seed=0)
+    return RFGenerator('SIM::VRG', 'VRG', instrument=resource)
+
+
+def bench_vrg(args: argparse.Namespace) -> Results:
+    rfg = make_rf_generator(args)
+    vrg = rfg.rf_device
+    commands: dict[str, Callable[[], Any]] = {
+        'read_frequency': vrg.read_frequency,
+        'read_power_setting': vrg.read_power_setting,
+        'read_forward_power': vrg.read_forward_power,
+        'read_reflected_power': vrg.read_reflected_power,
+        'read_absorbed_power': vrg.read_absorbed_power,
+        'read_telemetry': vrg.read_telemetry,
+        'set_rf_power': lambda: vrg.set_rf_power(500),
+        'set_freq': lambda: vrg.set_freq(40.65),
+    }
+    results = {name: time_calls(f, args.iterations) for name, f in commands.items()}
+    rfg.close()
+    return results
+
+
+def bench_hvps(args: argparse.Namespace) -> Results:
+    device = SimulatedHVPS(latency=args.hvps_latency, seed=0)
+    with SimulatedHVPSServer(device=device) as server:
+        server.start()
+        hvps = HVPSv3(server.host, str(server.port))
+        hvps.connect()
+        # One step of a six channel ramp: every set point plus all readbacks
+        ramp_step = [
+            hvps.voltage_command(channel, '1000')
+            for channel in ('BM', 'EX', 'L1', 'L2', 'L3', 'L4')
+        ] + hvps.all_channels_readback_commands()
+        commands: dict[str, Callable[[], Any]] = {
+            'get_voltage': lambda: hvps.get_voltage('BM'),
+            'get_current': lambda: hvps.get_current('BM'),
+            'set_voltage': lambda: hvps.set_voltage('BM', '1000'),
+            'get_state': hvps.get_state,
+            'read_all_channels': hvps.read_all_channels,
+            'ramp_step': lambda: hvps.send_queries(ramp_step),
+        }
+        results = {name: time_calls(f, args.iterations) for name, f in commands.items()}
+        hvps.disconnect()
+        server.stop()
+    return results
+
+
+def bench_acquisition(args: argparse.Namespace) -> Results:
+    """End-to-end samples per second with the acquisition loop running flat out"""
+    rfg = make_rf_generator(args)
+    acquisition = DataAcquisition(rfg, interval=args.acquisition_interval)
+    acquisition.start()
+    time.sleep(args.duration)
+    acquisition.stop()
+    rfg.close()
+    return {
+        'interval_s': args.acquisition_interval,
+        'duration_s': args.duration,
+        'samples': len(acquisition.history),
+        'samples_per_s': len(acquisition.history) / args.duration,
+        'timing': acquisition.get_timing_stats(),
+    }
+
+
+def sample_intervals(history) -> dict[str, float]:
+    timestamps = history.last(len(history))['timestamp'].tolist()
+    return summarize([b - a for a, b in itertools.pairwise(timestamps)])
+
+
+def bench_isolation(args: argparse.Namespace) -> Results:
+    """
+    Time between RF samples while this process is busy holding the GIL, with the
+    acquisition on a thread here and in a worker process
+    """
+    interval = 0.1
+
+    def hog_gil() -> None:
+        end = time.perf_counter() + args.duration
+        while time.perf_counter() < end:
+            sum(range(10000))
+
+    rfg = RFGenerator('SIM::VRG', 'VRGSim')
+    acquisition = DataAcquisition(rfg, interval=interval)
+    acquisition.start(enable_rf=False)
+    hog_gil()
+    acquisition.stop()
+    rfg.close()
+
+    process = AcquisitionProcess('SIM::VRG', 'VRGSim', rf_interval=interval, quiet=True)
+    process.start()
+    hog_gil()
+    results = {
+        'interval_ms': interval * 1e3,
+        'thread': sample_intervals(acquisition.history),
+        'process': sample_intervals(process.history),
+    }
+    process.stop()
+    return results
+
+
+def bench_dispatch(args: argparse.Namespace) -> Results:
+    """Set point latency through RFGenerator while acquisition polls flat out"""
+    rfg = make_rf_generator(args)
+    acquisition = DataAcquisition(rfg, interval=args.acquisition_interval)
+    acquisition.start()
+
+    setpoints: list[float] = []
+    while len(setpoints) < args.iterations:
+        time.sleep(0.01)
+        start = time.perf_counter()
+        rfg.set_power(500).result()
+        setpoints.append(time.perf_counter() - start)
+
+    acquisition.stop()
+    rfg.close()
+    return {'set_power': summarize(setpoints)}
+
+
+def bench_gui(args: argparse.Namespace) -> Results:
+    """Startup time and the cost of MainWindow.update_display including its repaint"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PySide6.QtWidgets import QApplication
+
+        from src.gui.main_window import MainWindow
+    except ImportError as e:
+        return {'skipped': f'PySide6 not available: {e}'}
+
+    app = QApplication.instance() or QApplication([])
+    # Devices connect in the background, so this is the time until the window shows
+    start = time.perf_counter()
+    window = MainWindow(version='benchmark')
+    window.show()
+    app.processEvents()
+    startup = time.perf_counter() - start
+
+    sample = Sample(time.time(), 300.0, 3.0, 297.0, 34.0)
+    changed = sample._replace(forward_power=310.0, reflected_power=4.0)
+
+    def refresh(s: Sample) -> Callable[[], None]:
+        def run() -> None:
+            window.update_display(s)
+            app.processEvents()
+
+        return run
+
+    # Alternate between two readings so every call changes the text, then repeat
+    # one reading to measure the cost of a sample that changes nothing.
+    flip = itertools.cycle((refresh(sample), refresh(changed)))
+    results = {
+        'startup': summarize([startup]),
+        'update_display': time_calls(lambda: next(flip)(), args.iterations),
+        'update_display_unchanged': time_calls(refresh(sample), args.iterations),
+    }
+
+    # Let the background device connections finish before tearing down
+    deadline = time.monotonic() + 10
+    while window._connecting and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    if window.data_acquisition is not None:
+        window.data_acquisition.stop()
+    window.hide()
+    return results
+
+
+BENCHMARKS: dict[str, Callable[[argparse.Namespace], Results]] = {
+    'vrg': bench_vrg,
+    'hvps': bench_hvps,
+    'acquisition': bench_acquisition,
+    'dispatch': bench_dispatch,
+    'isolation': bench_isolation,
+    'gui': bench_gui,
+}
+
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Results, baseline: Results, path: str = '') -> None:
+    """Prints the change of every *_ms and *_per_s figure between two result sets"""
+    for key, value in current.items():
+        name = f'{path}.{key}' if path else key
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            compare(value, old or {}, name)
+        elif (
+            isinstance(value, (int, float))
+            and isinstance(old, (int, float))
+            and old
+            and key.endswith(('_ms', '_per_s'))
+        ):
+            change = (value - old) / old * 100
+            print(f'{name:60} {old:12.3f} -> {value:12.3f} ({change:+.1f}%)')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        'benchmarks', nargs='*', help=f'any of {", ".join(BENCHMARKS)} (default all)'
+    )
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds')
+    parser.add_argument('--vrg-latency', type=float, default=0.001, help='seconds')
+    parser.add_argument('--hvps-latency', type=float, default=0.0005, help='seconds')
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--acquisition-interval', type=float, default=0.001)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results to compare against')
+    args = parser.parse_args()
+
+    selected = args.benchmarks or list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f'unknown benchmarks: {", ".join(sorted(unknown))}')
+    results: Results = {
+        'meta': {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'settings': {k: v for k, v in vars(args).items() if k != 'benchmarks'},
+        }
+    }
+    for name in selected:
+        print(f'Running {name} benchmark...', file=sys.stderr)
+        with contextlib.redirect_stdout(io.StringIO()):  # drivers print every reply
+            results[name] = BENCHMARKS[name](args)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        compare({k: v for k, v in results.items() if k != 'meta'}, baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,68 @@
+import argparse
 import sys
 from typing import NoReturn
 
-from PySide6.QtWidgets import QApplication
-
-# from src.gui.main_window import MainWindow
-from src.gui.main_window import MainWindow
+VERSION = '1.0.0'
 
 
 def run_app() -> NoReturn:
-    version = '1.0.0'
+    # Qt is only imported here so the headless daemon runs without it
+    from PySide6.QtWidgets import QApplication
+
+    # from src.gui.main_window import MainWindow
+    from src.gui.main_window import MainWindow
+
+    version = VERSION
     app = QApplication([])
     window = MainWindow(version=version)  # Create the main window from main_window.py
     window.show()  # Show the window
     sys.exit(app.exec())  # Start the application's event loop
 
 
+def run_overview(ini_file: str = 'hyperionTestStandControl.ini') -> NoReturn:
+    """Monitors every test stand in the ini file from one window"""
+    from PySide6.QtWidgets import QApplication
+
+    from src.device_cache import DEFAULT_CACHE_FILE, DeviceCache
+    from src.gui.overview_window import OverviewWindow
+    from src.ini_reader import find_cache_file, find_stand_poll_interval, load_config
+    from src.stands import StandManager
+
+    app = QApplication([])
+    config_data = load_config(ini_file)
+    manager = StandManager(
+        config_data,
+        poll_interval=find_stand_poll_interval(config_data, 'Stands'),
+        cache=DeviceCache(find_cache_file(config_data, 'Cache') or DEFAULT_CACHE_FILE),
+    )
+    window = OverviewWindow(manager, version=VERSION)
+    window.show()
+    manager.start()
+    sys.exit(app.exec())
+
+
+def run_headless(ini_file: str = 'hyperionTestStandControl.ini') -> None:
+    """Acquires without a GUI and serves the samples, see [Daemon] in the ini file"""
+    from src.daemon import run_daemon
+
+    run_daemon(ini_file)
+
+
 if __name__ == '__main__':
-    run_app()
+    parser = argparse.ArgumentParser(description='Hyperion test stand control')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        '--overview', action='store_true', help='monitor every configured test stand'
+    )
+    mode.add_argument(
+        '--headless',
+        action='store_true',
+        help='acquire and serve samples without a GUI',
+    )
+    args = parser.parse_args()
+    if args.overview:
+        run_overview()
+    elif args.headless:
+        run_headless()
+    else:
+        run_app()
@@ -0,0 +1,490 @@
+import itertools
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from types import SimpleNamespace
+from typing import Any
+
+from .deadline_timer import DeadlineTimer
+from .instrumentation import METRICS
+from .rf.sample_history import Sample
+from .rf.shared_history import SharedSampleHistory
+
+HVPS_CHANNELS = ('BM', 'EX', 'L1', 'L2', 'L3', 'L4', 'SL')
+METRICS_INTERVAL = 1.0  # seconds between the worker's METRICS snapshots
+
+
+def hvps_fields(channels: tuple[str, ...]) -> tuple[str, ...]:
+    """HVPS history fields: timestamp, then voltage and current of every channel"""
+    return (
+        'timestamp',
+        *(f'{channel}_{quantity}' for channel in channels for quantity in ('V', 'I')),
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class WorkerSettings:
+    """Everything the worker process needs, passed to it when it starts"""
+
+    resource_name: str
+    rf_device_type: str
+    rf_interval: float  # seconds
+    rf_history: str  # shared memory name
+    hvps_ip: str | None = None
+    hvps_port: str | None = None
+    hvps_channels: tuple[str, ...] = HVPS_CHANNELS
+    hvps_interval: float = 0.5  # seconds
+    hvps_history: str | None = None  # shared memory name
+    quiet: bool = False  # discard the worker's output, e.g. every device reply
+    cache_file: str | None = None  # DeviceCache of the RF generator's identity
+    rf_rates: dict[str, tuple[float, int]] | None = None  # see find_poll_rates
+    metrics: bool = False  # METRICS.enabled when the worker starts
+
+
+class AcquisitionProcess:
+    """
+    Runs the RF generator acquisition, and optionally HVPS polling, in a separate
+    process so that work in this process (Qt rendering, analysis) cannot delay the
+    sampling by holding the GIL.
+
+    The worker appends to `history` and `hvps_history`, SharedSampleHistory rings
+    that this process reads without copying, e.g. by handing `history` to a
+    StripChart. Device commands go to the worker over a pipe with `submit`, which
+    returns a Future for the result. The RF output is not switched on by starting.
+    While METRICS is enabled the worker sends its snapshot back every second,
+    added to this process's METRICS under 'worker'.
+    """
+
+    def __init__(
+        self,
+        resource_name: str,
+        rf_device_type: str,
+        rf_interval: float = 1.0,
+        hvps_address: tuple[str, str] | None = None,
+        hvps_channels: tuple[str, ...] = HVPS_CHANNELS,
+        hvps_interval: float = 0.5,
+        capacity: int = 86400,
+        quiet: bool = False,
+        cache_file: str | os.PathLike | None = None,
+        rf_rates: dict[str, tuple[float, int]] | None = None,
+    ) -> None:
+        """
+        :param resource_name: VISA resource of the RF generator.
+        :param rf_device_type: RF generator type, see RFGenerator.
+        :param rf_interval: Seconds between RF samples.
+        :param hvps_address: IP address and port of the HVPS, None to not poll it. An HVPS that does not answer leaves the RF acquisition running, with the error in info['hvps'].
+        :param hvps_channels: Channels installed in the HVPS.
+        :param hvps_interval: Seconds between HVPS readings.
+        :param capacity: Number of samples kept in each history.
+        :param quiet: Discard what the worker prints, the drivers print every reply.
+        :param cache_file: DeviceCache file, so the worker skips identifying a known RF generator.
+        :param rf_rates: Rate and priority per RF signal, see DataAcquisition.
+        """
+        self.history = SharedSampleHistory(capacity)
+        self.hvps_history: SharedSampleHistory | None = None
+        if hvps_address is not None:
+            self.hvps_history = SharedSampleHistory(
+                capacity, hvps_fields(hvps_channels)
+            )
+        self.settings = WorkerSettings(
+            resource_name,
+            rf_device_type,
+            rf_interval,
+            self.history.name,
+            *(hvps_address or (None, None)),
+            hvps_channels,
+            hvps_interval,
+            self.hvps_history.name if self.hvps_history is not None else None,
+            quiet=quiet,
+            cache_file=os.fspath(cache_file) if cache_file is not None else None,
+            rf_rates=rf_rates,
+            metrics=METRICS.enabled,
+        )
+        # A fresh interpreter, nothing of this process (Qt in particular) is copied
+        context = multiprocessing.get_context('spawn')
+        self._conn, self._child_conn = context.Pipe()
+        self.process = context.Process(
+            target=run_worker,
+            args=(self.settings, self._child_conn),
+            name='AcquisitionProcess',
+            daemon=True,
+        )
+        self.info: dict[str, Any] = {}
+        self._futures: dict[int, Future] = {}
+        self._futures_lock = threading.Lock()  # submit and the receiver both change it
+        self._receiving = False  # True while the receiver can still answer commands
+        self._ids = itertools.count()
+        self._send_lock = threading.Lock()
+        self._receiver: threading.Thread | None = None
+
+    def start(self, timeout: float = 30.0) -> dict[str, Any]:
+        """
+        Starts the worker and waits until its devices are connected. Returns the
+        device information the worker reported, e.g. the VRG serial number.
+        """
+        self.process.start()
+        self._child_conn.close()
+        if not self._conn.poll(timeout):
+            self.process.kill()
+            self.stop()
+            raise TimeoutError(f'Acquisition process did not start in {timeout} s')
+        status, self.info = self._conn.recv()
+        if status != 'ready':
+            self.stop()
+            raise ConnectionError(f'Acquisition process failed to start: {self.info}')
+        if 'error' in self.info.get('hvps', {}):
+            print(f'HVPS not polled: {self.info["hvps"]["error"]}')
+        self._receiving = True
+        self._receiver = threading.Thread(
+            target=self._receive, name='AcquisitionProcess', daemon=True
+        )
+        self._receiver.start()
+        METRICS.add_listener(self._on_metrics_change)
+        if METRICS.enabled != self.settings.metrics:  # changed while starting
+            self._on_metrics_change('enabled' if METRICS.enabled else 'disabled')
+        return self.info
+
+    def _on_metrics_change(self, event: str) -> None:
+        if event == 'reset':
+            self.submit('metrics', 'reset')
+        else:
+            self.submit('metrics', 'set_enabled', event == 'enabled')
+
+    def submit(self, device: str, method: str, *args: Any) -> Future:
+        """
+        Calls `method` of the worker's 'rf' (RFGenerator), 'hvps' (HVPSv3) or
+        'acquisition' (DataAcquisition) object, e.g. submit('rf', 'set_power', 500),
+        and returns a Future for the result. The Future fails with ConnectionError
+        if the worker is not running.
+        """
+        future: Future = Future()
+        with self._futures_lock:
+            if not self._receiving:
+                future.set_exception(
+                    ConnectionError('Acquisition process is not running')
+                )
+                return future
+            command_id = next(self._ids)
+            self._futures[command_id] = future
+        try:
+            with self._send_lock:
+                self._conn.send((command_id, device, method, args))
+        except (OSError, ValueError) as e:
+            with self._futures_lock:
+                # Unless the receiver already failed it on its way out
+                pending = self._futures.pop(command_id, None)
+            if pending is not None:
+                future.set_exception(
+                    ConnectionError(f'Acquisition process is gone: {e}')
+                )
+        return future
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                command_id, ok, value = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            if command_id is None:  # not a reply, the worker's METRICS snapshot
+                METRICS.update_remote('worker', value)
+                continue
+            with self._futures_lock:
+                future = self._futures.pop(command_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+        # The worker exited; nothing still waiting will be answered, and nothing
+        # submitted from now on either
+        with self._futures_lock:
+            self._receiving = False
+            pending, self._futures = self._futures, {}
+        for future in pending.values():
+            future.set_exception(ConnectionError('Acquisition process exited'))
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stops the worker and releases the shared histories"""
+        METRICS.remove_listener(self._on_metrics_change)
+        if self.process.is_alive():
+            try:
+                with self._send_lock:
+                    self._conn.send(None)
+            except OSError:
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        if self._receiver is not None:
+            self._receiver.join(timeout)
+        self._conn.close()
+        self.history.close()
+        if self.hvps_history is not None:
+            self.hvps_history.close()
+
+
+class RemoteRFGenerator:
+    """
+    Stands in for RFGenerator when the generator belongs to an AcquisitionProcess.
+    The controls are forwarded to the worker and return Futures like RFGenerator's;
+    `rf_device` only holds the identity and limits the worker reported at start.
+    """
+
+    def __init__(self, process: AcquisitionProcess) -> None:
+        self.process = process
+        self.rf_device = SimpleNamespace(**process.info['rf'])
+        self.enabled = False
+
+    def enable(self) -> Future:
+        return self._switch('enable', True)
+
+    def disable(self) -> Future:
+        return self._switch('disable', False)
+
+    def _switch(self, method: str, enabled: bool) -> Future:
+        def update(future: Future) -> None:
+            if not future.cancelled() and future.exception() is None:
+                self.enabled = enabled
+
+        future = self.process.submit('rf', method)
+        future.add_done_callback(update)
+        return future
+
+    def set_power(self, power: int) -> Future:
+        return self.process.submit('rf', 'set_power', power)
+
+    def set_frequency(self, freq: float) -> Future:
+        return self.process.submit('rf', 'set_frequency', freq)
+
+    def auto_tune(self) -> Future:
+        return self.process.submit('rf', 'auto_tune')
+
+    def narrow_auto_tune(self) -> Future:
+        return self.process.submit('rf', 'narrow_auto_tune')
+
+    def close(self) -> None:
+        """Stops the worker, which closes the RF generator"""
+        self.process.stop()
+
+
+class RemoteAcquisition:
+    """
+    The DataAcquisition interface for an AcquisitionProcess. The worker takes the
+    samples; a thread here only passes the ones it appended to the shared history
+    on to the listeners, so a busy GUI delays when a sample is shown but not when
+    it is taken.
+    """
+
+    def __init__(
+        self, rf_generator: RemoteRFGenerator, poll_interval: float = 0.02
+    ) -> None:
+        """
+        :param rf_generator: The RF generator of the AcquisitionProcess.
+        :param poll_interval: Seconds between checks of the history for new samples.
+        """
+        self.rf_generator = rf_generator
+        self.process = rf_generator.process
+        self.history = self.process.history
+        self.interval: float = self.process.settings.rf_interval
+        self.running: bool = False
+        self.listeners: list[Callable[[Sample], None]] = []
+        self.thread = None
+        self.timer = DeadlineTimer(poll_interval)
+        self._stop_event = threading.Event()
+
+    def start(self, enable_rf: bool = True) -> None:
+        """
+        Start passing new samples to the listeners.
+
+        :param enable_rf: Also turn the RF output on. Monitoring-only users pass False.
+        """
+        if not self.running:
+            self.running = True
+            self._stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name='RemoteAcquisition')
+            self.thread.start()
+            if enable_rf:
+                self.rf_generator.enable()
+
+    def stop(self) -> None:
+        self.running = False
+        self._stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def add_listener(self, callback: Callable[[Sample], None]) -> None:
+        """Register a callback that is passed every new sample, see DataAcquisition"""
+        self.listeners = [*self.listeners, callback]
+
+    def remove_listener(self, callback: Callable[[Sample], None]) -> None:
+        self.listeners = [c for c in self.listeners if c != callback]
+
+    def set_interval(self, interval: float) -> Future:
+        """Change the time between the worker's data fetches"""
+        self.interval = interval
+        return self.process.submit('acquisition', 'set_interval', interval)
+
+    def _run(self) -> None:
+        newest = time.time()  # only samples taken from now on are passed on
+        self.timer.start()
+        while self.running:
+            if not self.timer.wait(self._stop_event):
+                break
+            # Copied out at once, the worker keeps appending to the shared buffers
+            data = self.history.since(newest)
+            start = (
+                1 if len(data['timestamp']) and data['timestamp'][0] == newest else 0
+            )
+            columns = [data[field][start:].tolist() for field in self.history.fields]
+            del data
+            if not columns[0]:
+                continue
+            newest = columns[0][-1]
+            for values in zip(*columns, strict=True):
+                sample = Sample(*values)
+                for callback in self.listeners:
+                    try:
+                        callback(sample)
+                    except Exception:  # noqa: BLE001 - one listener must not stop the rest
+                        traceback.print_exc()
+
+
+def run_worker(settings: WorkerSettings, conn: Connection) -> None:
+    """Entry point of the worker process"""
+    if settings.quiet:
+        sys.stdout = open(os.devnull, 'w')  # noqa: SIM115 - for the life of the process
+    from .device_cache import DeviceCache
+    from .hvps.hvps_api import HVPSv3
+    from .rf.rf_data_acquisition import DataAcquisition
+    from .rf.rfgenerator_control import RFGenerator
+
+    rf_history = SharedSampleHistory.attach(settings.rf_history)
+    hvps_history = None
+    rfg = None
+    hvps = None
+    acquisition = None
+    stop_event = threading.Event()
+    hvps_thread = None
+    METRICS.enabled = settings.metrics
+    try:
+        cache = DeviceCache(settings.cache_file) if settings.cache_file else None
+        rfg = RFGenerator(settings.resource_name, settings.rf_device_type, cache=cache)
+        vrg = rfg.rf_device
+        info: dict[str, Any] = {
+            'rf': {
+                'serial_number': vrg.serial_number,
+                'min_tune_freq': vrg.min_tune_freq,
+                'max_tune_freq': vrg.max_tune_freq,
+                'max_power_setting': vrg.max_power_setting,
+            }
+        }
+    except Exception as e:  # noqa: BLE001 - reported to the parent, which raises it
+        traceback.print_exc()
+        conn.send(('failed', f'{type(e).__name__}: {e}'))
+        if rfg is not None:
+            rfg.close()
+        rf_history.close()
+        return
+
+    if settings.hvps_ip is not None:
+        hvps = HVPSv3(
+            settings.hvps_ip,
+            settings.hvps_port,
+            occupied_channels=settings.hvps_channels,
+        )
+        hvps.connect()
+        if hvps.sock is None:
+            # The RF acquisition runs without it, as the GUI does without an HVPS
+            info['hvps'] = {
+                'error': f'No answer from {settings.hvps_ip}:{settings.hvps_port}'
+            }
+            hvps = None
+        else:
+            hvps_history = SharedSampleHistory.attach(
+                settings.hvps_history, hvps_fields(settings.hvps_channels)
+            )
+            info['hvps'] = {'channels': settings.hvps_channels}
+
+    acquisition = DataAcquisition(
+        rfg, settings.rf_interval, history=rf_history, rates=settings.rf_rates
+    )
+    acquisition.start(enable_rf=False)
+    if hvps is not None:
+        hvps_thread = threading.Thread(
+            target=_poll_hvps,
+            args=(hvps, hvps_history, settings.hvps_interval, stop_event),
+            name='HVPSPoll',
+        )
+        hvps_thread.start()
+    conn.send(('ready', info))
+
+    devices = {'rf': rfg, 'hvps': hvps, 'acquisition': acquisition, 'metrics': METRICS}
+    metrics_due = time.monotonic() + METRICS_INTERVAL
+    try:
+        while True:
+            try:
+                wait = metrics_due - time.monotonic()
+                if wait <= 0:
+                    metrics_due = time.monotonic() + METRICS_INTERVAL
+                    if METRICS.enabled:
+                        conn.send((None, True, METRICS.snapshot()))
+                    continue
+                if not conn.poll(wait):
+                    continue
+                message = conn.recv()
+            except EOFError:
+                break  # the parent exited
+            if message is None:
+                break
+            command_id, device, method, args = message
+            try:
+                if method.startswith('_') or devices.get(device) is None:
+                    raise ValueError(f'Unknown command {device}.{method}')
+                result = getattr(devices[device], method)(*args)
+                if isinstance(result, Future):
+                    result = result.result()
+                reply = (command_id, True, result)
+            except Exception as e:  # noqa: BLE001 - the caller's Future fails with it
+                reply = (command_id, False, f'{type(e).__name__}: {e}')
+            conn.send(reply)
+    finally:
+        stop_event.set()
+        acquisition.stop()
+        if hvps_thread is not None:
+            hvps_thread.join()
+            hvps.disconnect()
+            hvps_history.close()
+        rfg.close()
+        rf_history.close()
+
+
+def _poll_hvps(
+    hvps,
+    history: SharedSampleHistory,
+    interval: float,
+    stop_event: threading.Event,
+) -> None:
+    timer = DeadlineTimer(interval)
+    timer.start()
+    while timer.wait(stop_event):
+        try:
+            readings = hvps.read_all_channels()
+        except ConnectionError as e:
+            print(f'HVPS poll failed: {e}')
+            continue
+        row = [time.time()]
+        for channel in hvps.occupied_channels:
+            reading = readings.get(channel)
+            row.append(reading.voltage if reading else math.nan)
+            row.append(reading.current if reading else math.nan)
+        history.append(row)
@@ -0,0 +1,123 @@
+import heapq
+import itertools
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from enum import IntEnum
+from typing import TypeVar
+
+from .instrumentation import METRICS
+
+T = TypeVar('T')
+
+
+class Priority(IntEnum):
+    """Lower values are sent to the device first"""
+
+    CONTROL = 0  # enable/disable, set points, autotune
+    TELEMETRY = 1  # periodic readings
+
+
+class CommandDispatcher:
+    """
+    Per-device command queue served by a single I/O worker.
+
+    Commands are run one at a time in priority order, FIFO within a priority, so a
+    set point submitted while telemetry reads are queued only waits for the command
+    already on the wire. Every submission returns a Future.
+
+    By default the dispatcher owns a one-thread executor. Passing a shared executor
+    lets many devices share a bounded pool; commands for one device still never run
+    concurrently.
+    """
+
+    def __init__(self, name: str, executor: Executor | None = None) -> None:
+        self.name = name
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(1, thread_name_prefix=name)
+        self._queue: list[tuple[int, int, float, Callable, tuple, dict, Future]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._draining = False
+        self._closed = False
+        self._worker: threading.Thread | None = None  # thread running _drain
+
+    def submit(
+        self,
+        func: Callable[..., T],
+        *args,
+        priority: Priority = Priority.TELEMETRY,
+        **kwargs,
+    ) -> 'Future[T]':
+        """Queues `func(*args, **kwargs)` and returns a Future for its result"""
+        future: Future[T] = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f'{self.name} command dispatcher is shut down')
+            entry = (
+                priority,
+                next(self._sequence),
+                time.perf_counter(),
+                func,
+                args,
+                kwargs,
+                future,
+            )
+            heapq.heappush(self._queue, entry)
+            if not self._draining:
+                self._draining = True
+                self._executor.submit(self._drain)
+        return future
+
+    def call(
+        self,
+        func: Callable[..., T],
+        *args,
+        priority: Priority = Priority.TELEMETRY,
+        **kwargs,
+    ) -> T:
+        """Runs `func` through the queue and waits for its result"""
+        if threading.current_thread() is self._worker:
+            return func(*args, **kwargs)  # already on the I/O worker
+        return self.submit(func, *args, priority=priority, **kwargs).result()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def _drain(self) -> None:
+        self._worker = threading.current_thread()
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._draining = False
+                    self._worker = None
+                    return
+                priority, _, queued_at, func, args, kwargs, future = heapq.heappop(
+                    self._queue
+                )
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            METRICS.record_latency(
+                f'{self.name}.wait.{priority.name.lower()}', started - queued_at
+            )
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:  # noqa: BLE001 - handed to the caller's Future
+                print(f'{self.name}: {getattr(func, "__name__", func)} failed: {e}')
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            METRICS.record_latency(
+                f'{self.name}.service', time.perf_counter() - started
+            )
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops accepting commands. Queued commands still run."""
+        with self._lock:
+            self._closed = True
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait)
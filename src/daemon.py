@@ -0,0 +1,125 @@
+import math
+import signal
+import threading
+from typing import Any
+
+from .device_cache import DEFAULT_CACHE_FILE, DeviceCache
+from .hvps.hvps_api import ChannelReading, HVPSv3
+from .ini_reader import (
+    find_cache_file,
+    find_comport_device,
+    find_daemon_settings,
+    find_IP_device,
+    find_poll_rates,
+    load_config,
+)
+from .poll_scheduler import (
+    DEFAULT_POLL_RATES,
+    RF_SIGNALS,
+    PollScheduler,
+    add_hvps_signals,
+)
+from .rf.rf_data_acquisition import DataAcquisition
+from .rf.rfgenerator_control import RFGenerator
+from .rf.sample_history import Sample
+from .sample_server import SampleServer
+
+
+def _number(value: float) -> float | None:
+    # JSON has no NaN
+    return None if math.isnan(value) else value
+
+
+def rf_message(sample: Sample) -> dict[str, Any]:
+    return {'type': 'rf', **sample._asdict()}
+
+
+def hvps_message(name: str, timestamp: float, value: Any) -> dict[str, Any]:
+    if isinstance(value, ChannelReading):
+        return {
+            'type': 'hvps_channel',
+            'timestamp': timestamp,
+            'channel': value.channel,
+            'voltage': _number(value.voltage),
+            'current': _number(value.current),
+            'error': value.error,
+        }
+    return {'type': name, 'timestamp': timestamp, 'value': value}
+
+
+def run_daemon(ini_file: str = 'hyperionTestStandControl.ini') -> None:
+    """
+    Runs RF acquisition and HVPS polling without a GUI and serves every reading
+    through a SampleServer until interrupted. Both devices are read by one
+    PollScheduler at the rates of the [Acquisition] section. The RF output is not
+    switched on.
+    """
+    config_data = load_config(ini_file)
+    host, port, path, interval = find_daemon_settings(config_data, 'Daemon')
+    server = SampleServer(host, port, path)
+    stop_event = threading.Event()
+    rfg: RFGenerator | None = None
+    hvps: HVPSv3 | None = None
+    data_acquisition: DataAcquisition | None = None
+    scheduler = PollScheduler()
+    rates = find_poll_rates(config_data, 'Acquisition')
+
+    def request_stop(signum, frame) -> None:
+        stop_event.set()
+
+    def publish_hvps(name: str, timestamp: float, value: Any) -> None:
+        # The RF signals are published as samples by DataAcquisition
+        if name not in RF_SIGNALS:
+            server.publish(hvps_message(name, timestamp, value))
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    server.start()
+    print(f'Serving samples on {server.address}')
+    try:
+        # Either device may be missing; the other one is still served
+        if config_data.has_section('RFGenerator'):
+            rf_device, com_port = find_comport_device(config_data, 'RFGenerator')
+            cache = DeviceCache(
+                find_cache_file(config_data, 'Cache') or DEFAULT_CACHE_FILE
+            )
+            try:
+                rfg = RFGenerator(f'ASRL{com_port}::INSTR', rf_device, cache=cache)
+            except Exception as e:  # noqa: BLE001 - pyvisa raises several types
+                print(f'RF generator not connected ({e}), serving HVPS samples only')
+            else:
+                data_acquisition = DataAcquisition(
+                    rfg, interval, rates=rates, scheduler=scheduler
+                )
+                data_acquisition.add_listener(
+                    lambda sample: server.publish(rf_message(sample))
+                )
+                data_acquisition.start(enable_rf=False)
+
+        if config_data.has_section('HVPS'):
+            _, ip, hvps_port = find_IP_device(config_data, 'HVPS')
+            hvps = HVPSv3(ip, hvps_port)
+            hvps.connect()
+            if hvps.sock is None:
+                print('HVPS not connected, serving RF samples only')
+                hvps = None
+            else:
+                add_hvps_signals(scheduler, hvps, DEFAULT_POLL_RATES | rates)
+                scheduler.add_listener(publish_hvps)
+
+        if rfg is None and hvps is None:
+            print('No device connected, nothing to serve')
+            return
+        scheduler.start()
+        stop_event.wait()
+    finally:
+        print('Stopping')
+        scheduler.stop()
+        if data_acquisition is not None:
+            data_acquisition.stop()
+        if rfg is not None:
+            rfg.close()
+        if hvps is not None:
+            hvps.disconnect()
+        server.stop()
@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class DeadlineTimer:
+    """
+    Periodic timer that wakes on a fixed grid of monotonic deadlines.
+
+    Deadlines are start + k * interval, so time spent doing work between ticks does
+    not stretch the period. If the work overruns by one or more whole periods the
+    missed deadlines are skipped rather than fired back-to-back, and the grid is kept.
+    """
+
+    def __init__(self, interval: float) -> None:
+        if interval <= 0:
+            raise ValueError(f'interval must be positive, got {interval}')
+        self.interval = interval
+        self._deadline = 0.0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.ticks: int = 0
+        self.overruns: int = 0  # ticks that found one or more deadlines already missed
+        self.missed_deadlines: int = 0  # deadlines skipped because of overruns
+        self.last_jitter: float = 0.0  # seconds between a deadline and the wake-up
+        self.max_jitter: float = 0.0
+        self._total_jitter: float = 0.0
+
+    def start(self, first_deadline: float | None = None) -> None:
+        """Starts the grid at `first_deadline` (a time.monotonic value), default now"""
+        self._deadline = time.monotonic() if first_deadline is None else first_deadline
+
+    def set_interval(self, interval: float) -> None:
+        """Changes the period, starting a new grid from the next deadline"""
+        if interval <= 0:
+            raise ValueError(f'interval must be positive, got {interval}')
+        self._deadline += interval - self.interval
+        self.interval = interval
+
+    def wait(self, stop_event: threading.Event) -> bool:
+        """
+        Blocks until the next deadline. Returns False if `stop_event` was set while
+        waiting, True when the caller should do its periodic work.
+        """
+        now = time.monotonic()
+        lateness = now - self._deadline
+        if lateness >= self.interval:
+            missed = int(lateness // self.interval)
+            self.overruns += 1
+            self.missed_deadlines += missed
+            self._deadline += missed * self.interval
+        elif lateness < 0:
+            if stop_event.wait(-lateness):
+                return False
+            now = time.monotonic()
+
+        jitter = now - self._deadline
+        self.ticks += 1
+        self.last_jitter = jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+        self._total_jitter += jitter
+        self._deadline += self.interval
+        return not stop_event.is_set()
+
+    def stats(self) -> dict[str, float | int]:
+        return {
+            'interval': self.interval,
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'missed_deadlines': self.missed_deadlines,
+            'last_jitter': self.last_jitter,
+            'max_jitter': self.max_jitter,
+            'mean_jitter': self._total_jitter / self.ticks if self.ticks else 0.0,
+        }
@@ -0,0 +1,56 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+DEFAULT_CACHE_FILE = 'device_cache.json'
+
+
+class DeviceCache:
+    """
+    JSON file of device identity and capabilities, keyed by device type and serial
+    number, e.g. "VRG:607".
+
+    Each entry records the device's reboot counter when it was stored. `get` only
+    returns an entry while the counter is unchanged, so anything a device may
+    change across a restart (a firmware update, new limits) is read fresh after the
+    device has been power cycled.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_CACHE_FILE) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] = {}
+        try:
+            with self.path.open() as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f'Ignoring unreadable device cache {self.path}: {e}')
+
+    def get(self, key: str, reboots: int) -> dict[str, Any] | None:
+        """Returns the stored entry, or None if missing or the device has rebooted"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry.get('reboots') != reboots:
+            return None
+        return dict(entry)
+
+    def put(self, key: str, reboots: int, entry: dict[str, Any]) -> None:
+        """Stores an entry and rewrites the cache file"""
+        with self._lock:
+            self._entries[key] = {**entry, 'reboots': reboots}
+            try:
+                self._save()
+            except OSError as e:
+                print(f'Could not write device cache {self.path}: {e}')
+
+    def _save(self) -> None:
+        # Write a temporary file and rename it so a crash never leaves half a file
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_name(self.path.name + '.tmp')
+        with temp.open('w') as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(temp, self.path)
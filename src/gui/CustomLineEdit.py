@@ -38,6 +38,13 @@ class CustomLineEdit(QLineEdit):
         self.power_double_validator = power_double_validator
         self.freq_double_validator = freq_double_validator
 
+    def set_limits(self, minimum: float, maximum: float) -> None:
+        """Sets the accepted range, e.g. the tune range reported by the RF generator"""
+        if self.name == 'freq':
+            self.freq_double_validator.setRange(minimum, maximum, 3)
+        elif self.name == 'power':
+            self.power_double_validator.setRange(minimum, maximum, 3)
+
     # Currently this does nothing useful but, if self.clear() is uncommented the entry box will clear when selected.
     def focusInEvent(self, arg__1: QFocusEvent) -> None:
         self.last_input = self.text()  # Store the current text when focused
@@ -0,0 +1,29 @@
+from concurrent.futures import Future
+
+from PySide6.QtCore import QObject, Signal
+
+
+class CommandBridge(QObject):
+    """
+    Delivers the outcome of device commands running on an I/O worker back to the
+    GUI thread as Qt signals, so widgets never wait on the device.
+    """
+
+    finished = Signal(str)  # command name
+    failed = Signal(str, str)  # command name, error message
+
+    def watch(self, name: str, future: Future) -> Future:
+        """Emits `finished` or `failed` on the GUI thread when `future` completes"""
+        future.add_done_callback(lambda f: self._on_done(name, f))
+        return future
+
+    def _on_done(self, name: str, future: Future) -> None:
+        # Runs on the worker thread; queued signals carry the result to the GUI.
+        if future.cancelled():
+            self.failed.emit(name, 'cancelled')
+            return
+        error = future.exception()
+        if error is not None:
+            self.failed.emit(name, str(error))
+        else:
+            self.finished.emit(name)
@@ -1,8 +1,11 @@
+import math
 import sys
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
-from PySide6.QtCore import QEvent, QObject, Qt, QTimer
-from PySide6.QtGui import QIcon, QMouseEvent
+from PySide6.QtCore import QEvent, QObject, Qt, QTimer, Signal
+from PySide6.QtGui import QAction, QIcon, QMouseEvent
 from PySide6.QtWidgets import (
     QApplication,
     QCheckBox,
@@ -17,17 +20,47 @@ from PySide6.QtWidgets import (
 
 from helpers.helpers import get_root_dir
 
-from ..ini_reader import find_comport_device, load_config
+from ..acquisition_process import (
+    AcquisitionProcess,
+    RemoteAcquisition,
+    RemoteRFGenerator,
+)
+from ..device_cache import DEFAULT_CACHE_FILE, DeviceCache
+from ..hvps.hvps_api import HVPSv3
+from ..ini_reader import (
+    find_cache_file,
+    find_comport_device,
+    find_IP_device,
+    find_poll_rates,
+    find_run_log_settings,
+    find_worker_process,
+    load_config,
+)
+from ..rf.autotune import Autotune, AutotuneResult
 from ..rf.rf_data_acquisition import DataAcquisition
 from ..rf.rfgenerator_control import RFGenerator
+from ..rf.sample_history import FIELDS, Sample
+from ..run_logger import RunLogger
+from ..setpoints import RFSetpoints
+from .command_bridge import CommandBridge
 from .CustomLineEdit import CustomLineEdit
+from .sample_bridge import SampleBridge
+from .stats_window import StatsWindow
+from .strip_chart import StripChart
+
+# Minimum time between display refreshes, about one frame at 60 Hz
+FRAME_MS = 16
 
 
 class MainWindow(QMainWindow):
+    # Emitted from the acquisition thread when an autotune has settled or timed out
+    autotune_finished = Signal(object)  # AutotuneResult
+
     def __init__(self, version):
         super().__init__()
         self.version = version
         self.simulation = False
+        self._closing = False
 
         # Install event filter to capture all mouse clicks
         self.installEventFilter(self)
@@ -37,53 +70,176 @@ class MainWindow(QMainWindow):
         self.config_data = load_config(self.ini_file)
         self.rf_device: str
         self.rf_com_port: str
-        self.rf_device, self.rf_comport = find_comport_device(
+        self.rf_device, self.rf_com_port = find_comport_device(
             self.config_data, 'RFGenerator'
         )
-        self.autotune_flag: bool = False
-
-        try:
-            self.resource_name: str = f'ASRL{self.rf_com_port}::INSTR'
-            self.rfg = RFGenerator(self.resource_name, self.rf_device)
-
-        except Exception:
-            # print(f'Exception: {e}')
-            print('Could not connect to RF device. App in simulation mode.')
-            self.simulation = True
+        self.device_cache = DeviceCache(
+            find_cache_file(self.config_data, 'Cache') or DEFAULT_CACHE_FILE
+        )
+        self.autotune: Autotune | None = None
+        self.autotune_finished.connect(self.on_autotune_finished)
+
+        # Device commands run on the RF generator's I/O worker and report back here
+        self.commands = CommandBridge(self)
+        self.commands.finished.connect(self.on_command_finished)
+        self.commands.failed.connect(self.on_command_failed)
+
+        self.resource_name: str = f'ASRL{self.rf_com_port}::INSTR'
+        # Sample in a separate process when the ini file asks for it
+        self.worker_process = find_worker_process(self.config_data, 'RFGenerator')
+        # Data acquisition rate; the displays follow the acquired samples
+        self.refresh_rate = 1000  # 1000ms = 1 second
+        self.rfg: RFGenerator | RemoteRFGenerator | None = None
+        self.setpoints: RFSetpoints | None = None
+        self.hvps: HVPSv3 | None = None
+        self.data_acquisition: DataAcquisition | RemoteAcquisition | None = None
+        self.run_logger: RunLogger | None = None
+
+        # New samples are pushed to the GUI thread as they are acquired. Bursts are
+        # coalesced so the displays are redrawn at most once per frame.
+        self._latest_sample: Sample | None = None
+        self._refresh_pending: bool = False
+        self.samples = SampleBridge(self)
+        self.samples.sample_ready.connect(self.on_sample)
 
         self.create_gui()
 
-        if not self.simulation:
-            # Set the refresh rate and use it for both data acquisition and GUI update
-            self.refresh_rate = 1000  # 1000ms = 1 second
-
-            # Data acquisition setup
+        # Connect to the devices in the background so the window shows immediately.
+        # A missing device then costs a timeout on a worker thread, not a frozen
+        # window. RF controls stay disabled until the RF generator has answered.
+        self.set_rf_controls_enabled(False)
+        self.connections = CommandBridge(self)
+        self.connections.finished.connect(self.on_device_connected)
+        self.connections.failed.connect(self.on_device_failed)
+        self._connector = ThreadPoolExecutor(2, thread_name_prefix='connect')
+        self._connecting: dict[str, Future] = {}
+        self.connect_device('RF', self._connect_rf)
+        if self.config_data.has_section('HVPS'):
+            self.connect_device('HVPS', self._connect_hvps)
+        else:
+            self.device_status['HVPS'].setText('HVPS: not configured')
+        self._connector.shutdown(wait=False)
+
+    def connect_device(self, name: str, connect: Callable[[], object]) -> None:
+        self.device_status[name].setText(f'{name}: connecting...')
+        self._connecting[name] = self._connector.submit(connect)
+        self.connections.watch(name, self._connecting[name])
+
+    def _connect_rf(self) -> RFGenerator | RemoteRFGenerator:
+        # Runs on a connection thread
+        if self.worker_process:
+            hvps_address = None
+            if self.config_data.has_section('HVPS'):
+                _, ip, port = find_IP_device(self.config_data, 'HVPS')
+                hvps_address = (ip, port)
+            process = AcquisitionProcess(
+                self.resource_name,
+                self.rf_device,
+                self.refresh_rate / 1000,
+                hvps_address=hvps_address,
+                cache_file=self.device_cache.path,
+                rf_rates=find_poll_rates(self.config_data, 'Acquisition'),
+            )
+            process.start()
+            return RemoteRFGenerator(process)
+        return RFGenerator(self.resource_name, self.rf_device, cache=self.device_cache)
+
+    def _connect_hvps(self) -> HVPSv3:
+        # Runs on a connection thread
+        _, ip, port = find_IP_device(self.config_data, 'HVPS')
+        hvps = HVPSv3(ip, port)
+        hvps.connect()
+        if hvps.sock is None:
+            raise ConnectionError(f'No answer from {ip}:{port}')
+        return hvps
+
+    def on_device_connected(self, name: str) -> None:
+        device = self._connecting.pop(name).result()
+        self.device_status[name].setText(f'{name}: connected')
+        if self._closing:
+            if name == 'RF':
+                device.close()
+            else:
+                device.disconnect()
+            return
+        if name == 'HVPS':
+            self.hvps = device
+            return
+
+        self.rfg = device
+        self.setpoints = RFSetpoints(self.rfg)
+        vrg = self.rfg.rf_device
+        self.freq_setting_input.set_limits(vrg.min_tune_freq, vrg.max_tune_freq)
+        self.power_setting_input.set_limits(0, vrg.max_power_setting)
+        self.device_status[name].setToolTip(f'Serial number {vrg.serial_number}')
+
+        # Data acquisition setup; the worker process samples on its own
+        if isinstance(self.rfg, RemoteRFGenerator):
+            self.data_acquisition = RemoteAcquisition(self.rfg)
+        else:
             self.data_acquisition = DataAcquisition(
-                self.rfg, self.refresh_rate / 1000
-            )  # if self.rfg else None
-            self.data_acquisition.start()
-
-            # Timer to update the GUI with data from the RF device
-            self.timer = QTimer(self)
-            self.timer.timeout.connect(self.update_display)
-            self.timer.start(self.refresh_rate)
-
-    def update_display(self):
-        # Only run if a device is connected
-        if not self.simulation:
-            """
-            Update the display with the latest data from the RF device.
-            """
-            data = self.data_acquisition.get_data()
-
-            if self.autotune_flag:
-                self.freq_setting_input.setText(f'{data["frequency"]:.2f}')
-                self.autotune_flag = False
-
-            self.forward_power_display.setText(f'{data["forward_power"]:.0f} W')
-            self.reflected_power_display.setText(f'{data["reflected_power"]:.1f} W')
-            self.absorbed_power_display.setText(f'{data["absorbed_power"]:.0f} W')
-            self.frequency_display.setText(f'{data["frequency"]:.2f} MHz')
+                self.rfg,
+                self.refresh_rate / 1000,
+                rates=find_poll_rates(self.config_data, 'Acquisition'),
+            )
+        self.strip_chart.history = self.data_acquisition.history
+
+        # Log every sample to disk when a [RunLog] section is configured
+        run_log_settings = find_run_log_settings(self.config_data, 'RunLog')
+        if run_log_settings is not None:
+            directory, max_bytes, max_seconds = run_log_settings
+            self.run_logger = RunLogger(
+                directory, FIELDS, max_bytes=max_bytes, max_seconds=max_seconds
+            )
+            self.run_logger.start()
+            self.data_acquisition.add_listener(self.run_logger.log)
+
+        self.data_acquisition.add_listener(self.samples.post)
+        self.data_acquisition.start()
+        self.set_rf_controls_enabled(True)
+
+    def on_device_failed(self, name: str, error: str) -> None:
+        self._connecting.pop(name, None)
+        print(f'Could not connect to {name} device: {error}')
+        self.device_status[name].setText(f'{name}: not connected')
+        self.device_status[name].setToolTip(error)
+        if name == 'RF':
+            print('App in simulation mode.')
+            self.simulation = True
+            self.setWindowTitle(f'VRG Control - (simulation) v{self.version}')
+            self.set_rf_controls_enabled(True)
+
+    def set_rf_controls_enabled(self, enabled: bool) -> None:
+        for widget in (
+            self.enable_switch,
+            self.autotune_button,
+            self.freq_setting_input,
+            self.power_setting_input,
+            self.narrow_autotune_action,
+        ):
+            widget.setEnabled(enabled)
+
+    def on_sample(self, sample: Sample) -> None:
+        self._latest_sample = sample
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            QTimer.singleShot(FRAME_MS, self.refresh_display)
+
+    def refresh_display(self) -> None:
+        self._refresh_pending = False
+        if self._latest_sample is not None:
+            self.update_display(self._latest_sample)
+            self.strip_chart.refresh()
+
+    def update_display(self, sample: Sample) -> None:
+        """
+        Update the displays with an RF sample. Only labels whose text changes are
+        touched, so an unchanged reading costs no repaint.
+        """
+        _set_text(self.forward_power_display, f'{sample.forward_power:.0f} W')
+        _set_text(self.reflected_power_display, f'{sample.reflected_power:.1f} W')
+        _set_text(self.absorbed_power_display, f'{sample.absorbed_power:.0f} W')
+        _set_text(self.frequency_display, f'{sample.frequency:.2f} MHz')
 
     def closeEvent(self, event):
         # Confirm the user wants to exit the application.
@@ -94,18 +250,26 @@ class MainWindow(QMainWindow):
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             QMessageBox.StandardButton.No,
         )
-        if reply == QMessageBox.StandardButton.Yes:
-            event.accept()
-        else:
+        if reply != QMessageBox.StandardButton.Yes:
             event.ignore()
+            return
 
-        # Only run if a device is connected.
-        if not self.simulation:
-            """
-            Stop the data acquisition when the window is closed.
-            """
+        # Devices that finish connecting from now on are closed straight away
+        self._closing = True
+
+        # Stop the data acquisition when the window is closed.
+        if self.data_acquisition is not None:
             self.data_acquisition.stop()
-            event.accept()
+        if self.run_logger is not None:
+            self.run_logger.stop()
+        # Closes the VISA port and the RF generator's command worker. The chart lets
+        # go of the history first, a worker process's one is unmapped on close.
+        self.strip_chart.history = None
+        if self.rfg is not None:
+            self.rfg.close()
+        if self.hvps is not None:
+            self.hvps.disconnect()
+        event.accept()
 
     def create_gui(self) -> None:
         if not self.simulation:
@@ -117,7 +281,25 @@ class MainWindow(QMainWindow):
         icon_path: str = str(root_dir / 'assets' / 'vrg_icon.ico')
         self.setWindowIcon(QIcon(icon_path))
 
-        self.setFixedSize(450, 280)
+        self.setFixedSize(450, 585)
+        self.statusBar().setSizeGripEnabled(False)
+
+        # Connection state of each device, shown at the right of the status bar
+        self.device_status: dict[str, QLabel] = {}
+        for name in ('RF', 'HVPS'):
+            self.device_status[name] = QLabel(f'{name}: -')
+            self.statusBar().addPermanentWidget(self.device_status[name])
+
+        # Create the menu bar with the device statistics window
+        self.stats_window: StatsWindow | None = None
+        stats_action = QAction('Device Statistics...', self)
+        stats_action.triggered.connect(self.show_stats_window)
+        self.narrow_autotune_action = QAction('Narrow Autotune', self)
+        self.narrow_autotune_action.triggered.connect(self.narrow_autotune_clicked)
+        tools_menu = self.menuBar().addMenu('Tools')
+        tools_menu.addAction(self.narrow_autotune_action)
+        tools_menu.addSeparator()
+        tools_menu.addAction(stats_action)
 
         # Create enable rf switch
         self.enable_switch = QCheckBox(
@@ -246,9 +428,13 @@ class MainWindow(QMainWindow):
         inputs_layout.addLayout(power_layout)
         inputs_layout.setContentsMargins(10, 10, 10, 10)
 
+        # Trend plots of the acquired history below the displays
+        self.strip_chart = StripChart()
+
         main_layout = QVBoxLayout()
         main_layout.addLayout(inputs_layout)
         main_layout.addLayout(displays_layout)
+        main_layout.addWidget(self.strip_chart)
 
         container = QWidget()
         container.setLayout(main_layout)
@@ -282,32 +468,35 @@ class MainWindow(QMainWindow):
 
     def on_toggle(self, state: int) -> None:
         if state == 2:  # checked
-            print('RF Enabled')  # replace this with command to enable
+            print('RF Enabled')
             if not self.simulation:
-                self.rfg.enable()
+                self.commands.watch('Enable RF', self.rfg.enable())
         else:  # unchecked
-            print('RF Disabled')  # replace this with command to disable
+            print('RF Disabled')
             if not self.simulation:
-                self.rfg.disable()
+                self.commands.watch('Disable RF', self.rfg.disable())
 
     def update_setting(self, input_line: CustomLineEdit, param: str, unit: str) -> None:
         entered_text: str = input_line.text()  # Get text from CustomLineEdit
         num: float = float(entered_text)  # Validate that the input is a float
         num_as_str: str = ''
         if not self.simulation:
-            # Code to run if connected to RF generator
+            # Code to run if connected to RF generator. The command is queued on the
+            # RF generator's I/O worker and its outcome arrives as a signal.
             if param == 'Frequency':
                 num_as_str: str = f'{num:.2f}'
                 input_line.setText(num_as_str)
-                self.rfg.set_frequency(
-                    num
-                )  # tell RF generator to set the frequency to num
+                self.commands.watch(
+                    f'Set frequency to {num_as_str} {unit}',
+                    self.setpoints.set_frequency(num),
+                )
             elif param == 'Power':
                 num_as_str: str = f'{int(num)}'
                 input_line.setText(num_as_str)
-                self.rfg.set_power(
-                    int(num)
-                )  # tell RF generator to set the frequency to num
+                self.commands.watch(
+                    f'Set power to {num_as_str} {unit}',
+                    self.setpoints.set_power(int(num)),
+                )
         else:
             # Code to run if in simulation mode
             if param == 'Frequency':
@@ -316,11 +505,82 @@ class MainWindow(QMainWindow):
                 num_as_str: str = f'{int(num)}'
             input_line.setText(num_as_str)  # Set text of the input box
 
+    def show_stats_window(self) -> None:
+        if self.stats_window is None:
+            self.stats_window = StatsWindow(self)
+        self.stats_window.show()
+        self.stats_window.raise_()
+
     def autotune_clicked(self) -> None:
-        if not self.simulation:
-            self.autotune_flag = True
-            self.rfg.auto_tune()
-        print('Autotuned!')
+        self.start_autotune(narrow=False)
+
+    def narrow_autotune_clicked(self) -> None:
+        self.start_autotune(narrow=True)
+
+    def start_autotune(self, narrow: bool) -> None:
+        if self.simulation:
+            print('Autotuned!')
+            return
+        if self.autotune is not None and not self.autotune.result.done():
+            return  # already tuning
+
+        name = 'Narrow autotune' if narrow else 'Autotune'
+        self.autotune = Autotune(
+            self.rfg,
+            self.data_acquisition,
+            narrow=narrow,
+            on_finished=self.autotune_finished.emit,
+        )
+        try:
+            self.commands.watch(name, self.autotune.start())
+        except RuntimeError as e:
+            self.on_command_failed(name, str(e))
+            return
+        # The tune moves the frequency away from the last value written
+        self.setpoints.frequency_changed()
+        self.autotune_button.setEnabled(False)
+        self.statusBar().showMessage(f'{name} running...')
+
+    def on_autotune_finished(self, result: AutotuneResult) -> None:
+        self.autotune_button.setEnabled(True)
+        name = 'Narrow autotune' if result.narrow else 'Autotune'
+        if math.isnan(result.frequency):
+            message = f'{name} timed out after {result.settle_time:.1f} s, no readings'
+        else:
+            self.freq_setting_input.setText(f'{result.frequency:.2f}')
+            if result.settled:
+                message = (
+                    f'{name} settled in {result.settle_time:.2f} s at '
+                    f'{result.frequency:.2f} MHz, '
+                    f'{result.reflected_power:.1f} W reflected'
+                )
+            else:
+                message = (
+                    f'{name} did not settle within {result.settle_time:.1f} s, '
+                    f'{result.frequency:.2f} MHz'
+                )
+        print(message)
+        self.statusBar().showMessage(message)
+
+    def on_command_finished(self, name: str) -> None:
+        self.statusBar().showMessage(f'{name}: done', 3000)
+
+    def on_command_failed(self, name: str, error: str) -> None:
+        print(f'{name} failed: {error}')
+        self.statusBar().showMessage(f'{name} failed: {error}')
+        if name in ('Autotune', 'Narrow autotune'):
+            self.autotune_button.setEnabled(True)
+
+        # Put the switch back so it shows the state the generator is really in
+        if name in ('Enable RF', 'Disable RF'):
+            self.enable_switch.blockSignals(True)
+            self.enable_switch.setChecked(self.rfg.enabled)
+            self.enable_switch.blockSignals(False)
+
+
+def _set_text(label: QLabel, text: str) -> None:
+    if label.text() != text:
+        label.setText(text)
 
 
 if __name__ == '__main__':
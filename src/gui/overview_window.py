@@ -0,0 +1,94 @@
+import time
+
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QCloseEvent
+from PySide6.QtWidgets import (
+    QHeaderView,
+    QMainWindow,
+    QTableWidget,
+    QTableWidgetItem,
+)
+
+from ..stands import StandManager, StandStatus
+
+COLUMNS = (
+    'Stand',
+    'RF',
+    'Forward (W)',
+    'Reflected (W)',
+    'Frequency (MHz)',
+    'HVPS',
+    'State',
+    'Voltages (V)',
+)
+STALE_AFTER = 5.0  # seconds without a reading before a stand is shown as stale
+REFRESH_MS = 500
+
+
+class OverviewWindow(QMainWindow):
+    """
+    One row per test stand with its connection state and latest readings.
+
+    The table is refreshed from the stand statuses on a GUI timer, so its cost does
+    not grow with the poll rate, and a cell is only touched when its text changes.
+    """
+
+    def __init__(self, manager: StandManager, version: str = '') -> None:
+        super().__init__()
+        self.manager = manager
+        self.setWindowTitle(f'Test Stand Overview v{version}')
+
+        self.table = QTableWidget(len(manager.stands), len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeMode.ResizeToContents
+        )
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        for row in range(self.table.rowCount()):
+            for column in range(len(COLUMNS)):
+                self.table.setItem(row, column, QTableWidgetItem(''))
+        self.setCentralWidget(self.table)
+        self.resize(900, 60 + 30 * max(len(manager.stands), 3))
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(REFRESH_MS)
+        self.refresh()
+
+    def refresh(self) -> None:
+        now = time.time()
+        for row, stand in enumerate(self.manager.stands.values()):
+            for column, text in enumerate(self.row_text(stand.status, now)):
+                item = self.table.item(row, column)
+                if item.text() != text:
+                    item.setText(text)
+
+    @staticmethod
+    def row_text(status: StandStatus, now: float) -> tuple[str, ...]:
+        name = status.name
+        if status.updated and now - status.updated > STALE_AFTER:
+            name += ' (stale)'
+        telemetry = status.telemetry
+        channels = status.hv_channels or {}
+        voltages = '  '.join(
+            f'{channel} {reading.voltage:.0f}'
+            for channel, reading in channels.items()
+            if channel != 'SL'
+        )
+        return (
+            name,
+            f'error: {status.rf_error}' if status.rf_error else status.rf,
+            f'{telemetry.forward_power}' if telemetry else '',
+            f'{telemetry.reflected_power}' if telemetry else '',
+            f'{telemetry.frequency:.2f}' if telemetry else '',
+            f'error: {status.hvps_error}' if status.hvps_error else status.hvps,
+            status.hv_state or '',
+            voltages,
+        )
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        self.timer.stop()
+        self.manager.stop()
+        event.accept()
@@ -0,0 +1,16 @@
+from PySide6.QtCore import QObject, Signal
+
+from ..rf.sample_history import Sample
+
+
+class SampleBridge(QObject):
+    """
+    Carries samples from the acquisition thread to the GUI thread. Register `post`
+    as a DataAcquisition listener; every sample is re-emitted as `sample_ready`
+    through a queued connection.
+    """
+
+    sample_ready = Signal(tuple)  # Sample
+
+    def post(self, sample: Sample) -> None:
+        self.sample_ready.emit(sample)
@@ -0,0 +1,99 @@
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import (
+    QCheckBox,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from ..instrumentation import METRICS
+
+LATENCY_COLUMNS = ('count', 'mean_ms', 'p50_ms', 'p99_ms', 'max_ms')
+
+
+class StatsWindow(QWidget):
+    """Live view of the command latency histograms and event counters in METRICS"""
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent, Qt.WindowType.Window)
+        self.setWindowTitle('Device Statistics')
+        self.resize(640, 420)
+
+        self.enable_checkbox = QCheckBox('Collect statistics')
+        self.enable_checkbox.setChecked(METRICS.enabled)
+        self.enable_checkbox.toggled.connect(self.set_enabled)
+        self.reset_button = QPushButton('Reset')
+        self.reset_button.clicked.connect(self.reset)
+
+        self.latency_table = QTableWidget(0, len(LATENCY_COLUMNS))
+        self.latency_table.setHorizontalHeaderLabels(
+            ['Count', 'Mean (ms)', 'p50 (ms)', 'p99 (ms)', 'Max (ms)']
+        )
+        self.latency_table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeMode.Stretch
+        )
+        self.latency_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+
+        self.counter_table = QTableWidget(0, 1)
+        self.counter_table.setHorizontalHeaderLabels(['Count'])
+        self.counter_table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeMode.Stretch
+        )
+        self.counter_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.counter_table.setMaximumHeight(120)
+
+        controls = QHBoxLayout()
+        controls.addWidget(self.enable_checkbox)
+        controls.addStretch()
+        controls.addWidget(self.reset_button)
+
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(QLabel('Latency'))
+        layout.addWidget(self.latency_table)
+        layout.addWidget(QLabel('Timeouts and NAKs'))
+        layout.addWidget(self.counter_table)
+        self.setLayout(layout)
+
+        # Only refresh while the window is open
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event) -> None:
+        self.refresh()
+        self.timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event) -> None:
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def set_enabled(self, enabled: bool) -> None:
+        METRICS.set_enabled(enabled)
+
+    def reset(self) -> None:
+        METRICS.reset()
+        self.refresh()
+
+    def refresh(self) -> None:
+        snapshot = METRICS.snapshot()
+
+        latency = snapshot['latency']
+        self.latency_table.setRowCount(len(latency))
+        self.latency_table.setVerticalHeaderLabels(list(latency))
+        for row, stats in enumerate(latency.values()):
+            for col, key in enumerate(LATENCY_COLUMNS):
+                value = stats[key]
+                text = f'{value}' if key == 'count' else f'{value:.2f}'
+                self.latency_table.setItem(row, col, QTableWidgetItem(text))
+
+        counters = snapshot['counters']
+        self.counter_table.setRowCount(len(counters))
+        self.counter_table.setVerticalHeaderLabels(list(counters))
+        for row, value in enumerate(counters.values()):
+            self.counter_table.setItem(row, 0, QTableWidgetItem(f'{value}'))
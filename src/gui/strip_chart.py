@@ -0,0 +1,269 @@
+import time
+from array import array
+from bisect import bisect_left
+
+from PySide6.QtCore import QPointF, QRectF, Qt
+from PySide6.QtGui import QColor, QPainter, QPen, QPolygonF
+from PySide6.QtWidgets import QComboBox, QHBoxLayout, QLabel, QVBoxLayout, QWidget
+
+from ..rf.sample_history import FIELDS, SampleHistory
+
+# Selectable time spans in seconds
+SPANS: dict[str, float] = {
+    '1 min': 60,
+    '10 min': 600,
+    '1 hour': 3600,
+    '8 hours': 8 * 3600,
+    '24 hours': 24 * 3600,
+}
+
+# Traces drawn on each plot: (history field, legend name, color)
+POWER_TRACES = (
+    ('forward_power', 'Forward', QColor('#e03c31')),
+    ('reflected_power', 'Reflected', QColor('#f2c12e')),
+    ('absorbed_power', 'Absorbed', QColor('#3fa34d')),
+)
+FREQUENCY_TRACES = (('frequency', 'Frequency', QColor('#3b8fd9')),)
+
+BACKGROUND = QColor('black')
+GRID = QColor('#404040')
+TEXT = QColor('#c0c0c0')
+
+
+class MinMaxDecimator:
+    """
+    Min/max decimation of history columns into fixed time buckets.
+
+    Bucket k covers [k * width, (k + 1) * width) in epoch seconds, so a bucket keeps
+    the same samples as the plot scrolls. Bucket edges are found by bisecting the
+    timestamps and min/max run over memoryview slices, so no samples are copied.
+    Buckets that can no longer receive samples are cached, and a frame only has to
+    decimate the samples acquired since the last one, whatever the span. Every peak
+    survives, which averaging or plain subsampling would not guarantee.
+    """
+
+    def __init__(self, fields: tuple[str, ...]) -> None:
+        self.fields = fields
+        self.width: float = 0.0
+        self._cache: dict[str, dict[int, tuple[float, float] | None]] = {
+            field: {} for field in fields
+        }
+
+    def decimate(
+        self,
+        data: dict[str, memoryview],
+        t_stop: float,
+        span: float,
+        n_buckets: int,
+    ) -> dict[str, list[tuple[int, float, float]]]:
+        """
+        Returns, per field, (bucket, min, max) for each of the `n_buckets` buckets
+        ending at `t_stop` that holds samples. Buckets are numbered 0 (oldest) to
+        n_buckets - 1.
+        """
+        width = span / n_buckets
+        if width != self.width:
+            self.width = width
+            for cache in self._cache.values():
+                cache.clear()
+
+        timestamps = data['timestamp']
+        newest = timestamps[-1] if len(timestamps) else 0.0
+        k_stop = int(t_stop // width) + 1
+        k_start = k_stop - n_buckets
+
+        result: dict[str, list[tuple[int, float, float]]] = {}
+        for field in self.fields:
+            cache = self._cache[field]
+            values = data[field]
+            buckets: list[tuple[int, float, float]] = []
+            lo = None
+            for k in range(k_start, k_stop):
+                if k in cache:
+                    extremes = cache[k]
+                    lo = None
+                else:
+                    if lo is None:
+                        lo = bisect_left(timestamps, k * width)
+                    hi = bisect_left(timestamps, (k + 1) * width, lo)
+                    extremes = None
+                    if hi > lo:
+                        chunk = values[lo:hi]
+                        extremes = (min(chunk), max(chunk))
+                    lo = hi
+                    if (k + 1) * width <= newest:
+                        cache[k] = extremes  # complete, later samples are newer
+                if extremes is not None:
+                    buckets.append((k - k_start, *extremes))
+            for k in [k for k in cache if k < k_start]:
+                del cache[k]
+            result[field] = buckets
+        return result
+
+
+class StripChart(QWidget):
+    """
+    Scrolling trend plots of the acquired RF power and frequency, drawn from a
+    SampleHistory. Call `refresh()` when new samples arrive; Qt merges repeated calls
+    into one repaint.
+    """
+
+    def __init__(self, history: SampleHistory | None = None, parent=None) -> None:
+        super().__init__(parent)
+        self.history = history  # may be set later, e.g. once a device is connected
+        self.span: float = SPANS['10 min']
+
+        self.span_selector = QComboBox()
+        self.span_selector.addItems(list(SPANS))
+        self.span_selector.setCurrentText('10 min')
+        self.span_selector.currentTextChanged.connect(self.set_span)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel('Trend'))
+        controls.addStretch()
+        controls.addWidget(QLabel('Span'))
+        controls.addWidget(self.span_selector)
+        controls.setContentsMargins(0, 0, 0, 0)
+
+        self.plot_area = _PlotArea(self)
+
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.plot_area)
+        layout.setContentsMargins(10, 0, 10, 5)
+        self.setLayout(layout)
+
+    def set_span(self, name: str) -> None:
+        self.span = SPANS[name]
+        self.plot_area.update()
+
+    def refresh(self) -> None:
+        self.plot_area.update()
+
+
+class _PlotArea(QWidget):
+    """Paints the power plot above the frequency plot"""
+
+    MARGIN_LEFT = 50
+    MARGIN_RIGHT = 8
+    PLOT_GAP = 6
+    LEGEND_HEIGHT = 16
+
+    def __init__(self, chart: StripChart) -> None:
+        super().__init__(chart)
+        self.chart = chart
+        self.setMinimumHeight(200)
+        self.decimator = MinMaxDecimator(
+            tuple(field for field, _, _ in POWER_TRACES + FREQUENCY_TRACES)
+        )
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), BACKGROUND)
+
+        left = self.MARGIN_LEFT
+        width = self.width() - left - self.MARGIN_RIGHT
+        half = (self.height() - self.PLOT_GAP) / 2 - self.LEGEND_HEIGHT
+        if width < 2 or half < 10:
+            return
+        power_rect = QRectF(left, self.LEGEND_HEIGHT, width, half)
+        freq_rect = QRectF(
+            left, power_rect.bottom() + self.PLOT_GAP + self.LEGEND_HEIGHT, width, half
+        )
+
+        t_stop = time.time()
+        span = self.chart.span
+        n_buckets = int(width)
+        history = self.chart.history
+        if history is not None:
+            data = history.since(t_stop - span)
+        else:
+            data = {field: memoryview(array('d')) for field in FIELDS}
+        decimated = self.decimator.decimate(data, t_stop, span, n_buckets)
+
+        self._draw_plot(
+            painter,
+            power_rect,
+            decimated,
+            POWER_TRACES,
+            n_buckets,
+            'W',
+            '{:.0f}',
+            1.0,
+        )
+        self._draw_plot(
+            painter,
+            freq_rect,
+            decimated,
+            FREQUENCY_TRACES,
+            n_buckets,
+            'MHz',
+            '{:.2f}',
+            0.02,
+        )
+
+    def _draw_plot(
+        self,
+        painter: QPainter,
+        rect: QRectF,
+        decimated: dict[str, list[tuple[int, float, float]]],
+        traces: tuple[tuple[str, str, QColor], ...],
+        n_buckets: int,
+        unit: str,
+        label_format: str,
+        min_range: float,
+    ) -> None:
+        painter.setPen(QPen(GRID))
+        painter.drawRect(rect)
+
+        traces_buckets = [decimated[field] for field, _, _ in traces]
+        extremes = [(lo, hi) for buckets in traces_buckets for _, lo, hi in buckets]
+
+        painter.setPen(QPen(TEXT))
+        if not extremes:
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, 'No data')
+            return
+        y_min = min(lo for lo, _ in extremes)
+        y_max = max(hi for _, hi in extremes)
+        # Pad the range, and widen a nearly flat trace to `min_range` around its center
+        y_range = max(y_max - y_min, min_range) * 1.1
+        y_center = (y_max + y_min) / 2
+        y_min = y_center - y_range / 2
+        y_max = y_center + y_range / 2
+
+        def y(value: float) -> float:
+            return rect.bottom() - (value - y_min) / (y_max - y_min) * rect.height()
+
+        # Axis labels and legend
+        label_rect = QRectF(0, rect.top(), self.MARGIN_LEFT - 4, 14)
+        painter.drawText(
+            label_rect, Qt.AlignmentFlag.AlignRight, label_format.format(y_max)
+        )
+        label_rect.moveBottom(rect.bottom())
+        painter.drawText(
+            label_rect, Qt.AlignmentFlag.AlignRight, label_format.format(y_min)
+        )
+        painter.drawText(
+            QRectF(0, rect.center().y() - 7, self.MARGIN_LEFT - 4, 14),
+            Qt.AlignmentFlag.AlignRight,
+            unit,
+        )
+        legend_x = rect.left() + 6
+        for _, name, color in traces:
+            painter.setPen(QPen(color))
+            painter.drawText(QPointF(legend_x, rect.top() - 4), name)
+            legend_x += painter.fontMetrics().horizontalAdvance(name) + 10
+
+        # One vertical min-to-max segment per bucket, joined into a single polyline
+        painter.setClipRect(rect)
+        x_scale = rect.width() / n_buckets
+        for (_, _, color), buckets in zip(traces, traces_buckets):
+            points: list[QPointF] = []
+            for bucket, lo, hi in buckets:
+                x = rect.left() + (bucket + 0.5) * x_scale
+                points.append(QPointF(x, y(lo)))
+                if hi != lo:
+                    points.append(QPointF(x, y(hi)))
+            painter.setPen(QPen(color, 1))
+            painter.drawPolyline(QPolygonF(points))
+        painter.setClipping(False)
@@ -0,0 +1,221 @@
+import asyncio
+
+from ..instrumentation import METRICS, instrumented
+from .hvps_api import (
+    ChannelReading,
+    Channels,
+    HVPSCommands,
+    count_naks,
+    parse_all_channels,
+)
+from .hvps_codec import COMMANDS
+
+
+class AsyncHVPSv3(HVPSCommands):
+    """
+    asyncio client for the HVPS with the same command set as `HVPSv3`.
+
+    Every call has its own deadline (`timeout` seconds unless overridden) and
+    concurrent callers are serialized on a lock so each command gets its own response.
+    """
+
+    def __init__(
+        self,
+        ip: str,
+        port: str,
+        timeout: float = 5.0,
+        occupied_channels: tuple[Channels, ...] = (
+            'BM',
+            'EX',
+            'L1',
+            'L2',
+            'L3',
+            'L4',
+            'SL',
+        ),
+    ) -> None:
+        self.ip = ip
+        self.port = int(port)
+        self.timeout = timeout
+        self.occupied_channels = occupied_channels
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+        self._lock = asyncio.Lock()
+        # Set when an error closed the connection, the next exchange reconnects
+        self._link_lost = False
+
+    async def connect(self) -> None:
+        """Establishes a TCP connection to the HVPS"""
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.ip, self.port), self.timeout
+            )
+            self._link_lost = False
+            print(f'Connected to HVPS at {self.ip}:{self.port}')
+        except OSError as e:  # TimeoutError is an OSError
+            print(f'Connection error: {e}')
+            self.reader = None
+            self.writer = None
+
+    async def disconnect(self) -> None:
+        """Closes the connection"""
+        if self.writer:
+            writer = self.writer
+            self.reader = None
+            self.writer = None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            print('Disconnected from HVPS')
+        self._link_lost = False
+
+    async def _drop_link(self) -> None:
+        # Late responses would be handed to the next caller, so the connection is
+        # closed and opened afresh by the next exchange instead.
+        if self.writer is None:
+            return  # disconnect() closed it while the exchange was waiting
+        await self.disconnect()
+        self._link_lost = True
+        print('HVPS connection dropped, reconnecting on the next command')
+
+    async def send_query(self, query: str, timeout: float | None = None) -> str:
+        """Sends a command to the HVPS and returns the response"""
+        return (await self.send_queries([query], timeout))[0]
+
+    @instrumented
+    async def send_queries(
+        self, queries: list[str], timeout: float | None = None
+    ) -> list[str]:
+        """
+        Sends several commands to the HVPS in one write and returns the responses
+        in the same order as the commands. Raises TimeoutError if the whole exchange,
+        including waiting for other callers, takes longer than `timeout` seconds.
+        """
+        deadline = self.timeout if timeout is None else timeout
+        payload = ''.join(q if q.endswith('\n') else f'{q}\n' for q in queries)
+        sent = False
+
+        try:
+            async with asyncio.timeout(deadline):
+                async with self._lock:
+                    if not self.writer and self._link_lost:
+                        await self.connect()
+                    if not self.reader or not self.writer:
+                        raise ConnectionError('Socket is not connected')
+                    self.writer.write(payload.encode())
+                    sent = True
+                    await self.writer.drain()
+                    responses: list[str] = []
+                    for _ in queries:
+                        line = await self.reader.readuntil(b'\n')
+                        responses.append(line.decode().strip())
+                    count_naks('AsyncHVPSv3', responses)
+                    return responses
+
+        except TimeoutError:
+            METRICS.increment('AsyncHVPSv3.timeouts')
+            if sent:
+                await self._drop_link()
+            raise TimeoutError(f'HVPS did not respond within {deadline} s')
+        except (asyncio.IncompleteReadError, OSError) as e:
+            await self._drop_link()
+            raise ConnectionError(f'Socket communication error {e}')
+
+    @instrumented
+    async def set_solenoid_current(self, current: str) -> str | None:
+        """Sets the solenoid current. Max current is 3.0 A."""
+        command = self.solenoid_current_command(current)
+        if command is None:
+            return
+        response = await self.send_query(command)
+        print(f'set_solenoid_current response: "{response}"')
+        return COMMANDS['set_solenoid_current'].decode(command, response)
+
+    @instrumented
+    async def set_voltage(self, channel: str, voltage: str) -> str:
+        """Sets the voltage of the specified channel in the HVPS"""
+        command = self.voltage_command(channel, voltage)
+        response = await self.send_query(command)
+        print(f'set_voltage response: "{response}"')
+        return COMMANDS['set_voltage'].decode(command, response)
+
+    @instrumented
+    async def get_voltage(self, channel: str) -> float:
+        "Queries the current voltage of a channel in the HVPS"
+        command = self.voltage_readback_command(channel)
+        response = await self.send_query(command)
+        print(f'get_voltage response: "{response}"')
+        return COMMANDS['read_voltage'].decode(command, response)
+
+    @instrumented
+    async def get_current(self, channel: str) -> float:
+        "Queries the current electric-current of a channel in the HVPS"
+        command = self.current_readback_command(channel)
+        response = await self.send_query(command)
+        print(f'get_current response: "{response}"')
+        return COMMANDS['read_current'].decode(command, response)
+
+    @instrumented
+    async def read_all_channels(self) -> dict[str, ChannelReading]:
+        """Reads the voltage and current of every occupied channel in one exchange"""
+        commands = self.all_channels_readback_commands()
+        responses = await self.send_queries(commands)
+        return parse_all_channels(self.occupied_channels, commands, responses)
+
+    @instrumented
+    async def enable_high_voltage(self) -> str:
+        """Enables high voltage to be turned on"""
+        command = COMMANDS['enable_high_voltage'].template
+        response = await self.send_query(command)
+        print(f'enable_high_voltage response: "{response}"')
+        return COMMANDS['enable_high_voltage'].decode(command, response)
+
+    @instrumented
+    async def disable_high_voltage(self) -> str:
+        """Turns off high voltage"""
+        command = COMMANDS['disable_high_voltage'].template
+        response = await self.send_query(command)
+        print(f'disable_high_voltage response: "{response}"')
+        return COMMANDS['disable_high_voltage'].decode(command, response)
+
+    @instrumented
+    async def enable_solenoid_current(self) -> str:
+        """Enables the solenoid current to be turned on"""
+        command = COMMANDS['enable_solenoid_current'].template
+        response = await self.send_query(command)
+        print(f'enable_solenoid response: "{response}"')
+        return COMMANDS['enable_solenoid_current'].decode(command, response)
+
+    @instrumented
+    async def disable_solenoid_current(self) -> str:
+        """Turns off solenoid current."""
+        command = COMMANDS['disable_solenoid_current'].template
+        response = await self.send_query(command)
+        print(f'disable_solenoid response: "{response}"')
+        return COMMANDS['disable_solenoid_current'].decode(command, response)
+
+    @instrumented
+    async def enable_wobble(self, channel: str, amplitude: str) -> str:
+        """Enables wobbling of EX, L1, L2, L3, or L4 channels. Acceptable amplitude values: 0-999"""
+        command = self.enable_wobble_command(channel, amplitude)
+        response = await self.send_query(command)
+        print(f'enable_wobble response: "{response}"')
+        return COMMANDS['enable_wobble'].decode(command, response)
+
+    @instrumented
+    async def disable_wobble(self, channel: str) -> str:
+        """Disables wobbling"""
+        command = self.disable_wobble_command(channel)
+        response = await self.send_query(command)
+        print(f'disable_wobble response: "{response}"')
+        return COMMANDS['disable_wobble'].decode(command, response)
+
+    @instrumented
+    async def get_state(self) -> str:
+        """Gets the enable state of the HV and solenoid"""
+        command = COMMANDS['read_state'].template
+        response = await self.send_query(command)
+        print(f'get_state response: "{response}"')
+        return COMMANDS['read_state'].decode(command, response)
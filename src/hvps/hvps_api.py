@@ -1,19 +1,144 @@
+import math
 import socket
+import threading
+from dataclasses import dataclass
 from typing import Literal
 
+from ..instrumentation import METRICS, instrumented
+from .hvps_codec import COMMANDS, NAK_ERRORS, decode_reading
+
 Channels = Literal['BM', 'EX', 'L1', 'L2', 'L3', 'L4', 'SL']
 
-NAKS = {
-    'NAK': 'No Error',
-    'NAK0': 'No Error',
-    'NAK1': 'Invalid Command',
-    'NAK2': 'Invalid Parameter',
-    'NAK3': 'Session Expired',
-    'NAK4': 'Time Out',
-}
 
+def count_naks(prefix: str, responses: list[str]) -> None:
+    """Counts the error NAKs among the responses as "<prefix>.NAK<n>" events"""
+    if METRICS.enabled:
+        for response in responses:
+            if response in NAK_ERRORS:
+                METRICS.increment(f'{prefix}.{response}')
+
+
+@dataclass(slots=True)
+class ChannelReading:
+    """Voltage and current read back from one HVPS channel"""
+
+    channel: str
+    voltage: float = math.nan
+    current: float = math.nan
+    error: str | None = None  # decoded NAK if either readback failed
+
+
+class HVPSCommands:
+    """
+    Validates arguments and formats the HVPS command strings from the command table
+    in `hvps_codec`. Shared by the blocking and asyncio clients so both speak
+    exactly the same command set.
+    """
+
+    occupied_channels: tuple[Channels, ...]
+
+    def _check_channel(self, channel: str) -> None:
+        if channel not in self.occupied_channels:
+            raise ValueError(
+                f'"{channel}" is not a valid channel. Valid channels: {self.occupied_channels}'
+            )
+
+    def solenoid_current_command(self, current: str) -> str | None:
+        """
+        Command must be STSLT00n.nn. So input must be converted to ensure the n.nn format.
+        Returns None if the solenoid is not installed in the HVPS.
+        """
+
+        ##### LOGIC #####
+        # Check to make sure solenoid is installed in the HVPS.
+        # Convert the current argument to a float to make sure input has a decimal point.
+        # Convert the float back to a string with two decimal places.
+        # Input the current value into the command.
+
+        if 'SL' not in self.occupied_channels:
+            return
+
+        return COMMANDS['set_solenoid_current'].encode(current=float(current))
+
+    def voltage_command(self, channel: str, voltage: str) -> str:
+        """Formats the command that sets the voltage of the specified channel"""
+
+        ##### LOGIC #####
+        # Check to make sure the channel is installed into the HVPS
+        # Disallow setting the solenoid voltage.
+        # Get the sign used to set the voltage then remove it from the voltage string.
+        # With the sign removed, the command table pads the voltage with zeros to 5 characters.
 
-class HVPSv3:
+        self._check_channel(channel)
+        if channel == 'SL':
+            raise ValueError('"SL" is not a valid channel for setting voltage.')
+
+        if '-' in voltage:
+            sign = '-'
+            voltage = voltage.replace('-', '')
+        else:
+            sign = '+'
+            voltage = voltage.replace('+', '')
+
+        return COMMANDS['set_voltage'].encode(
+            channel=channel, sign=sign, voltage=voltage
+        )
+
+    def voltage_readback_command(self, channel: str) -> str:
+        self._check_channel(channel)
+        return COMMANDS['read_voltage'].encode(channel=channel)
+
+    def current_readback_command(self, channel: str) -> str:
+        self._check_channel(channel)
+        return COMMANDS['read_current'].encode(channel=channel)
+
+    def _check_wobble_channel(self, channel: str) -> None:
+        valid_channels = [s for s in self.occupied_channels if s not in ('BM', 'SL')]
+        if channel not in self.occupied_channels:
+            raise ValueError(
+                f'"{channel}" is not a valid channel. Valid channels: {valid_channels}'
+            )
+
+    def enable_wobble_command(self, channel: str, amplitude: str) -> str:
+        """Acceptable amplitude values: 0-999"""
+        self._check_wobble_channel(channel)
+        return COMMANDS['enable_wobble'].encode(channel=channel, amplitude=amplitude)
+
+    def disable_wobble_command(self, channel: str) -> str:
+        self._check_wobble_channel(channel)
+        return COMMANDS['disable_wobble'].encode(channel=channel)
+
+    def all_channels_readback_commands(
+        self, channels: tuple[str, ...] | None = None
+    ) -> list[str]:
+        """
+        Voltage then current readback command for each of `channels`, by default
+        every occupied channel
+        """
+        read_voltage = COMMANDS['read_voltage'].encode
+        read_current = COMMANDS['read_current'].encode
+        commands: list[str] = []
+        for channel in self.occupied_channels if channels is None else channels:
+            commands.append(read_voltage(channel=channel))
+            commands.append(read_current(channel=channel))
+        return commands
+
+
+def parse_all_channels(
+    channels: tuple[str, ...], commands: list[str], responses: list[str]
+) -> dict[str, ChannelReading]:
+    """Pairs up the responses to `all_channels_readback_commands` per channel"""
+    readings: dict[str, ChannelReading] = {}
+    for i, channel in enumerate(channels):
+        voltage, v_error = decode_reading(commands[2 * i], responses[2 * i])
+        current, c_error = decode_reading(commands[2 * i + 1], responses[2 * i + 1])
+        readings[channel] = ChannelReading(
+            channel, voltage, current, v_error or c_error
+        )
+    return readings
+
+
+class HVPSv3(HVPSCommands):
     def __init__(
         self,
         ip: str,
@@ -34,6 +159,10 @@ class HVPSv3:
         self.timeout = timeout
         self.sock = None
         self.occupied_channels = occupied_channels
+        self._rx_buffer = bytearray()  # received bytes not yet split into responses
+        self._lock = threading.Lock()  # one exchange at a time, e.g. poller and setter
+        # Set when an error closed the connection, the next exchange reconnects
+        self._link_lost = False
 
     def connect(self) -> None:
         """Establishes a TCP connection to the HVPS"""
@@ -41,6 +170,8 @@ class HVPSv3:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.settimeout(self.timeout)
             self.sock.connect((self.ip, self.port))
+            self._rx_buffer.clear()
+            self._link_lost = False
             print(f'Connected to HVPS at {self.ip}:{self.port}')
         except socket.error as e:
             print(f'Connection error: {e}')
@@ -52,160 +183,174 @@ class HVPSv3:
             self.sock.close()  # if this doesn't work send "DSCON" command to disconnect.
             print('Disconnected from HVPS')
             self.sock = None
+            self._rx_buffer.clear()
+        self._link_lost = False
+
+    def _drop_link(self) -> None:
+        # Replies still in flight would be read as the responses of the next
+        # exchange, so the connection is closed and opened afresh instead.
+        sock, self.sock = self.sock, None
+        if sock is None:
+            return  # disconnect() closed it while the exchange was waiting
+        sock.close()
+        self._rx_buffer.clear()
+        self._link_lost = True
+        print('HVPS connection dropped, reconnecting on the next command')
+
+    def _read_line(self) -> str:
+        """
+        Returns the next newline-terminated response from the HVPS.
+        Bytes after the newline are kept in the buffer for the next call, so responses
+        split across reads or merged into one read are framed correctly.
+        """
+        if not self.sock:
+            raise ConnectionError('Socket is not connected')
+
+        while True:
+            index = self._rx_buffer.find(b'\n')
+            if index >= 0:
+                line = bytes(self._rx_buffer[:index])
+                del self._rx_buffer[: index + 1]
+                return line.decode().strip()
+
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise ConnectionError('Connection closed by HVPS')
+            self._rx_buffer += chunk
 
     def send_query(self, query: str) -> str:
         """Sends a command to the HVPS and returns the response"""
+        return self.send_queries([query])[0]
+
+    @instrumented
+    def send_queries(self, queries: list[str]) -> list[str]:
+        """
+        Sends several commands to the HVPS in one write and returns the responses
+        in the same order as the commands. Safe to call from several threads.
+        """
+        with self._lock:
+            return self._exchange(queries)
+
+    def _exchange(self, queries: list[str]) -> list[str]:
+        if not self.sock and self._link_lost:
+            self.connect()
         if not self.sock:
             raise ConnectionError('Socket is not connected')
-        if not query.endswith('\n'):
-            query += '\n'
 
-        try:
-            self.sock.sendall(query.encode())
-            response = self.sock.recv(1024)
-            return response.decode().strip()
+        payload = ''.join(q if q.endswith('\n') else f'{q}\n' for q in queries)
 
-        except socket.error as e:
+        try:
+            self.sock.sendall(payload.encode())
+            responses = [self._read_line() for _ in queries]
+            count_naks('HVPSv3', responses)
+            return responses
+
+        except TimeoutError as e:
+            METRICS.increment('HVPSv3.timeouts')
+            self._drop_link()
+            raise ConnectionError(f'Socket communication error {e}')
+        except OSError as e:
+            self._drop_link()
             raise ConnectionError(f'Socket communication error {e}')
 
+    @instrumented
     def set_solenoid_current(self, current: str) -> str | None:
-        """
-        Sets the solenoid current. Max current is 3.0 A.
-        Command must be STSLT00n.nn. So input must be converted to ensure the n.nn format.
-        """
-
-        ##### LOGIC #####
-        # Check to make sure solenoid is installed in the HVPS.
-        # Convert the current argument to a float to make sure input has a decimal point.
-        # Convert the float back to a string with two decimal places.
-        # Input the current value into the command.
-
-        if 'SL' not in self.occupied_channels:
+        """Sets the solenoid current. Max current is 3.0 A."""
+        command = self.solenoid_current_command(current)
+        if command is None:
             return
-
-        num = float(current)
-        current = f'{num:.2f}'
-        command = f'STSLT00{current}'
         response = self.send_query(command)
         print(f'set_solenoid_current response: "{response}"')
+        return COMMANDS['set_solenoid_current'].decode(command, response)
 
+    @instrumented
     def set_voltage(self, channel: str, voltage: str) -> str:
         """Sets the voltage of the specified channel in the HVPS"""
-
-        ##### LOGIC #####
-        # Check to make sure the channel is installed into the HVPS
-        # Disallow setting the solenoid voltage.
-        # Set the prefix of the command.
-        # Get the sign used to set the voltage then remove it from the voltage string.
-        # With the sign removed, pad the front of the string with zeros so voltage has 5 characters.
-        # Put together the command with the prefix, sign, and voltage setting.
-        # Send the query then print and return the response.
-
-        if channel not in self.occupied_channels:
-            raise ValueError(
-                f'"{channel}" is not a valid channel. Valid channels: {self.occupied_channels}'
-            )
-        if channel == 'SL':
-            raise ValueError('"SL" is not a valid channel for setting voltage.')
-
-        command_prefix = f'ST{channel}T'
-
-        if '-' in voltage:
-            sign = '-'
-            voltage = voltage.replace('-', '')
-        else:
-            sign = '+'
-            voltage = voltage.replace('+', '')
-
-        voltage = voltage.zfill(5)
-        command = f'{command_prefix}{sign}{voltage}'
+        command = self.voltage_command(channel, voltage)
         response = self.send_query(command)
         print(f'set_voltage response: "{response}"')
-        return response
+        return COMMANDS['set_voltage'].decode(command, response)
 
-    def get_voltage(self, channel: str) -> str:
+    @instrumented
+    def get_voltage(self, channel: str) -> float:
         "Queries the current voltage of a channel in the HVPS"
-        if channel not in self.occupied_channels:
-            raise ValueError(
-                f'"{channel}" is not a valid channel. Valid channels: {self.occupied_channels}'
-            )
-        command = f'RD{channel}V'
+        command = self.voltage_readback_command(channel)
         response = self.send_query(command)
         print(f'get_voltage response: "{response}"')
-        return response
+        return COMMANDS['read_voltage'].decode(command, response)
 
-    def get_current(self, channel: str) -> str:
+    @instrumented
+    def get_current(self, channel: str) -> float:
         "Queries the current electric-current of a channel in the HVPS"
-        if channel not in self.occupied_channels:
-            raise ValueError(
-                f'"{channel}" is not a valid channel. Valid channels: {self.occupied_channels}'
-            )
-        command = f'RD{channel}C'
+        command = self.current_readback_command(channel)
         response = self.send_query(command)
         print(f'get_current response: "{response}"')
-        return response
+        return COMMANDS['read_current'].decode(command, response)
 
+    @instrumented
+    def read_all_channels(self) -> dict[str, ChannelReading]:
+        """
+        Reads the voltage and current of every occupied channel in one pipelined
+        exchange and returns the parsed readings keyed by channel.
+        """
+        commands = self.all_channels_readback_commands()
+        responses = self.send_queries(commands)
+        return parse_all_channels(self.occupied_channels, commands, responses)
+
+    @instrumented
     def enable_high_voltage(self) -> str:
         """Enables high voltage to be turned on"""
-        command = 'STHV1'
+        command = COMMANDS['enable_high_voltage'].template
         response = self.send_query(command)
         print(f'enable_high_voltage response: "{response}"')
-        return response
+        return COMMANDS['enable_high_voltage'].decode(command, response)
 
+    @instrumented
     def disable_high_voltage(self) -> str:
         """Turns off high voltage"""
-        command = 'STHV0'
+        command = COMMANDS['disable_high_voltage'].template
         response = self.send_query(command)
         print(f'disable_high_voltage response: "{response}"')
-        return response
+        return COMMANDS['disable_high_voltage'].decode(command, response)
 
+    @instrumented
     def enable_solenoid_current(self) -> str:
         """Enables the solenoid current to be turned on"""
-        command = 'STSL1'
+        command = COMMANDS['enable_solenoid_current'].template
         response = self.send_query(command)
         print(f'enable_solenoid response: "{response}"')
-        return response
+        return COMMANDS['enable_solenoid_current'].decode(command, response)
 
+    @instrumented
     def disable_solenoid_current(self) -> str:
         """Turns off solenoid current."""
-        command = 'STSL0'
+        command = COMMANDS['disable_solenoid_current'].template
         response = self.send_query(command)
         print(f'disable_solenoid response: "{response}"')
-        return response
+        return COMMANDS['disable_solenoid_current'].decode(command, response)
 
+    @instrumented
     def enable_wobble(self, channel: str, amplitude: str) -> str | None:
         """Enables wobbling of EX, L1, L2, L3, or L4 channels. Acceptable amplitude values: 0-999"""
 
-        valid_channels = [s for s in self.occupied_channels if s not in ('BM', 'SL')]
-        if channel not in self.occupied_channels:
-            raise ValueError(
-                f'"{channel}" is not a valid channel. Valid channels: {valid_channels}'
-            )
-
-        amplitude = amplitude.zfill(3)
-
-        command = f'ST{channel}WE1A{amplitude}'
+        command = self.enable_wobble_command(channel, amplitude)
         response = self.send_query(command)
         print(f'enable_wobble response: "{response}"')
-        return response
+        return COMMANDS['enable_wobble'].decode(command, response)
 
+    @instrumented
     def disable_wobble(self, channel: str) -> str | None:
         """Disables wobbling"""
 
-        valid_channels = [s for s in self.occupied_channels if s not in ('BM', 'SL')]
-        if channel not in self.occupied_channels:
-            raise ValueError(
-                f'"{channel}" is not a valid channel. Valid channels: {valid_channels}'
-            )
-
-        command = f'ST{channel}WEA0000'
+        command = self.disable_wobble_command(channel)
         response = self.send_query(command)
         print(f'disable_wobble response: "{response}"')
-        return response
+        return COMMANDS['disable_wobble'].decode(command, response)
 
+    @instrumented
     def get_state(self) -> str:
         """Gets the enable state of the HV and solenoid"""
-        command = 'RDSTA'
+        command = COMMANDS['read_state'].template
         response = self.send_query(command)
         print(f'get_state response: "{response}"')
-        return response
+        return COMMANDS['read_state'].decode(command, response)
@@ -0,0 +1,82 @@
+import math
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+NAKS = {
+    'NAK': 'No Error',
+    'NAK0': 'No Error',
+    'NAK1': 'Invalid Command',
+    'NAK2': 'Invalid Parameter',
+    'NAK3': 'Session Expired',
+    'NAK4': 'Time Out',
+}
+NAK_ERRORS = {nak for nak, meaning in NAKS.items() if meaning != 'No Error'}
+
+
+class HVPSError(Exception):
+    """The HVPS answered a command with an error NAK"""
+
+    def __init__(self, command: str, nak: str) -> None:
+        self.command = command
+        self.nak = nak
+        self.meaning = NAKS.get(nak, 'Unknown Error')
+        super().__init__(f'HVPS rejected "{command}": {nak} ({self.meaning})')
+
+
+def check_nak(command: str, response: str) -> str:
+    """Returns the response, or raises HVPSError if it is an error NAK"""
+    if response in NAK_ERRORS:
+        raise HVPSError(command, response)
+    return response
+
+
+def decode_float(command: str, response: str) -> float:
+    """Readbacks are a number, optionally preceded by the echoed command"""
+    check_nak(command, response)
+    try:
+        return float(response.removeprefix(command))
+    except ValueError:
+        raise ValueError(f'Unparsable response "{response}" to "{command}"') from None
+
+
+def decode_reading(command: str, response: str) -> tuple[float, str | None]:
+    """
+    Like `decode_float` but never raises: returns NaN and the decoded NAK (or a
+    parse error) if the HVPS did not return a number. Used for bulk readbacks, where
+    one bad channel should not hide the others.
+    """
+    if response.startswith('NAK'):
+        return math.nan, NAKS.get(response, f'Unknown Error ({response})')
+    try:
+        return float(response.removeprefix(command)), None
+    except ValueError:
+        return math.nan, f'Unparsable response "{response}"'
+
+
+@dataclass(frozen=True, slots=True)
+class HVPSCommand:
+    """One entry of the HVPS command table"""
+
+    template: str  # str.format template of the command, e.g. 'RD{channel}V'
+    decode: Callable[[str, str], Any]  # (command, response) -> result
+    encode: Callable[..., str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Bind the formatter once instead of looking it up on every call
+        object.__setattr__(self, 'encode', self.template.format)
+
+
+COMMANDS: dict[str, HVPSCommand] = {
+    'set_voltage': HVPSCommand('ST{channel}T{sign}{voltage:0>5}', check_nak),
+    'set_solenoid_current': HVPSCommand('STSLT00{current:.2f}', check_nak),
+    'read_voltage': HVPSCommand('RD{channel}V', decode_float),
+    'read_current': HVPSCommand('RD{channel}C', decode_float),
+    'enable_high_voltage': HVPSCommand('STHV1', check_nak),
+    'disable_high_voltage': HVPSCommand('STHV0', check_nak),
+    'enable_solenoid_current': HVPSCommand('STSL1', check_nak),
+    'disable_solenoid_current': HVPSCommand('STSL0', check_nak),
+    'enable_wobble': HVPSCommand('ST{channel}WE1A{amplitude:0>3}', check_nak),
+    'disable_wobble': HVPSCommand('ST{channel}WEA0000', check_nak),
+    'read_state': HVPSCommand('RDSTA', check_nak),
+}
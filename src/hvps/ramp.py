@@ -0,0 +1,293 @@
+import math
+import threading
+import time
+import traceback
+from array import array
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from ..deadline_timer import DeadlineTimer
+from ..instrumentation import METRICS
+from .hvps_api import ChannelReading, HVPSv3, parse_all_channels
+from .hvps_codec import COMMANDS, NAK_ERRORS, HVPSError
+
+
+@dataclass(frozen=True, slots=True)
+class RampProfile:
+    """
+    Set points of every ramped channel at every step, one float64 column per channel.
+    Step k is sent at k * step_interval seconds after the ramp starts; the last step
+    is the target.
+    """
+
+    step_interval: float  # seconds between steps
+    voltages: dict[str, array]  # channel -> set point in V at each step
+
+    def __len__(self) -> int:
+        return len(next(iter(self.voltages.values()), ()))
+
+    @property
+    def duration(self) -> float:
+        return max(len(self) - 1, 0) * self.step_interval
+
+
+def plan_ramp(
+    start: dict[str, float],
+    targets: dict[str, float],
+    rates: dict[str, float],
+    step_interval: float = 0.1,
+    synchronized: bool = True,
+) -> RampProfile:
+    """
+    Computes the step profile from the start to the target voltage of each channel.
+
+    :param start: Voltage of each channel when the ramp starts, in V.
+    :param targets: Target voltage of each channel, in V.
+    :param rates: Maximum ramp rate of each channel, in V/s.
+    :param step_interval: Seconds between steps.
+    :param synchronized: Scale every channel to the duration of the slowest one so
+        all channels move together and arrive at the same step. Otherwise each
+        channel ramps at its own rate and then holds its target.
+    """
+    if step_interval <= 0:
+        raise ValueError(f'step_interval must be positive, got {step_interval}')
+    for channel in targets:
+        if rates.get(channel, 0) <= 0:
+            raise ValueError(f'Ramp rate of {channel} must be positive')
+
+    # Steps each channel needs at its own rate
+    needed = {
+        channel: math.ceil(
+            abs(target - start[channel]) / (rates[channel] * step_interval)
+        )
+        for channel, target in targets.items()
+    }
+    n_steps = max(needed.values(), default=0)
+
+    voltages: dict[str, array] = {}
+    for channel, target in targets.items():
+        first = start[channel]
+        span = n_steps if synchronized else needed[channel]
+        if span == 0:
+            voltages[channel] = array('d', [target] * (n_steps + 1))
+            continue
+        delta = (target - first) / span
+        column = array('d', (first + delta * k for k in range(span + 1)))
+        column[span] = target  # exact target despite rounding
+        column.extend([target] * (n_steps - span))
+        voltages[channel] = column
+    return RampProfile(step_interval, voltages)
+
+
+@dataclass(frozen=True, slots=True)
+class RampResult:
+    """Outcome of one ramp"""
+
+    completed: bool  # True if every step was sent and the targets were verified
+    steps: int  # steps sent
+    duration: float  # seconds from the first step until the ramp finished
+    reason: str | None  # why the ramp stopped early, None if it completed
+    readings: dict[str, ChannelReading]  # last readback of every ramped channel
+    max_jitter: float  # seconds, worst lateness of a step against its deadline
+
+
+class HVPSRamp:
+    """
+    Ramps several HVPS channels to their targets on a common time grid.
+
+    The step profile is computed before the ramp starts. Each step sends the set
+    points of every channel together with their voltage and current readbacks as
+    one pipelined exchange, on a deadline timer so the channels stay in step no
+    matter how long an exchange takes. The ramp aborts if the HVPS rejects a set
+    point, a channel's current exceeds its limit, or a voltage falls more than
+    `voltage_tolerance` behind the set point sent one step earlier. Once every step
+    is sent the readbacks are polled until all channels are within
+    `voltage_tolerance` of their targets.
+    """
+
+    def __init__(
+        self,
+        hvps: HVPSv3,
+        targets: dict[str, float],
+        rates: dict[str, float],
+        step_interval: float = 0.1,
+        current_limits: dict[str, float] | None = None,
+        voltage_tolerance: float | None = 100.0,
+        settle_timeout: float = 5.0,
+        synchronized: bool = True,
+        disable_on_abort: bool = True,
+    ) -> None:
+        """
+        :param hvps: Connected HVPS.
+        :param targets: Target voltage of each channel to ramp, in V.
+        :param rates: Maximum ramp rate of each channel, in V/s.
+        :param step_interval: Seconds between steps.
+        :param current_limits: Largest allowed current readback per channel, in the
+            units the HVPS reports. Channels without a limit are not checked.
+        :param voltage_tolerance: Largest allowed difference in V between a voltage
+            readback and its set point; None disables the check.
+        :param settle_timeout: Seconds to wait after the last step for the voltages
+            to reach their targets.
+        :param synchronized: Move all channels together, see `plan_ramp`.
+        :param disable_on_abort: Turn high voltage off when the ramp aborts.
+        """
+        self.hvps = hvps
+        self.channels = tuple(targets)
+        self.targets = targets
+        self.rates = rates
+        self.step_interval = step_interval
+        self.current_limits = current_limits or {}
+        self.voltage_tolerance = voltage_tolerance
+        self.settle_timeout = settle_timeout
+        self.synchronized = synchronized
+        self.disable_on_abort = disable_on_abort
+
+        # Validate every channel before anything is sent
+        for channel, target in targets.items():
+            hvps.voltage_command(channel, f'{round(target):d}')
+
+        self.profile: RampProfile | None = None
+        self.result: Future[RampResult] = Future()
+        self.timer = DeadlineTimer(step_interval)
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._readback = [
+            command
+            for channel in self.channels
+            for command in (
+                COMMANDS['read_voltage'].encode(channel=channel),
+                COMMANDS['read_current'].encode(channel=channel),
+            )
+        ]
+
+    def start(self, start: dict[str, float] | None = None) -> 'Future[RampResult]':
+        """
+        Plans the ramp and starts it on a background thread. Starts from the
+        voltages read back now unless `start` gives the voltage of every channel.
+        """
+        if self._thread is not None:
+            raise RuntimeError('Ramp already started')
+        if start is None:
+            readings = self._read()
+            start = {channel: readings[channel].voltage for channel in self.channels}
+            errors = [r.error for r in readings.values() if r.error is not None]
+            if errors:
+                raise RuntimeError(f'Could not read the start voltages: {errors}')
+
+        self.profile = plan_ramp(
+            start, self.targets, self.rates, self.step_interval, self.synchronized
+        )
+        self._thread = threading.Thread(target=self._run, name='HVPSRamp')
+        self._thread.start()
+        return self.result
+
+    def abort(self) -> None:
+        """Stops the ramp after the step in progress; the set points are kept"""
+        self._stop_event.set()
+
+    def _read(self) -> dict[str, ChannelReading]:
+        responses = self.hvps.send_queries(self._readback)
+        return parse_all_channels(self.channels, self._readback, responses)
+
+    def _step_commands(self, k: int) -> list[str]:
+        voltage_command = self.hvps.voltage_command
+        return [
+            voltage_command(channel, f'{round(column[k]):d}')
+            for channel, column in self.profile.voltages.items()
+        ]
+
+    def _check(
+        self, readings: dict[str, ChannelReading], setpoints: dict[str, float] | None
+    ) -> str | None:
+        """Returns why the ramp must abort, or None if the readings are fine"""
+        for channel, reading in readings.items():
+            if reading.error is not None:
+                return f'{channel} readback failed: {reading.error}'
+            limit = self.current_limits.get(channel)
+            if limit is not None and abs(reading.current) > limit:
+                return f'{channel} current {reading.current} exceeds {limit}'
+            if setpoints is not None and self.voltage_tolerance is not None:
+                error = abs(reading.voltage - setpoints[channel])
+                if error > self.voltage_tolerance:
+                    return (
+                        f'{channel} is at {reading.voltage} V, '
+                        f'{error:.0f} V from its set point {setpoints[channel]} V'
+                    )
+        return None
+
+    def _run(self) -> None:
+        profile = self.profile
+        n_sets = len(self.channels)
+        readings: dict[str, ChannelReading] = {}
+        reason: str | None = None
+        steps = 0
+        started = time.monotonic()
+        # Build every burst up front so the timed loop only talks to the HVPS
+        bursts = [self._step_commands(k) + self._readback for k in range(len(profile))]
+
+        try:
+            self.timer.start()
+            previous: dict[str, float] | None = None
+            for k, burst in enumerate(bursts):
+                if not self.timer.wait(self._stop_event):
+                    reason = 'Ramp aborted'
+                    break
+                responses = self.hvps.send_queries(burst)
+                steps += 1
+                for command, response in zip(burst[:n_sets], responses[:n_sets]):
+                    if response in NAK_ERRORS:
+                        raise HVPSError(command, response)
+                readings = parse_all_channels(
+                    self.channels, self._readback, responses[n_sets:]
+                )
+                # The outputs lag one step behind, so compare with the previous step
+                reason = self._check(readings, previous)
+                if reason is not None:
+                    break
+                previous = {c: v[k] for c, v in profile.voltages.items()}
+
+            if reason is None:
+                readings, reason = self._settle()
+        except (ConnectionError, HVPSError) as e:
+            reason = str(e)
+        except Exception as e:  # noqa: BLE001 - any fault must still disable HV
+            traceback.print_exc()
+            reason = f'{type(e).__name__}: {e}'
+
+        try:
+            if reason is not None:
+                METRICS.increment('HVPSRamp.aborts')
+                print(f'HVPS ramp stopped: {reason}')
+                if self.disable_on_abort and not self._stop_event.is_set():
+                    try:
+                        self.hvps.disable_high_voltage()
+                    except (ConnectionError, HVPSError) as e:
+                        print(f'Could not disable high voltage: {e}')
+        finally:
+            # Resolved whatever happens, callers wait on it
+            self.result.set_result(
+                RampResult(
+                    completed=reason is None,
+                    steps=steps,
+                    duration=time.monotonic() - started,
+                    reason=reason,
+                    readings=readings,
+                    max_jitter=self.timer.max_jitter,
+                )
+            )
+
+    def _settle(self) -> tuple[dict[str, ChannelReading], str | None]:
+        """Polls the readbacks until every channel is within tolerance of its target"""
+        deadline = time.monotonic() + self.settle_timeout
+        while True:
+            readings = self._read()
+            fault = self._check(readings, None)
+            if fault is not None:
+                return readings, fault
+            reason = self._check(readings, self.targets)
+            if reason is None:
+                return readings, None
+            if time.monotonic() >= deadline:
+                return readings, f'Not settled after {self.settle_timeout} s: {reason}'
+            if self._stop_event.wait(self.step_interval):
+                return readings, 'Ramp aborted'
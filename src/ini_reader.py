@@ -3,6 +3,9 @@ from typing import TypeAlias
 
 ConfigData: TypeAlias = configparser.ConfigParser
 
+STAND_DEVICES = ('RFGenerator', 'HVPS')  # device sections a test stand can have
+DEFAULT_STAND = 'main'
+
 
 def load_config(file_name: str) -> ConfigData:
     config_data = configparser.ConfigParser()
@@ -23,6 +26,80 @@ def find_IP_device(config_data: ConfigData, header: str) -> tuple[str, str, str]
     return device, ip, port
 
 
+def find_worker_process(config_data: ConfigData, header: str) -> bool:
+    """True if the RF acquisition is to run in its own process, off by default"""
+    return config_data.getboolean(header, 'worker_process', fallback=False)
+
+
+def find_poll_rates(
+    config_data: ConfigData, header: str
+) -> dict[str, tuple[float, int]]:
+    """
+    Reads `signal = rate[, priority]` entries, rate in Hz. A missing section gives an
+    empty dict and a missing priority defaults to 0.
+    """
+    rates: dict[str, tuple[float, int]] = {}
+    if not config_data.has_section(header):
+        return rates
+    for signal, value in config_data.items(header):
+        rate, _, priority = value.partition(',')
+        rates[signal] = (float(rate), int(priority or 0))
+    return rates
+
+
+def find_run_log_settings(
+    config_data: ConfigData, header: str
+) -> tuple[str, int, float] | None:
+    """
+    Returns the log directory, maximum file size in bytes and maximum file age in
+    seconds, or None if run logging is not configured.
+    """
+    if not config_data.has_section(header):
+        return None
+    directory = config_data.get(header, 'directory')
+    max_bytes = int(config_data.getfloat(header, 'max_megabytes', fallback=256) * 1e6)
+    max_seconds = config_data.getfloat(header, 'max_hours', fallback=24) * 3600
+    return directory, max_bytes, max_seconds
+
+
+def find_cache_file(config_data: ConfigData, header: str) -> str | None:
+    """Returns the device cache file, or None if the section or setting is missing"""
+    return config_data.get(header, 'file', fallback=None)
+
+
+def find_stands(config_data: ConfigData) -> dict[str, dict[str, str]]:
+    """
+    Maps each test stand to the ini sections of its devices. The sections of a
+    stand are named "<device>.<stand>", e.g. [RFGenerator.B] and [HVPS.B]; the plain
+    [RFGenerator] and [HVPS] sections belong to the stand named DEFAULT_STAND.
+    """
+    stands: dict[str, dict[str, str]] = {}
+    for section in config_data.sections():
+        device, _, stand = section.partition('.')
+        if device in STAND_DEVICES:
+            stands.setdefault(stand or DEFAULT_STAND, {})[device] = section
+    return stands
+
+
+def find_stand_poll_interval(config_data: ConfigData, header: str) -> float:
+    """Seconds between overview polls of every stand, 1 s if not configured"""
+    return config_data.getfloat(header, 'poll_interval', fallback=1.0)
+
+
+def find_daemon_settings(
+    config_data: ConfigData, header: str
+) -> tuple[str, int, str | None, float]:
+    """
+    Returns the TCP host and port, the Unix socket path (None to serve TCP) and the
+    RF acquisition interval in seconds of the headless daemon.
+    """
+    host = config_data.get(header, 'host', fallback='127.0.0.1')
+    port = config_data.getint(header, 'port', fallback=8765)
+    path = config_data.get(header, 'socket', fallback=None)
+    interval = config_data.getfloat(header, 'rf_interval', fallback=1.0)
+    return host, port, path, interval
+
+
 if __name__ == '__main__':
     ini_file = 'hyperionTestStandControl.ini'
     config_data = load_config(ini_file)
@@ -30,3 +107,9 @@ if __name__ == '__main__':
     hvps_device, hvps_ip, hvps_port = find_IP_device(config_data, 'HVPS')
     print(f'{rf_device = }\n{com_port = }')
     print(f'{hvps_device = }\n{hvps_ip = }\n{hvps_port = }')
+    print(f'{find_worker_process(config_data, "RFGenerator") = }')
+    print(f'{find_poll_rates(config_data, "Acquisition") = }')
+    print(f'{find_run_log_settings(config_data, "RunLog") = }')
+    print(f'{find_cache_file(config_data, "Cache") = }')
+    print(f'{find_stands(config_data) = }')
+    print(f'{find_daemon_settings(config_data, "Daemon") = }')
@@ -0,0 +1,181 @@
+import functools
+import inspect
+import math
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+class LatencyHistogram:
+    """
+    Histogram of durations on log-spaced buckets, `BUCKETS_PER_DECADE` per factor
+    of ten from 1 us up to 100 s. Recording is O(1) and memory is fixed.
+    """
+
+    MIN_SECONDS = 1e-6
+    BUCKETS_PER_DECADE = 10
+    N_BUCKETS = 8 * BUCKETS_PER_DECADE + 1  # the last bucket collects anything longer
+
+    def __init__(self) -> None:
+        self.buckets = [0] * self.N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        if seconds <= self.MIN_SECONDS:
+            index = 0
+        else:
+            index = int(
+                math.log10(seconds / self.MIN_SECONDS) * self.BUCKETS_PER_DECADE
+            )
+            index = min(index, self.N_BUCKETS - 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def bucket_upper_bound(self, index: int) -> float:
+        return self.MIN_SECONDS * 10 ** ((index + 1) / self.BUCKETS_PER_DECADE)
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th fraction of the recordings"""
+        if not self.count:
+            return 0.0
+        target = p * self.count
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(self.bucket_upper_bound(index), self.max)
+        return self.max
+
+    def snapshot(self) -> dict[str, float | int]:
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1e3 if self.count else 0.0,
+            'min_ms': self.min * 1e3 if self.count else 0.0,
+            'p50_ms': self.percentile(0.50) * 1e3,
+            'p90_ms': self.percentile(0.90) * 1e3,
+            'p99_ms': self.percentile(0.99) * 1e3,
+            'max_ms': self.max * 1e3,
+        }
+
+
+class Metrics:
+    """
+    Registry of latency histograms and event counters. Everything is a no-op while
+    `enabled` is False, which is the default.
+
+    Snapshots of other processes' registries, e.g. an AcquisitionProcess worker's,
+    are added with `update_remote` and shown under the name of their source.
+    Listeners hear of `set_enabled` and `reset` so they can pass them on.
+    """
+
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.counters: Counter[str] = Counter()
+        self.remote: dict[str, dict[str, dict]] = {}
+        self.listeners: list[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self._notify('enabled' if enabled else 'disabled')
+
+    def add_listener(self, callback: Callable[[str], None]) -> None:
+        """Register a callback passed 'enabled', 'disabled' or 'reset'"""
+        # Replaced rather than changed, like DataAcquisition's listeners
+        self.listeners = [*self.listeners, callback]
+
+    def remove_listener(self, callback: Callable[[str], None]) -> None:
+        self.listeners = [c for c in self.listeners if c != callback]
+
+    def _notify(self, event: str) -> None:
+        for callback in self.listeners:
+            callback(event)
+
+    def update_remote(self, source: str, snapshot: dict[str, dict]) -> None:
+        """Replace the snapshot last received from `source`"""
+        with self._lock:
+            self.remote[source] = snapshot
+
+    def record_latency(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def increment(self, name: str, n: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += n
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            latency = {k: h.snapshot() for k, h in self.histograms.items()}
+            counters = dict(self.counters)
+            for source, snapshot in self.remote.items():
+                for k, stats in snapshot['latency'].items():
+                    latency[f'{source}.{k}'] = stats
+                for k, n in snapshot['counters'].items():
+                    counters[f'{source}.{k}'] = n
+        return {
+            'latency': dict(sorted(latency.items())),
+            'counters': dict(sorted(counters.items())),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.remote.clear()
+        self._notify('reset')
+
+
+METRICS = Metrics()
+
+
+def instrumented(func: F) -> F:
+    """
+    Records the latency of every call to `func` under its qualified name, e.g.
+    "VRG.read_frequency". Costs one attribute check per call while disabled.
+    """
+    name = func.__qualname__
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                METRICS.record_latency(name, time.perf_counter() - start)
+
+        return async_wrapper  # type: ignore[return-value]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not METRICS.enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            METRICS.record_latency(name, time.perf_counter() - start)
+
+    return wrapper  # type: ignore[return-value]
@@ -0,0 +1,422 @@
+import heapq
+import threading
+import time
+import traceback
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from .hvps.hvps_api import parse_all_channels
+from .hvps.hvps_codec import COMMANDS
+from .ini_reader import ConfigData, find_poll_rates
+
+if TYPE_CHECKING:
+    from .hvps.hvps_api import HVPSv3
+    from .rf.rfgenerator_control import RFGenerator
+
+# Rate (Hz) and priority used for a signal that has no entry in the ini file. An
+# HVPS channel without its own entry, e.g. hvps_L1, is read at the hvps_channels rate.
+DEFAULT_POLL_RATES: dict[str, tuple[float, int]] = {
+    'rf_forward_power': (1.0, 1),
+    'rf_reflected_power': (1.0, 1),
+    'rf_absorbed_power': (1.0, 1),
+    'rf_frequency': (1.0, 0),
+    'hvps_channels': (1.0, 0),
+    'hvps_state': (0.2, 0),
+}
+
+# RF generator signals and the VRG command that reads each of them
+RF_SIGNALS: dict[str, str] = {
+    'rf_forward_power': 'RF',
+    'rf_reflected_power': 'RR',
+    'rf_absorbed_power': 'RB',
+    'rf_frequency': 'RQ',
+}
+
+
+@dataclass(slots=True)
+class PolledSignal:
+    name: str
+    read: Callable[[], Any] | None  # None when read through its group
+    interval: float  # seconds
+    priority: int  # larger numbers are read first when several signals are due
+    group: str | None = None  # signals of one group that are due are read together
+    next_due: float = 0.0  # time.monotonic value
+    value: Any = None
+    timestamp: float = 0.0  # seconds since the epoch of the latest value
+    reads: int = 0
+    errors: int = 0
+    missed: int = 0  # deadlines skipped because the scheduler fell behind
+    last_jitter: float = 0.0  # seconds between the deadline and the read
+    max_jitter: float = 0.0
+    total_jitter: float = 0.0
+    _order: int = field(default=0, repr=False)
+    _generation: int = field(
+        default=0, repr=False
+    )  # queue entries of older ones are stale
+
+
+class PollScheduler:
+    """
+    Polls any number of device signals, each at its own rate, from one thread.
+
+    All deadlines are on one monotonic time base. When several signals are due at
+    once the higher priority ones are read first, and a signal that falls a whole
+    period behind skips the missed deadlines instead of bursting to catch up.
+
+    Signals of one device can share a group, whose reader takes the names of the
+    group's signals that are due and returns their values from one pipelined
+    exchange, so a faster rate for one signal does not cost a round trip per signal.
+    """
+
+    def __init__(self) -> None:
+        self.signals: dict[str, PolledSignal] = {}
+        self.groups: dict[str, Callable[[list[str]], dict[str, Any]]] = {}
+        self.listeners: list[Callable[[str, float, Any], None]] = []
+        self.group_listeners: list[Callable[[str, float, dict[str, Any]], None]] = []
+        self.running: bool = False
+        self.thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._queue: list[tuple[float, int, int, int, PolledSignal]] = []
+        self._mono_start = time.monotonic()
+        self._wall_start = time.time()
+
+    def add_group(self, name: str, read: Callable[[list[str]], dict[str, Any]]) -> None:
+        """
+        Registers `read(names)`, which reads the named signals of group `name` at
+        once and returns their values by name, replacing an earlier reader of that
+        group. A signal it leaves out counts as a failed read.
+        """
+        self.groups[name] = read
+
+    def add_signal(
+        self,
+        name: str,
+        read: Callable[[], Any] | None,
+        rate: float,
+        priority: int = 0,
+        group: str | None = None,
+    ) -> None:
+        """
+        Registers `read` to be called `rate` times per second. A signal of a `group`
+        is read by the group's reader instead and passes None.
+        """
+        if rate <= 0:
+            raise ValueError(f'Poll rate for {name} must be positive, got {rate}')
+        if name in self.signals:
+            raise ValueError(f'Signal {name} is already registered')
+        if (group is None) == (read is None):
+            raise ValueError(f'Signal {name} needs either a reader or a group')
+        if group is not None and group not in self.groups:
+            raise ValueError(f'Group {group} of signal {name} is not registered')
+        with self._lock:
+            signal = PolledSignal(name, read, 1 / rate, priority, group)
+            signal._order = len(self.signals)
+            self.signals[name] = signal
+            if self.running:
+                self._push(signal, time.monotonic())
+
+    def remove_signal(self, name: str) -> None:
+        """Stops polling a signal, a read already under way still completes"""
+        with self._lock:
+            signal = self.signals.pop(name, None)
+            if signal is not None:
+                signal._generation += 1
+
+    def set_rate(self, name: str, rate: float) -> None:
+        """Changes the rate of a signal, which is read next at its new interval"""
+        if rate <= 0:
+            raise ValueError(f'Poll rate for {name} must be positive, got {rate}')
+        with self._lock:
+            signal = self.signals[name]
+            interval = 1 / rate
+            if interval == signal.interval:
+                return
+            # Rescheduled on a new grid from the previous deadline, so a faster rate
+            # takes effect within one new interval instead of one old one
+            due = signal.next_due - signal.interval + interval
+            signal.interval = interval
+            signal._generation += 1
+            if self.running:
+                self._push(signal, due)
+
+    def add_listener(self, callback: Callable[[str, float, Any], None]) -> None:
+        """`callback(name, timestamp, value)` is called from the poll thread per read"""
+        # Replaced rather than changed, so listeners can come and go from any thread
+        self.listeners = [*self.listeners, callback]
+
+    def remove_listener(self, callback: Callable[[str, float, Any], None]) -> None:
+        self.listeners = [c for c in self.listeners if c != callback]
+
+    def add_group_listener(
+        self, callback: Callable[[str, float, dict[str, Any]], None]
+    ) -> None:
+        """
+        `callback(group, timestamp, values)` is called from the poll thread after
+        each read of a group, with the values of the signals that were read
+        """
+        self.group_listeners = [*self.group_listeners, callback]
+
+    def remove_group_listener(
+        self, callback: Callable[[str, float, dict[str, Any]], None]
+    ) -> None:
+        self.group_listeners = [c for c in self.group_listeners if c != callback]
+
+    def latest(self, name: str) -> tuple[float, Any]:
+        """Returns the timestamp and value of the newest read of a signal"""
+        signal = self.signals[name]
+        return signal.timestamp, signal.value
+
+    def start(self) -> None:
+        if not self.running:
+            self.running = True
+            self._stop_event.clear()
+            now = time.monotonic()
+            with self._lock:
+                self._queue.clear()
+                for signal in self.signals.values():
+                    signal._generation += 1
+                    self._push(signal, now)
+            self.thread = threading.Thread(
+                target=self._run, name='PollScheduler', daemon=True
+            )
+            self.thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        self._stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _push(self, signal: PolledSignal, due: float) -> None:
+        signal.next_due = due
+        heapq.heappush(
+            self._queue,
+            (due, -signal.priority, signal._order, signal._generation, signal),
+        )
+
+    def _run(self) -> None:
+        while self.running:
+            with self._lock:
+                next_due = self._queue[0][0] if self._queue else None
+            now = time.monotonic()
+            if next_due is None or next_due > now:
+                delay = 0.1 if next_due is None else next_due - now
+                if self._stop_event.wait(delay):
+                    break
+                continue
+
+            # Take every signal that is due and read them highest priority first.
+            # Entries of removed or rescheduled signals are dropped on the way.
+            due: list[PolledSignal] = []
+            generations: dict[str, int] = {}
+            with self._lock:
+                while self._queue and self._queue[0][0] <= now:
+                    *_, generation, signal = heapq.heappop(self._queue)
+                    if generation == signal._generation:
+                        due.append(signal)
+                        generations[signal.name] = generation
+            due.sort(key=lambda s: (-s.priority, s.next_due, s._order))
+
+            read_groups: set[str] = set()
+            for signal in due:
+                if signal.group is None:
+                    self._poll(signal)
+                elif signal.group not in read_groups:
+                    # The whole group is read when its first due signal comes up
+                    read_groups.add(signal.group)
+                    self._poll_group(
+                        signal.group, [s for s in due if s.group == signal.group]
+                    )
+
+            now = time.monotonic()
+            with self._lock:
+                for signal in due:
+                    if signal._generation != generations[signal.name]:
+                        continue  # removed or rescheduled while it was being read
+                    next_due = signal.next_due + signal.interval
+                    if next_due <= now:
+                        missed = int((now - next_due) // signal.interval) + 1
+                        signal.missed += missed
+                        next_due += missed * signal.interval
+                    self._push(signal, next_due)
+
+    def _timestamp(self) -> float:
+        # Timestamps share the scheduler's monotonic time base.
+        return self._wall_start + (time.monotonic() - self._mono_start)
+
+    def _start_read(self, signal: PolledSignal) -> None:
+        jitter = time.monotonic() - signal.next_due
+        signal.last_jitter = jitter
+        signal.max_jitter = max(signal.max_jitter, jitter)
+        signal.total_jitter += jitter
+
+    def _poll(self, signal: PolledSignal) -> None:
+        # Neither a failing read nor a failing listener may stop the poll thread
+        self._start_read(signal)
+        try:
+            value = signal.read()
+        except Exception as e:  # noqa: BLE001
+            signal.errors += 1
+            traceback.print_exc()
+            print(f'\nError while polling {signal.name}: {e}\n')
+            return
+        self._update(signal, self._timestamp(), value)
+
+    def _poll_group(self, group: str, signals: list[PolledSignal]) -> None:
+        for signal in signals:
+            self._start_read(signal)
+        try:
+            values = self.groups[group]([s.name for s in signals])
+        except Exception as e:  # noqa: BLE001
+            for signal in signals:
+                signal.errors += 1
+            traceback.print_exc()
+            print(f'\nError while polling {group}: {e}\n')
+            return
+
+        timestamp = self._timestamp()
+        read: dict[str, Any] = {}
+        for signal in signals:
+            if signal.name in values:
+                read[signal.name] = values[signal.name]
+                self._update(signal, timestamp, values[signal.name])
+            else:
+                signal.errors += 1
+        for callback in self.group_listeners:
+            try:
+                callback(group, timestamp, read)
+            except Exception as e:  # noqa: BLE001
+                traceback.print_exc()
+                print(f'\nError in a listener of {group}: {e}\n')
+
+    def _update(self, signal: PolledSignal, timestamp: float, value: Any) -> None:
+        signal.value = value
+        signal.timestamp = timestamp
+        signal.reads += 1
+        for callback in self.listeners:
+            try:
+                callback(signal.name, timestamp, value)
+            except Exception as e:  # noqa: BLE001
+                traceback.print_exc()
+                print(f'\nError in a listener of {signal.name}: {e}\n')
+
+    def stats(self) -> dict[str, dict[str, float | int]]:
+        return {
+            name: {
+                'rate': 1 / s.interval,
+                'priority': s.priority,
+                'reads': s.reads,
+                'errors': s.errors,
+                'missed': s.missed,
+                'last_jitter': s.last_jitter,
+                'max_jitter': s.max_jitter,
+                'mean_jitter': s.total_jitter / (s.reads + s.errors)
+                if s.reads + s.errors
+                else 0.0,
+            }
+            for name, s in self.signals.items()
+        }
+
+
+def hvps_channel_signal(channel: str) -> str:
+    """Name of the signal that reads one HVPS channel, e.g. hvps_L1"""
+    return f'hvps_{channel}'
+
+
+def add_rf_signals(
+    scheduler: PollScheduler,
+    rf_generator: 'RFGenerator',
+    rates: dict[str, tuple[float, int]],
+) -> list[str]:
+    """
+    Registers the RF generator signals that have a positive rate in `rates` as the
+    'rf' group, so the ones due together are read in one pipelined exchange.
+    Returns the names of the registered signals.
+    """
+
+    def read(names: list[str]) -> dict[str, Any]:
+        values = rf_generator.read_values([RF_SIGNALS[name] for name in names])
+        return {
+            name: values[RF_SIGNALS[name]]
+            for name in names
+            if RF_SIGNALS[name] in values
+        }
+
+    scheduler.add_group('rf', read)
+    return _add_group_signals(scheduler, 'rf', list(RF_SIGNALS), rates)
+
+
+def add_hvps_signals(
+    scheduler: PollScheduler,
+    hvps: 'HVPSv3',
+    rates: dict[str, tuple[float, int]],
+) -> list[str]:
+    """
+    Registers a signal per occupied HVPS channel, whose value is its ChannelReading,
+    and the HV state as the 'hvps' group, so the ones due together are read in one
+    pipelined exchange. A channel without a rate of its own in `rates` is read at
+    the hvps_channels rate. Returns the names of the registered signals.
+    """
+    channels = {
+        hvps_channel_signal(channel): channel for channel in hvps.occupied_channels
+    }
+    read_state = COMMANDS['read_state']
+
+    def read(names: list[str]) -> dict[str, Any]:
+        due = tuple(channels[name] for name in names if name in channels)
+        commands = hvps.all_channels_readback_commands(due)
+        if 'hvps_state' in names:
+            commands.append(read_state.template)
+        responses = hvps.send_queries(commands)
+        readings = parse_all_channels(due, commands, responses)
+        values: dict[str, Any] = {
+            hvps_channel_signal(channel): reading
+            for channel, reading in readings.items()
+        }
+        if 'hvps_state' in names:
+            values['hvps_state'] = read_state.decode(commands[-1], responses[-1])
+        return values
+
+    channel_rate = rates['hvps_channels']
+    rates = {name: rates.get(name, channel_rate) for name in channels} | {
+        'hvps_state': rates['hvps_state']
+    }
+    scheduler.add_group('hvps', read)
+    return _add_group_signals(scheduler, 'hvps', [*channels, 'hvps_state'], rates)
+
+
+def _add_group_signals(
+    scheduler: PollScheduler,
+    group: str,
+    names: list[str],
+    rates: dict[str, tuple[float, int]],
+) -> list[str]:
+    added = []
+    for name in names:
+        rate, priority = rates[name]
+        if rate > 0:  # a rate of 0 in the ini file disables the signal
+            scheduler.add_signal(name, None, rate, priority, group=group)
+            added.append(name)
+    return added
+
+
+def build_poll_scheduler(
+    config_data: ConfigData,
+    rf_generator: 'RFGenerator | None' = None,
+    hvps: 'HVPSv3 | None' = None,
+) -> PollScheduler:
+    """
+    Creates a PollScheduler for the RF generator and/or HVPS with the rates and
+    priorities from the [Acquisition] section of the ini file. DataAcquisition
+    registers the RF signals itself, on its own scheduler or on a shared one.
+    """
+    rates = DEFAULT_POLL_RATES | find_poll_rates(config_data, 'Acquisition')
+    scheduler = PollScheduler()
+    if rf_generator is not None:
+        add_rf_signals(scheduler, rf_generator, rates)
+    if hvps is not None:
+        add_hvps_signals(scheduler, hvps, rates)
+    return scheduler
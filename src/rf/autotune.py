@@ -0,0 +1,193 @@
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from ..rf.rf_data_acquisition import DataAcquisition
+from ..rf.rfgenerator_control import RFGenerator
+from ..rf.sample_history import Sample
+
+
+@dataclass(frozen=True, slots=True)
+class AutotuneResult:
+    """Outcome of one autotune"""
+
+    narrow: bool  # True for the narrow range tune (TT), False for wide (TW)
+    settled: bool  # False if the readings did not settle before the timeout
+    settle_time: float  # seconds from sending the command until the readings settled
+    frequency: float  # MHz, last frequency read
+    reflected_power: float  # W, last reflected power read
+
+
+class Autotune:
+    """
+    Runs one autotune and watches the acquired samples until the tune has settled.
+
+    While tuning, data acquisition is switched to a fast poll burst. The tune is
+    settled once frequency and reflected power have stayed within their tolerances
+    for `settle_window` seconds; the settle time is measured to the first sample of
+    that quiet stretch. A quiet stretch only counts once the frequency has moved
+    away from where it was when the command was acknowledged, or after
+    `min_tune_time` if it never does, since the generator may not have started
+    moving yet. A timer ends the tune after `timeout` seconds even if no samples
+    arrive. The normal acquisition interval is restored afterwards.
+    """
+
+    def __init__(
+        self,
+        rf_generator: RFGenerator,
+        data_acquisition: DataAcquisition,
+        narrow: bool = False,
+        burst_interval: float = 0.05,
+        settle_window: float = 0.5,
+        freq_tolerance: float = 0.01,
+        refl_tolerance: float = 1.0,
+        min_tune_time: float = 1.5,
+        timeout: float = 10.0,
+        on_finished: Callable[[AutotuneResult], None] | None = None,
+    ) -> None:
+        """
+        :param rf_generator: The RF generator to tune.
+        :param data_acquisition: The running acquisition of that generator.
+        :param narrow: Use the narrow range tune (TT) instead of the wide one (TW).
+        :param burst_interval: Acquisition interval in seconds while tuning.
+        :param settle_window: Seconds the readings must stay within tolerance.
+        :param freq_tolerance: Allowed frequency change in MHz while settled.
+        :param refl_tolerance: Allowed reflected power change in W while settled.
+        :param min_tune_time: Seconds after which a tune that has not moved the
+            frequency may settle, about the time the generator takes to tune.
+        :param timeout: Seconds to wait for the readings to settle.
+        :param on_finished: Called with the result, from the acquisition thread or
+            the timeout timer.
+        """
+        self.rf_generator = rf_generator
+        self.data_acquisition = data_acquisition
+        self.narrow = narrow
+        self.burst_interval = burst_interval
+        self.settle_window = settle_window
+        self.freq_tolerance = freq_tolerance
+        self.refl_tolerance = refl_tolerance
+        self.min_tune_time = min_tune_time
+        self.timeout = timeout
+        self.on_finished = on_finished
+
+        self.result: Future[AutotuneResult] = Future()
+        self._lock = threading.Lock()
+        self._sent_at: float = 0.0  # when the command was sent, epoch seconds
+        self._acknowledged: bool = False
+        self._start_frequency: float | None = None  # MHz when acknowledged
+        self._moved: bool = False  # the frequency has left the start frequency
+        self._previous_interval: float = data_acquisition.interval
+        self._window: deque[Sample] = deque()
+        self._last_sample: Sample | None = None
+        self._timer: threading.Timer | None = None
+
+    def start(self) -> 'Future[AutotuneResult]':
+        """Sends the tune command and returns a Future for the result"""
+        if not self.data_acquisition.running:
+            raise RuntimeError('Autotune needs data acquisition to be running')
+
+        self._previous_interval = self.data_acquisition.interval
+        self.data_acquisition.set_interval(self.burst_interval)
+        self.data_acquisition.add_listener(self._on_sample)
+
+        self._sent_at = time.time()
+        self._timer = threading.Timer(self.timeout, self._on_timeout)
+        self._timer.daemon = True
+        self._timer.start()
+        if self.narrow:
+            command = self.rf_generator.narrow_auto_tune()
+        else:
+            command = self.rf_generator.auto_tune()
+        command.add_done_callback(self._on_command_done)
+        return self.result
+
+    def _on_command_done(self, command: Future) -> None:
+        error = None if command.cancelled() else command.exception()
+        if command.cancelled() or error is not None:
+            self._finish(error=error or RuntimeError('autotune command cancelled'))
+            return
+        with self._lock:
+            self._acknowledged = True
+            if self._last_sample is not None:
+                self._start_frequency = self._last_sample.frequency
+
+    def _on_sample(self, sample: Sample) -> None:
+        with self._lock:
+            if sample.timestamp < self._sent_at:
+                return
+            self._last_sample = sample
+            if not self._acknowledged:
+                return
+            if self._start_frequency is None:
+                self._start_frequency = sample.frequency
+            if abs(sample.frequency - self._start_frequency) > self.freq_tolerance:
+                self._moved = True
+            window = self._window
+            window.append(sample)
+            if (
+                not self._moved
+                and sample.timestamp - self._sent_at < self.min_tune_time
+            ):
+                # Too early to tell a finished tune from one that has not started
+                window.clear()
+                return
+
+            # Keep only the newest stretch of samples that are within tolerance
+            while not self._is_quiet(window):
+                window.popleft()
+            quiet_since = window[0].timestamp
+            settled = sample.timestamp - quiet_since >= self.settle_window
+
+        if settled:
+            self._finish(
+                AutotuneResult(
+                    narrow=self.narrow,
+                    settled=True,
+                    settle_time=quiet_since - self._sent_at,
+                    frequency=sample.frequency,
+                    reflected_power=sample.reflected_power,
+                )
+            )
+
+    def _on_timeout(self) -> None:
+        with self._lock:
+            sample = self._last_sample  # None if acquisition stalled
+        self._finish(
+            AutotuneResult(
+                narrow=self.narrow,
+                settled=False,
+                settle_time=time.time() - self._sent_at,
+                frequency=sample.frequency if sample else math.nan,
+                reflected_power=sample.reflected_power if sample else math.nan,
+            )
+        )
+
+    def _is_quiet(self, window: deque[Sample]) -> bool:
+        freqs = [s.frequency for s in window]
+        refls = [s.reflected_power for s in window]
+        return (
+            max(freqs) - min(freqs) <= self.freq_tolerance
+            and max(refls) - min(refls) <= self.refl_tolerance
+        )
+
+    def _finish(
+        self, result: AutotuneResult | None = None, error: BaseException | None = None
+    ) -> None:
+        with self._lock:
+            if self.result.done():
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self.data_acquisition.remove_listener(self._on_sample)
+            self.data_acquisition.set_interval(self._previous_interval)
+            if error is not None:
+                self.result.set_exception(error)
+                return
+            self.result.set_result(result)
+
+        if self.on_finished is not None and result is not None:
+            self.on_finished(result)
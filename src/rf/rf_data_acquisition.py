@@ -1,76 +1,159 @@
-import threading  # Used to run the data acquisition process in a separate thread
-import time  # Used to introduce delays between data fetches.
-import traceback  # Used for printing stack traces in case of exceptions.
+from collections.abc import Callable
 from datetime import datetime  # Used to capture timestamps for the data.
+from typing import Any
 
+from ..poll_scheduler import (
+    DEFAULT_POLL_RATES,
+    RF_SIGNALS,
+    PollScheduler,
+    add_rf_signals,
+)
 from ..rf.rfgenerator_control import RFGenerator
+from ..rf.sample_history import Sample, SampleHistory
 
 
 class DataAcquisition:
-    def __init__(self, rf_generator: RFGenerator, interval: float = 1) -> None:
+    def __init__(
+        self,
+        rf_generator: RFGenerator,
+        interval: float = 1,
+        history_capacity: int = 86400,
+        history: SampleHistory | None = None,
+        rates: dict[str, tuple[float, int]] | None = None,
+        scheduler: PollScheduler | None = None,
+    ) -> None:
         """
         Initialize the DataAcquisition class.
 
         :param rf_generator: An instance of the RFGenerator class (or similar device).
-        :param interval: Time interval (in seconds) between data fetches.
+        :param interval: Longest time (in seconds) between two reads of any RF signal.
+        :param history_capacity: Number of samples kept in the history ring buffer.
+        :param history: Ring buffer to append to instead of a new one, e.g. in shared memory.
+        :param rates: Rate in Hz and priority per RF signal, e.g. rf_reflected_power, as read by find_poll_rates. A signal is read at its rate when that is faster than `interval`, and not at all at a rate of 0.
+        :param scheduler: PollScheduler to read on, e.g. one that also polls the HVPS. Its owner starts and stops it; by default the acquisition has its own.
         """
         self.rf_generator: RFGenerator = rf_generator
         self.interval: float = interval
+        self.rates = rates or {}
         self.running: bool = False
 
         # Store the latest fetched values
         self.timestamp: datetime = datetime.now()
         self.forward_power: int = 0
-        self.refl_power: int = 0
+        self.reflected_power: int = 0
         self.absorbed_power: float = 0.0
         self.frequency: float = 0.0
 
-        # Background thread for fetching data
-        self.thread = None
+        # Fixed-size history of every fetched sample
+        self.history = (
+            history if history is not None else SampleHistory(history_capacity)
+        )
 
-    def start(self) -> None:
+        # Callbacks that receive every new sample, called from the acquisition thread
+        self.listeners: list[Callable[[Sample], None]] = []
+
+        # The RF signals are read on the poll scheduler's thread. Signals due at the
+        # same time are read in one exchange, and each read adds a sample that
+        # holds the newest value of every signal.
+        self.scheduler = scheduler if scheduler is not None else PollScheduler()
+        self._own_scheduler = scheduler is None
+        self.signals: list[str] = []
+        self._timing_stats: dict[str, dict[str, float | int]] = {}
+
+    def start(self, enable_rf: bool = True) -> None:
         """
         Start the data acquisition process.
+
+        :param enable_rf: Also turn the RF output on. Monitoring-only users pass False.
         """
         if not self.running:
             self.running = True
-            self.thread = threading.Thread(target=self._run)
-            self.thread.start()
-            self.rf_generator.enable()  ################################### Not sure about this
+            self.scheduler.add_group_listener(self._on_read)
+            self.signals = add_rf_signals(
+                self.scheduler, self.rf_generator, self._signal_rates()
+            )
+            if self._own_scheduler:
+                self.scheduler.start()
+            if enable_rf:
+                self.rf_generator.enable()  ############################ Not sure about this
 
     def stop(self) -> None:
         """
         Stop the data acquisition process.
         """
         self.running = False
-        if self.thread is not None:
-            self.thread.join()
+        if self._own_scheduler:
+            self.scheduler.stop()
+        self.scheduler.remove_group_listener(self._on_read)
+        self._timing_stats = self.get_timing_stats()  # kept for after the stop
+        for name in self.signals:
+            self.scheduler.remove_signal(name)
+        self.signals = []
+
+    def _signal_rates(self) -> dict[str, tuple[float, int]]:
+        rates: dict[str, tuple[float, int]] = {}
+        for name in RF_SIGNALS:
+            rate, priority = self.rates.get(name, (0.0, DEFAULT_POLL_RATES[name][1]))
+            if name not in self.rates or rate > 0:
+                rate = max(rate, 1 / self.interval)
+            rates[name] = (rate, priority)
+        return rates
 
-    def _run(self) -> None:
+    def add_listener(self, callback: Callable[[Sample], None]) -> None:
         """
-        Run the data acquisition loop in the background.
+        Register a callback that is passed every new sample. Callbacks run on the
+        acquisition thread, so they must return quickly.
         """
-        while self.running:
-            self._fetch_data()
-            time.sleep(self.interval)
+        # The list is replaced rather than changed, so listeners can be added or
+        # removed from any thread, including from inside a callback.
+        self.listeners = [*self.listeners, callback]
 
-    def _fetch_data(self) -> None:
+    def remove_listener(self, callback: Callable[[Sample], None]) -> None:
+        self.listeners = [c for c in self.listeners if c != callback]
+
+    def set_interval(self, interval: float) -> None:
         """
-        Fetch data from the RF generator and update the internal state.
+        Change the longest time between reads of a signal, effective from the next read.
         """
-        if not self.rf_generator:
-            return
+        self.interval = interval
+        rates = self._signal_rates()
+        for name in self.signals:
+            self.scheduler.set_rate(name, rates[name][0])
 
-        try:
-            self.timestamp: datetime = datetime.now()
-            self.forward_power: int = self.rf_generator.get_forward_power()
-            self.reflected_power: int = self.rf_generator.get_refl_power()
-            self.absorbed_power: float = self.rf_generator.get_absorbed_power()
-            self.frequency: float = self.rf_generator.get_frequency()
+    def get_timing_stats(self) -> dict[str, dict[str, float | int]]:
+        """
+        Get the scheduling statistics of the RF signals.
+
+        :return: A dictionary per signal with its rate, read, error and missed deadline counts, and last, max and mean jitter in seconds.
+        """
+        if not self.signals:
+            return self._timing_stats  # as they were when acquisition stopped
+        stats = self.scheduler.stats()
+        return {name: stats[name] for name in self.signals if name in stats}
+
+    def _on_read(self, group: str, timestamp: float, values: dict[str, Any]) -> None:
+        """
+        Update the internal state with the signals that were just read and record
+        a sample.
+        """
+        if group != 'rf' or not values:
+            return
 
-        except Exception as e:
-            traceback.print_exc()
-            print(f'\nError while fetching data: {e}\n')
+        self.timestamp = datetime.fromtimestamp(timestamp)
+        self.forward_power = values.get('rf_forward_power', self.forward_power)
+        self.reflected_power = values.get('rf_reflected_power', self.reflected_power)
+        self.absorbed_power = values.get('rf_absorbed_power', self.absorbed_power)
+        self.frequency = values.get('rf_frequency', self.frequency)
+        sample = Sample(
+            timestamp,
+            self.forward_power,
+            self.reflected_power,
+            self.absorbed_power,
+            self.frequency,
+        )
+        self.history.append(sample)
+        for callback in self.listeners:
+            callback(sample)
 
     def get_data(self) -> dict[str, str | int | float]:
         """
@@ -1,19 +1,47 @@
-import threading
+from collections.abc import Sequence
+from concurrent.futures import Executor, Future
+from typing import TYPE_CHECKING, Any
+
+from ..command_dispatcher import CommandDispatcher, Priority
+
+if TYPE_CHECKING:
+    from ..device_cache import DeviceCache
+    from ..rf.vrg_api import Telemetry
 
 
 class RFGenerator:
-    def __init__(self, resource_name: str, rf_device_type: str | None = None) -> None:
-        self.set_rf_device(rf_device_type, resource_name)
+    """
+    Thread-safe front end for an RF generator. All device I/O goes through a
+    priority command queue: getters block until their reading is back, while control
+    commands (enable, disable, set points, autotune) jump ahead of queued telemetry
+    reads and return a Future.
+    """
+
+    def __init__(
+        self,
+        resource_name: str,
+        rf_device_type: str | None = None,
+        instrument=None,
+        executor: Executor | None = None,
+        cache: 'DeviceCache | None' = None,
+    ) -> None:
+        self.set_rf_device(rf_device_type, resource_name, instrument, cache)
         self.enabled: bool = False
         self.freq: float = 0
         self.power_setting: int = 0
         self.forward_power: int = 0
         self.refl_power: int = 0
         self.absorbed_power: float = 0.0
-        self.lock = threading.Lock()
+        self.dispatcher = CommandDispatcher('RFGenerator', executor)
 
-    def set_rf_device(self, rf_device_type: str | None, resource_name: str) -> None:
-        accepted_devices = ['VRG']
+    def set_rf_device(
+        self,
+        rf_device_type: str | None,
+        resource_name: str,
+        instrument=None,
+        cache: 'DeviceCache | None' = None,
+    ) -> None:
+        accepted_devices = ['VRG', 'VRGSim']
 
         if rf_device_type not in accepted_devices:
             raise ValueError(
@@ -23,28 +51,39 @@ class RFGenerator:
         if rf_device_type == 'VRG':
             from ..rf.vrg_api import VRG as device
 
-            self.rf_device = device(resource_name)
+            self.rf_device = device(resource_name, instrument, cache)
+
+        if rf_device_type == 'VRGSim':
+            from ..rf.vrg_api import VRG as device
+            from ..sim.vrg_sim import SimulatedVRGResource
+
+            self.rf_device = device(
+                resource_name, instrument or SimulatedVRGResource(), cache
+            )
 
         if rf_device_type is None:
             raise RuntimeError('Device class could not be imported')
 
     def ping_device(self) -> str | None:
-        with self.lock:
-            return self.rf_device.ping()
+        return self.dispatcher.call(self.rf_device.ping)
+
+    def enable(self) -> 'Future[None]':
+        return self.dispatcher.submit(self._enable, priority=Priority.CONTROL)
+
+    def _enable(self) -> None:
+        self.rf_device.enable_RF()
+        self.enabled = True
 
-    def enable(self) -> None:
-        with self.lock:
-            self.rf_device.enable_RF()
-            self.enabled = True
+    def disable(self) -> 'Future[None]':
+        return self.dispatcher.submit(self._disable, priority=Priority.CONTROL)
 
-    def disable(self) -> None:
-        with self.lock:
-            self.rf_device.disable_RF()
-            self.enabled = False
+    def _disable(self) -> None:
+        self.rf_device.disable_RF()
+        self.enabled = False
 
     def close(self) -> None:
-        with self.lock:
-            self.rf_device.close()
+        self.dispatcher.call(self.rf_device.close, priority=Priority.CONTROL)
+        self.dispatcher.shutdown()
 
     ###############################################################################
     ############################# getter methods ##################################
@@ -52,44 +91,63 @@ class RFGenerator:
 
     def get_frequency(self) -> float:
         """Method to ask RF generator what the frequency setting is."""
-        with self.lock:
-            self.freq = self.rf_device.read_frequency()
-            return self.freq
+        self.freq = self.dispatcher.call(self.rf_device.read_frequency)
+        return self.freq
 
     def get_power_setting(self) -> int:
         """Method to ask RF generator what the power setting is."""
-        with self.lock:
-            self.power_setting = self.rf_device.read_power_setting()
-            return self.power_setting
+        self.power_setting = self.dispatcher.call(self.rf_device.read_power_setting)
+        return self.power_setting
 
     def get_refl_power(self) -> int:
         """Method to ask RF generator how much reflected power is coming back"""
-        with self.lock:
-            self.refl_power = self.rf_device.read_reflected_power()
-            return self.refl_power
+        self.refl_power = self.dispatcher.call(self.rf_device.read_reflected_power)
+        return self.refl_power
 
     def get_forward_power(self) -> int:
-        with self.lock:
-            self.forward_power = self.rf_device.read_forward_power()
-            return self.forward_power
+        self.forward_power = self.dispatcher.call(self.rf_device.read_forward_power)
+        return self.forward_power
 
     def get_absorbed_power(self) -> float:
-        with self.lock:
-            self.absorbed_power = self.rf_device.read_absorbed_power()
-            return self.absorbed_power
+        self.absorbed_power = self.dispatcher.call(self.rf_device.read_absorbed_power)
+        return self.absorbed_power
+
+    def get_telemetry(self) -> 'Telemetry':
+        """Method to read forward, reflected and absorbed power and frequency at once"""
+        telemetry = self.dispatcher.call(self.rf_device.read_telemetry)
+        self.forward_power = telemetry.forward_power
+        self.refl_power = telemetry.reflected_power
+        self.absorbed_power = telemetry.absorbed_power
+        self.freq = telemetry.frequency
+        return telemetry
+
+    def read_values(self, codes: Sequence[str]) -> dict[str, Any]:
+        """
+        Reads several VRG readings, e.g. ("RF", "RR"), in one exchange. Raises
+        TimeoutError if none of them came back.
+        """
+        return self.dispatcher.call(self.rf_device.read_values, codes, True)
 
     ###############################################################################
     ############################# setter methods ##################################
     ###############################################################################
 
-    def set_frequency(self, freq: float) -> None:
-        with self.lock:
-            self.rf_device.set_freq(freq)
-
-    def auto_tune(self) -> None:
-        with self.lock:
-            self.rf_device.autotune()
-
-    def set_power(self, power: int) -> None:
-        with self.lock:
-            self.rf_device.set_rf_power(power)
+    def set_frequency(self, freq: float) -> 'Future[None]':
+        return self.dispatcher.submit(
+            self.rf_device.set_freq, freq, priority=Priority.CONTROL
+        )
+
+    def auto_tune(self) -> 'Future[None]':
+        return self.dispatcher.submit(
+            self.rf_device.autotune, priority=Priority.CONTROL
+        )
+
+    def narrow_auto_tune(self) -> 'Future[None]':
+        return self.dispatcher.submit(
+            self.rf_device.narrow_autotune, priority=Priority.CONTROL
+        )
+
+    def set_power(self, power: int) -> 'Future[None]':
+        return self.dispatcher.submit(
+            self.rf_device.set_rf_power, power, priority=Priority.CONTROL
+        )
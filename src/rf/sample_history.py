@@ -0,0 +1,86 @@
+import threading
+from array import array
+from bisect import bisect_left
+from typing import NamedTuple
+
+
+class Sample(NamedTuple):
+    """One acquired RF reading"""
+
+    timestamp: float  # seconds since the epoch
+    forward_power: float
+    reflected_power: float
+    absorbed_power: float
+    frequency: float
+
+
+FIELDS = Sample._fields
+
+
+class SampleHistory:
+    """
+    Fixed-capacity ring buffer of acquired samples, one float64 column per field.
+
+    Each column is stored twice back-to-back, and every sample is written to both
+    halves. Any window of up to `capacity` samples is then one contiguous slice, so
+    `last` and `since` return memoryviews into the buffer instead of copies. Memory
+    use is fixed at creation no matter how long acquisition runs.
+
+    The views are live: once `capacity` more samples are appended their contents are
+    overwritten. Copy them (e.g. `view.tolist()`) if they must be kept longer.
+    """
+
+    def __init__(self, capacity: int = 86400, fields: tuple[str, ...] = FIELDS) -> None:
+        """Other `fields` store other records; one of them must be 'timestamp'"""
+        if capacity < 1:
+            raise ValueError(f'capacity must be at least 1, got {capacity}')
+        self.capacity = capacity
+        self.fields = fields
+        self._columns = {f: array('d', bytes(16 * capacity)) for f in fields}
+        self._views = {f: memoryview(column) for f, column in self._columns.items()}
+        self._next = 0  # index the next sample is written to
+        self._count = 0  # number of valid samples, at most capacity
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, sample: tuple[float, ...]) -> None:
+        """Adds one sample, overwriting the oldest one once the buffer is full"""
+        with self._lock:
+            i = self._next
+            mirror = i + self.capacity
+            for column, value in zip(self._columns.values(), sample):
+                column[i] = value
+                column[mirror] = value
+            self._next = 0 if i + 1 == self.capacity else i + 1
+            if self._count < self.capacity:
+                self._count += 1
+
+    def _window(self, n: int) -> tuple[int, int]:
+        """Start and stop indices of the newest n samples (call with the lock held)"""
+        n = max(0, min(n, self._count))
+        start = (self._next - n) % self.capacity
+        return start, start + n
+
+    def last(self, n: int) -> dict[str, memoryview]:
+        """Returns views of the newest n samples (fewer if not yet acquired), oldest first"""
+        with self._lock:
+            start, stop = self._window(n)
+        return self._slices(start, stop)
+
+    def since(self, t: float) -> dict[str, memoryview]:
+        """Returns views of the samples with a timestamp at or after t, oldest first"""
+        with self._lock:
+            start, stop = self._window(self._count)
+        timestamps = self._views['timestamp'][start:stop]
+        start += bisect_left(timestamps, t)
+        return self._slices(start, stop)
+
+    def _slices(self, start: int, stop: int) -> dict[str, memoryview]:
+        return {f: view[start:stop] for f, view in self._views.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._next = 0
+            self._count = 0
@@ -0,0 +1,143 @@
+import os
+import sys
+import threading
+from multiprocessing import parent_process, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from ..rf.sample_history import FIELDS, SampleHistory
+
+HEADER_BYTES = 16  # capacity and number of samples ever written, two uint64
+
+_created: set[str] = set()  # blocks created by this process
+
+
+class SharedSampleHistory(SampleHistory):
+    """
+    SampleHistory kept in a shared memory block, so samples appended by one process
+    are read by others without copying.
+
+    One process appends; any number of processes read through the usual `last` and
+    `since` views. The write counter in the block header is only advanced after a
+    sample is complete, so readers never see half a sample and need no lock. As
+    with SampleHistory, the views are live and are overwritten once the buffer wraps.
+
+    The process that created the block owns it and removes it on `close`, which it
+    calls once the other processes have exited. Closing releases every view handed
+    out that is still referenced, so using one afterwards raises ValueError.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 86400,
+        fields: tuple[str, ...] = FIELDS,
+        name: str | None = None,
+    ) -> None:
+        """Creates a new block, with a random name unless `name` is given"""
+        if capacity < 1:
+            raise ValueError(f'capacity must be at least 1, got {capacity}')
+        size = HEADER_BYTES + 16 * capacity * len(fields)
+        self._shm = SharedMemory(name, create=True, size=size)
+        self._owner = True
+        self._exports: list[memoryview] = []
+        _created.add(self._shm.name)
+        self._setup(fields, capacity)
+        self._header[0] = capacity
+        self._header[1] = 0
+
+    @classmethod
+    def attach(
+        cls, name: str, fields: tuple[str, ...] = FIELDS
+    ) -> 'SharedSampleHistory':
+        """Opens the block another process created"""
+        history = cls.__new__(cls)
+        if sys.version_info >= (3, 13):
+            # Only the creator's resource tracker may remove the block
+            history._shm = SharedMemory(name, track=False)
+        else:
+            history._shm = SharedMemory(name)
+            if os.name == 'posix' and parent_process() is None and name not in _created:
+                # An unrelated process has its own resource tracker, which would
+                # remove the block when this process exits. Child processes share
+                # the creator's tracker and must leave the registration alone.
+                # Windows has no tracker, the block goes with its last handle.
+                resource_tracker.unregister(history._shm._name, 'shared_memory')
+        history._owner = False
+        history._exports = []
+        capacity = history._shm.buf[:HEADER_BYTES].cast('Q')[0]
+        if history._shm.size < HEADER_BYTES + 16 * capacity * len(fields):
+            history._shm.close()
+            raise ValueError(f'Shared history {name} does not hold the fields {fields}')
+        history._setup(fields, capacity)
+        return history
+
+    def _setup(self, fields: tuple[str, ...], capacity: int) -> None:
+        buffer = self._shm.buf
+        self.capacity = capacity
+        self.fields = fields
+        self._header = buffer[:HEADER_BYTES].cast('Q')
+        size = 16 * capacity
+        self._columns = {
+            f: buffer[HEADER_BYTES + i * size : HEADER_BYTES + (i + 1) * size].cast('d')
+            for i, f in enumerate(fields)
+        }
+        self._views = self._columns
+        self._lock = threading.Lock()  # between appending threads of this process
+
+    @property
+    def name(self) -> str:
+        """Pass this to `attach` in another process"""
+        return self._shm.name
+
+    @property
+    def _count(self) -> int:
+        return len(self)
+
+    def __len__(self) -> int:
+        return min(self._header[1], self.capacity)
+
+    def append(self, sample: tuple[float, ...]) -> None:
+        with self._lock:
+            written = self._header[1]
+            i = written % self.capacity
+            mirror = i + self.capacity
+            for column, value in zip(self._columns.values(), sample):
+                column[i] = value
+                column[mirror] = value
+            self._header[1] = written + 1  # publish the sample to the readers
+
+    def _window(self, n: int) -> tuple[int, int]:
+        written = self._header[1]  # read once, the writer may be appending
+        n = max(0, min(n, written, self.capacity))
+        start = (written - n) % self.capacity
+        return start, start + n
+
+    def _slices(self, start: int, stop: int) -> dict[str, memoryview]:
+        views = super()._slices(start, stop)
+        with self._lock:
+            # Views referenced from nowhere but this list were dropped by the
+            # caller. The count includes the list, `view` and the call's argument.
+            self._exports = [
+                view for view in self._exports if sys.getrefcount(view) > 3
+            ]
+            self._exports.extend(views.values())
+        return views
+
+    def clear(self) -> None:
+        with self._lock:
+            self._header[1] = 0
+
+    def close(self) -> None:
+        """
+        Unmaps the block, and removes it if this process created it. Every view of
+        the block is released first, the mapping cannot be closed while one exists.
+        """
+        with self._lock:
+            for view in (*self._exports, *self._columns.values(), self._header):
+                view.release()
+            self._exports = []
+            self._columns = self._views = {}
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+            _created.discard(self._shm.name)
+            self._owner = False
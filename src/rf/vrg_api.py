@@ -1,22 +1,83 @@
-from typing import cast
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, cast
 
-import pyvisa
-from pyvisa.resources import MessageBasedResource
+from ..instrumentation import METRICS, instrumented
+from .vrg_codec import (
+    COMMANDS,
+    MAX_STALE_REPLIES,
+    VRGError,
+    decode,
+    decode_response,
+    is_stale,
+)
+
+if TYPE_CHECKING:
+    from pyvisa.resources import MessageBasedResource
+
+    from ..device_cache import DeviceCache
+
+
+@dataclass(frozen=True, slots=True)
+class Telemetry:
+    """One snapshot of the VRG readings returned by `VRG.read_telemetry`"""
+
+    forward_power: int = 0  # watts
+    reflected_power: int = 0  # watts
+    absorbed_power: float = 0.0  # watts
+    frequency: float = 0.0  # MHz
 
 
 class VRG:
     def __init__(
-        self, resource_name: str
+        self,
+        resource_name: str,
+        instrument=None,
+        cache: "DeviceCache | None" = None,
     ) -> None:  # example resource name:'ASRLCOM6::INSTR'
-        self.rm = pyvisa.ResourceManager("@py")
-        self.instrument = cast(
-            MessageBasedResource, self.rm.open_resource(resource_name)
-        )
-
-        # Get the valid frequency range in MHz
-        self.min_tune_freq = self.read_min_tune_freq()
-        self.max_tune_freq = self.read_max_tune_freq()
+        # pyvisa takes over 100 ms to import, so it is only loaded once a VRG is
+        # created, which the GUI does on a background thread
+        import pyvisa
+
+        self._VisaIOError = pyvisa.VisaIOError
+
+        # instrument: an already open resource (e.g. a simulator) used instead of
+        # opening resource_name through pyvisa
+        if instrument is None:
+            self.rm = pyvisa.ResourceManager("@py")
+            instrument = self.rm.open_resource(resource_name)
+        self.instrument = cast("MessageBasedResource", instrument)
+
+        # Identify the unit, then get the valid frequency range in MHz. The range is
+        # taken from the cache when this unit has not rebooted since it was stored.
+        (
+            self.serial_number,
+            self.reboots,
+            self.operating_hours,
+            self.enabled_hours,
+        ) = self.read_factory_info()
         self.max_power_setting = 1000
+        cache_key = f"VRG:{self.serial_number}"
+        cached = None
+        if cache is not None and self.serial_number != "unknown":
+            cached = cache.get(cache_key, self.reboots)
+        if cached is not None:
+            self.min_tune_freq = cached["min_tune_freq"]
+            self.max_tune_freq = cached["max_tune_freq"]
+        else:
+            self.min_tune_freq = self.read_min_tune_freq()
+            self.max_tune_freq = self.read_max_tune_freq()
+            if cache is not None and self.serial_number != "unknown":
+                cache.put(
+                    cache_key,
+                    self.reboots,
+                    {
+                        "min_tune_freq": self.min_tune_freq,
+                        "max_tune_freq": self.max_tune_freq,
+                        "max_power_setting": self.max_power_setting,
+                        "operating_hours": self.operating_hours,
+                    },
+                )
 
     def query_command(self, command) -> None:
         self.instrument.query(command)
@@ -27,140 +88,169 @@ class VRG:
     def write_raw_command(self, command) -> None:
         self.instrument.write_raw(command)
 
+    def query(self, code: str, argument=None):
+        """
+        Sends a command from the command table and returns its decoded response, or
+        the command's default if the response times out. Raises VRGError if the
+        VRG rejects the command or answers with a different one.
+
+        Late replies to earlier commands that timed out are skipped, so one slow
+        reply does not offset every later response.
+        """
+        command = COMMANDS[code]
+        self.write_command(command.encode(argument))
+        if not command.reply:
+            return None
+        for _ in range(MAX_STALE_REPLIES + 1):
+            response: str | None = self.read_command()
+            if response is None:
+                return command.default
+            if not is_stale(command, response):
+                return decode(command, response)
+            METRICS.increment("VRG.stale_replies")
+            print(f"Skipping stale response {response.strip()} to {code}")
+        raise VRGError(f"No response to {code} after {MAX_STALE_REPLIES} stale ones")
+
     def read_command(self) -> str | None:
         try:
             response: str = self.instrument.read()
             print(f"Received response: {response}")  # Debugging info
             return response
-        except pyvisa.VisaIOError as e:
+        except self._VisaIOError as e:
+            METRICS.increment("VRG.timeouts")
             print(f"Error reading response: {e}")
             return None
 
+    @instrumented
     def ping(self) -> str | None:
         command = b"!\n"
         self.write_raw_command(command)
         response: str | None = self.read_command()
         return response
 
+    @instrumented
     def read_frequency(self) -> float:
         """returns the frequency setting in MHz"""
-        command: str = "RQ"
-        self.write_command(command)
-        response: str | None = self.read_command()
-        if response is not None:
-            return float(response.strip(command).strip("\r\n")) * 1e-3
-        else:
-            return 0.00
+        return self.query("RQ")
 
+    @instrumented
     def read_power_setting(self) -> int:
         """returns the power setting in watts"""
-        command = "RO"
-        self.write_command(command)
-        response: str | None = self.read_command()
-        if response is not None:
-            return int(response.strip(command).strip("\r\n"))
-        else:
-            return 0
+        return self.query("RO")
 
+    @instrumented
     def read_min_tune_freq(self) -> float:
         """returns the minimum allowable freq setting in MHz"""
-        command = "R1"
-        self.write_command(command)
-        response: str | None = self.read_command()
-        if response is not None:
-            return float(response.strip(command).strip("\r\n")) * 1e-3
-        else:
-            return 0.00
+        return self.query("R1")
 
+    @instrumented
     def read_max_tune_freq(self) -> float:
         """returns the maximum allowable freq setting in MHz"""
-        command = "R2"
-        self.write_command(command)
-        response: str | None = self.read_command()
-        if response is not None:
-            return float(response.strip(command).strip("\r\n")) * 1e-3
-        else:
-            return 0.00
+        return self.query("R2")
 
+    @instrumented
     def read_forward_power(self) -> int:
         """returns the forward power in watts"""
-        command = "RF"
-        self.write_command(command)
-        response: str | None = self.read_command()
-        if response is not None:
-            return int(response.strip(command).strip("\r\n"))
-        else:
-            return 0
+        return self.query("RF")
 
+    @instrumented
     def read_reflected_power(self) -> int:
         """returns the reflected power in watts"""
-        command = "RR"
-        self.write_command(command)
-        response: str | None = self.read_command()
-        if response is not None:
-            return int(response.strip(command).strip("\r\n"))
-        else:
-            return 0
+        return self.query("RR")
 
+    @instrumented
     def read_absorbed_power(self) -> float:
         """returns the absorbed power in watts"""
-        command = "RB"
-        self.write_command(command)
-        response: str | None = self.read_command()
-        if response is not None:
-            return float(response.strip(command).strip("\r\n"))
-        else:
-            return 0.0
+        return self.query("RB")
+
+    @instrumented
+    def read_telemetry(self, raise_on_timeout: bool = False) -> Telemetry:
+        """
+        Returns forward, reflected and absorbed power and frequency in one round trip,
+        see `read_values`. Readings that did not come back are 0, or TimeoutError is
+        raised if none came back and `raise_on_timeout` is set.
+        """
+        values = self.read_values(("RF", "RR", "RB", "RQ"), raise_on_timeout)
+        return Telemetry(
+            forward_power=values.get("RF", 0),
+            reflected_power=values.get("RR", 0),
+            absorbed_power=values.get("RB", 0.0),
+            frequency=values.get("RQ", 0.0),
+        )
 
-    def read_factory_info(self) -> tuple:
+    @instrumented
+    def read_values(
+        self, codes: Sequence[str], raise_on_timeout: bool = False
+    ) -> dict[str, Any]:
+        """
+        Returns the decoded readings of several reading commands, e.g. ("RF", "RR"),
+        keyed by code, in one round trip. The commands are written back-to-back in a
+        single write, then the responses are read and matched to their command by
+        prefix. Readings that did not come back are left out, or TimeoutError is
+        raised if none came back and `raise_on_timeout` is set.
+        """
+        termination: str = self.instrument.write_termination or ""
+        payload = "".join(f"{code}{termination}" for code in codes)
+        self.write_raw_command(payload.encode())
+
+        # Read until every command has answered, skipping late replies to earlier
+        # commands that are still queued ahead of these
+        values: dict[str, Any] = {}
+        for _ in range(len(codes) + MAX_STALE_REPLIES):
+            response: str | None = self.read_command()
+            if response is None:
+                break  # timed out, the remaining responses are not coming
+            try:
+                code, value = decode_response(response)
+            except VRGError as e:
+                print(f"Error parsing telemetry: {e}")
+                continue
+            if code not in codes:
+                METRICS.increment("VRG.stale_replies")
+                continue
+            values[code] = value
+            if len(values) == len(codes):
+                break
+
+        if raise_on_timeout and not values:
+            raise TimeoutError("VRG did not answer the telemetry read")
+        return values
+
+    @instrumented
+    def read_factory_info(self) -> tuple[str, int, int, int]:
         """returns the product serial number, number of reboots, operating hours and enabled hours"""
-        command = "RI"
-        self.write_command(command)
-        response: str | None = self.read_command()
-        if response is not None:
-            split_response: list = response.split()
-            serial_number: str = split_response[0]
-            reboots: int = int(split_response[1])
-            op_hours: int = int(split_response[2])
-            enabled_hours: int = int(split_response[3])
-            return (
-                serial_number.strip(command),
-                int(reboots),
-                int(op_hours),
-                int(enabled_hours),
-            )
-        else:
-            return ("unknown", "0", "0", "0", "0")
+        try:
+            info = self.query("RI")
+        except VRGError as e:
+            print(f"Error reading factory info: {e}")
+            info = None
+        return info or ("unknown", 0, 0, 0)
 
+    @instrumented
     def enable_RF(self) -> None:
-        command = "ER"
-        self.write_command(command)
-        self.read_command()
+        self.query("ER")
 
+    @instrumented
     def disable_RF(self) -> None:
-        command = "DR"
-        self.write_command(command)
-        self.read_command()
+        self.query("DR")
 
+    @instrumented
     def set_forward_mode(self) -> None:
-        command = "PM0"
-        self.write_command(command)
-        self.read_command()
+        self.query("PM", 0)
 
+    @instrumented
     def set_absorbed_mode(self) -> None:
-        command = "PM1"
-        self.write_command(command)
-        self.read_command()
+        self.query("PM", 1)
 
+    @instrumented
     def autotune(self) -> None:
-        command = "TW"
-        self.write_command(command)
-        self.read_command()
+        self.query("TW")
 
+    @instrumented
     def narrow_autotune(self) -> None:
-        command = "TT"
-        self.write_command(command)
+        self.query("TT")
 
+    @instrumented
     def set_rf_power(self, power: int) -> None:
         # Type validation
         if not isinstance(power, int):
@@ -171,10 +261,9 @@ class VRG:
                 f"Input {power} is out of bounds. Must be between 0 and {self.max_power_setting}."
             )
 
-        command = f"SP{power:04}"  # ensures that the integer power is always represented as a 4-digit string, padded with leading zeros if necessary
-        self.write_command(command)
-        self.read_command()
+        self.query("SP", power)  # sent as a 4-digit string, e.g. SP0600
 
+    @instrumented
     def set_freq(self, freq: int | float) -> None:
         # Type validation
         if not isinstance(freq, int | float):
@@ -193,9 +282,7 @@ class VRG:
             )
 
         freq_kHz = int(freq * 1000)
-        command = f"SF{freq_kHz:05d}"
-        self.write_command(command)
-        self.read_command()
+        self.query("SF", freq_kHz)
 
     def close(self) -> None:
         self.instrument.close()
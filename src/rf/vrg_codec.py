@@ -0,0 +1,114 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+# The VRG answers a command it does not understand with a bare question mark
+REJECTED = '?'
+
+# Replies that may still be queued from an earlier read that timed out; a pipelined
+# telemetry read has at most four replies in flight
+MAX_STALE_REPLIES = 4
+
+
+class VRGError(Exception):
+    """The VRG rejected a command or sent a response that does not match it"""
+
+
+def kHz_to_MHz(value: str) -> float:
+    return float(value) * 1e-3
+
+
+def decode_factory_info(value: str) -> tuple[str, int, int, int]:
+    """
+    "607 00171 022426 017180 00000 00000" is serial number 607, 171 reboots, 22426
+    operating hours and 17180 enabled hours. The trailing fields are unused options.
+    """
+    serial_number, reboots, op_hours, enabled_hours = value.split()[:4]
+    return serial_number, int(reboots), int(op_hours), int(enabled_hours)
+
+
+@dataclass(frozen=True, slots=True)
+class VRGCommand:
+    """One entry of the VRG command table"""
+
+    code: str  # two characters, at the start of the response to a reading
+    decode: Callable[[str], Any] | None = None  # parses the text after the code
+    template: str = ''  # str.format template when the command takes an argument
+    reply: bool = True  # False if the VRG sends no response
+    default: Any = None  # result when the response times out
+
+    def encode(self, argument: Any = None) -> str:
+        if argument is None:
+            return self.code
+        return self.template.format(argument)
+
+
+COMMANDS: dict[str, VRGCommand] = {
+    command.code: command
+    for command in (
+        # Readings
+        VRGCommand('RQ', kHz_to_MHz, default=0.00),  # frequency setting, "RQ40650"
+        VRGCommand('RO', int, default=0),  # power setting in W, "RO0800"
+        VRGCommand('R1', kHz_to_MHz, default=0.00),  # min tune frequency, "R125000"
+        VRGCommand('R2', kHz_to_MHz, default=0.00),  # max tune frequency, "R242000"
+        VRGCommand('RF', int, default=0),  # forward power in W, "RF0000"
+        VRGCommand('RR', int, default=0),  # reflected power in W, "RR0000"
+        VRGCommand('RB', float, default=0.0),  # absorbed power in W, "RB0000.1"
+        VRGCommand('RI', decode_factory_info),  # factory information
+        # Controls. The simulator echoes them, but any reply other than "?" is
+        # taken as the acknowledgement, since the echo is not documented.
+        VRGCommand('ER'),  # enable RF
+        VRGCommand('DR'),  # disable RF
+        VRGCommand('PM', template='PM{:d}'),  # power mode, 0 forward, 1 absorbed
+        VRGCommand('TW'),  # wide range autotune
+        VRGCommand('TT', reply=False),  # narrow range autotune
+        VRGCommand('SP', template='SP{:04d}'),  # power setting in W
+        VRGCommand('SF', template='SF{:05d}'),  # frequency setting in kHz
+    )
+}
+
+
+def decode_response(response: str) -> tuple[str, Any]:
+    """
+    Matches a response to its command by its two character prefix and returns the
+    command code and the decoded value. Echoed control commands decode to the
+    echo itself.
+    """
+    text = response.strip('\r\n')
+    if text == REJECTED:
+        raise VRGError('VRG rejected the command')
+    command = COMMANDS.get(text[:2])
+    if command is None:
+        raise VRGError(f'Unexpected response "{text}"')
+    if command.decode is None:
+        return command.code, text
+    try:
+        return command.code, command.decode(text[2:])
+    except ValueError as e:
+        raise VRGError(f'Unparsable response "{text}": {e}') from None
+
+
+def is_stale(command: VRGCommand, response: str) -> bool:
+    """
+    True if `response` starts with the code of another command, i.e. it is a reply
+    that arrived after its own read timed out and is queued ahead of the response
+    to `command`.
+    """
+    code = response.strip('\r\n')[:2]
+    return code != command.code and code in COMMANDS
+
+
+def decode(command: VRGCommand, response: str) -> Any:
+    """
+    Decodes the response to `command`, raising VRGError if it is for another one.
+    A control command decodes to its acknowledgement text, echoed or not.
+    """
+    text = response.strip('\r\n')
+    if text == REJECTED:
+        raise VRGError(f'VRG rejected the {command.code} command')
+    if command.decode is None:
+        return text
+    code, value = decode_response(response)
+    if code != command.code:
+        raise VRGError(f'Expected a response to {command.code}, got "{response}"')
+    return value
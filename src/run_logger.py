@@ -0,0 +1,215 @@
+import mmap
+import queue
+import struct
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Self
+
+# File layout: a header, then fixed-width records of little-endian float64 values.
+#   magic (8 bytes) | version (u16) | field count (u16) | header size (u32)
+#   | comma-separated field names, zero padded to a multiple of 8 bytes
+MAGIC = b'TSRUNLOG'
+VERSION = 1
+_PREAMBLE = struct.Struct('<8sHHI')
+SUFFIX = '.tslog'
+
+
+def _encode_header(fields: Sequence[str]) -> bytes:
+    names = ','.join(fields).encode()
+    size = _PREAMBLE.size + len(names)
+    size += -size % 8  # keep the records 8-byte aligned for the memoryview cast
+    header = _PREAMBLE.pack(MAGIC, VERSION, len(fields), size) + names
+    return header.ljust(size, b'\0')
+
+
+class RunLogger:
+    """
+    Append-only binary logger for acquired samples.
+
+    `log` only puts the sample on a queue, so the acquisition loop never waits on
+    disk I/O. A background thread packs samples into fixed-width records, writes
+    them in batches and starts a new file when the current one reaches `max_bytes`
+    or is older than `max_seconds`.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        fields: Sequence[str],
+        prefix: str = 'run',
+        max_bytes: int = 256 * 1024 * 1024,
+        max_seconds: float = 24 * 3600,
+        flush_interval: float = 1.0,
+        batch_size: int = 1024,
+    ) -> None:
+        self.directory = Path(directory)
+        self.fields = tuple(fields)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._record = struct.Struct(f'<{len(self.fields)}d')
+        self._header = _encode_header(self.fields)
+        self._queue: queue.SimpleQueue[Sequence[float] | None] = queue.SimpleQueue()
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = 0.0
+        self._file_index = 0
+        self.thread: threading.Thread | None = None
+        self.running: bool = False
+        self.path: Path | None = None  # file currently written to
+        self.records_written: int = 0
+
+    def start(self) -> None:
+        if not self.running:
+            self.running = True
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self) -> None:
+        """Writes everything still queued, then closes the file"""
+        if self.running:
+            self.running = False
+            self._queue.put(None)
+            if self.thread is not None:
+                self.thread.join()
+                self.thread = None
+
+    def log(self, sample: Sequence[float]) -> None:
+        """Queues one sample with a value per field. Safe to call from any thread."""
+        if self.running:
+            self._queue.put(sample)
+
+    def _run(self) -> None:
+        batch = bytearray()
+        count = 0
+        last_flush = time.monotonic()
+        stopping = False
+
+        while not stopping:
+            timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+            try:
+                sample = self._queue.get(timeout=timeout)
+                if sample is None:
+                    stopping = True
+                else:
+                    batch += self._record.pack(*sample)
+                    count += 1
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            due = now - last_flush >= self.flush_interval
+            if count and (stopping or due or count >= self.batch_size):
+                try:
+                    self._write(batch, count)
+                except OSError as e:
+                    print(f'Error writing run log: {e}')
+                batch.clear()
+                count = 0
+            if count == 0:
+                last_flush = now  # the flush interval starts with the next sample
+
+        self._close_file()
+
+    def _write(self, batch: bytearray, count: int) -> None:
+        if self._file is not None and (
+            self._file_bytes + len(batch) > self.max_bytes
+            or time.monotonic() - self._file_opened > self.max_seconds
+        ):
+            self._close_file()
+        if self._file is None:
+            self._open_file()
+
+        assert self._file is not None
+        self._file.write(batch)
+        self._file.flush()
+        self._file_bytes += len(batch)
+        self.records_written += count
+
+    def _open_file(self) -> None:
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self._file_index += 1
+        self.path = (
+            self.directory / f'{self.prefix}_{stamp}_{self._file_index:03d}{SUFFIX}'
+        )
+        # Stays open across batches until rotation or stop closes it
+        self._file = open(self.path, 'wb')  # noqa: SIM115
+        self._file.write(self._header)
+        self._file_bytes = len(self._header)
+        self._file_opened = time.monotonic()
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RunLogReader:
+    """
+    Memory-mapped view of one run log file. Opening is instant regardless of the
+    file size, and `column` returns a strided view into the mapping, not a copy.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_fields, header_size = _PREAMBLE.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'{self.path} is not a run log file')
+        if version != VERSION:
+            self.close()
+            raise ValueError(f'Unsupported run log version {version} in {self.path}')
+
+        names = bytes(self._mmap[_PREAMBLE.size : header_size]).rstrip(b'\0')
+        self.fields: tuple[str, ...] = tuple(names.decode().split(','))
+        record_size = 8 * n_fields
+        # A record cut short by a crash mid-write is ignored.
+        self.n_records = (len(self._mmap) - header_size) // record_size
+        end = header_size + self.n_records * record_size
+        self._values = memoryview(self._mmap)[header_size:end].cast('d')
+
+    def __len__(self) -> int:
+        return self.n_records
+
+    def column(self, field: str) -> memoryview:
+        """
+        All values of one field, oldest first. Release the view (or let it go out of
+        scope) before calling `close`.
+        """
+        i = self.fields.index(field)
+        return self._values[i :: len(self.fields)]
+
+    def record(self, index: int) -> tuple[float, ...]:
+        n = len(self.fields)
+        return tuple(self._values[index * n : (index + 1) * n])
+
+    def close(self) -> None:
+        if hasattr(self, '_values'):
+            self._values.release()
+        self._mmap.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def list_run_logs(directory: str | Path, prefix: str = 'run') -> list[Path]:
+    """Log files in a directory in the order they were written"""
+    return sorted(Path(directory).glob(f'{prefix}_*{SUFFIX}'))
+
+
+def iter_run_logs(directory: str | Path, prefix: str = 'run') -> Iterator[RunLogReader]:
+    for path in list_run_logs(directory, prefix):
+        yield RunLogReader(path)
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+from collections import deque
+from collections.abc import Iterator
+from typing import Any
+
+from .instrumentation import METRICS
+
+SNAPSHOT_END = (json.dumps({'type': 'snapshot_end'}) + '\n').encode()
+
+
+class _Client:
+    """Messages waiting to be written to one subscriber"""
+
+    def __init__(self, writer: asyncio.StreamWriter, queue_size: int) -> None:
+        self.writer = writer
+        self.pending: deque[bytes] = deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.dropped = 0  # messages dropped since the last write
+
+    def offer(self, line: bytes) -> None:
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1  # the deque drops the oldest message
+        self.pending.append(line)
+        self.ready.set()
+
+
+class SampleServer:
+    """
+    Publishes messages as newline-delimited JSON to any number of subscribers on a
+    local TCP or Unix socket.
+
+    A new subscriber first receives the most recent `snapshot_size` messages and a
+    {"type": "snapshot_end"} marker, then every message published after it
+    connected. Each subscriber has its own queue of at most `queue_size` messages.
+    When a subscriber reads too slowly its oldest queued messages are dropped, and
+    it is sent {"type": "dropped", "count": n} before the next message, so a slow
+    subscriber never holds up the publisher or the other subscribers.
+
+    The server runs an asyncio loop on its own thread; `publish` may be called from
+    any thread and never blocks.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8765,
+        path: str | None = None,
+        snapshot_size: int = 600,
+        queue_size: int = 1000,
+    ) -> None:
+        """
+        :param host: TCP interface to listen on, ignored when `path` is given.
+        :param port: TCP port, 0 picks a free one.
+        :param path: Unix socket path to listen on instead of TCP.
+        :param snapshot_size: Number of recent messages sent to a new subscriber.
+        :param queue_size: Largest number of messages queued for one subscriber.
+        """
+        self.host = host
+        self.port = port
+        self.path = path
+        self.queue_size = queue_size
+        self._snapshot: deque[bytes] = deque(maxlen=snapshot_size)
+        self._clients: set[_Client] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._thread: threading.Thread | None = None
+        self._started = threading.Event()
+        self._error: BaseException | None = None
+
+    @property
+    def address(self) -> str:
+        return self.path or f'{self.host}:{self.port}'
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def start(self) -> None:
+        """Starts listening; returns once the socket is bound"""
+        self._thread = threading.Thread(target=self._run, name='SampleServer')
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+
+    def stop(self) -> None:
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def publish(self, message: dict[str, Any]) -> None:
+        """Queues a message for every subscriber. Safe to call from any thread."""
+        line = (json.dumps(message) + '\n').encode()
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._fan_out, line)
+            except RuntimeError:
+                pass  # stopped in the meantime
+
+    def _run(self) -> None:
+        self._loop = loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._listen())
+        except OSError as e:
+            self._error = e
+            self._started.set()
+            loop.close()
+            return
+        self._started.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(self._close())
+            loop.close()
+
+    async def _listen(self) -> None:
+        if self.path is not None:
+            if os.path.exists(self.path):
+                os.unlink(self.path)  # left over from a previous run
+            self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        else:
+            self._server = await asyncio.start_server(
+                self._handle, self.host, self.port
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _close(self) -> None:
+        self._server.close()
+        for client in list(self._clients):
+            client.writer.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _fan_out(self, line: bytes) -> None:
+        self._snapshot.append(line)
+        for client in self._clients:
+            client.offer(line)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        client = _Client(writer, self.queue_size)
+        # Taking the snapshot and subscribing happen in the same loop iteration, so
+        # no message is missed or sent twice.
+        writer.write(b''.join(self._snapshot) + SNAPSHOT_END)
+        self._clients.add(client)
+        METRICS.increment('SampleServer.subscribers')
+        sender = asyncio.create_task(self._send(client))
+        try:
+            # Subscribers do not send anything; reading only detects a disconnect
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, OSError, asyncio.CancelledError):
+            pass  # disconnected, or the server is stopping
+        finally:
+            self._clients.discard(client)
+            sender.cancel()
+            writer.close()
+
+    async def _send(self, client: _Client) -> None:
+        writer = client.writer
+        try:
+            await writer.drain()  # the snapshot
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                if client.dropped:
+                    METRICS.increment('SampleServer.dropped', client.dropped)
+                    notice = {'type': 'dropped', 'count': client.dropped}
+                    writer.write((json.dumps(notice) + '\n').encode())
+                    client.dropped = 0
+                # Everything queued goes out in one write
+                lines = b''.join(client.pending)
+                client.pending.clear()
+                writer.write(lines)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            writer.close()
+
+
+def subscribe(address: str, timeout: float | None = None) -> Iterator[dict[str, Any]]:
+    """
+    Connects to a SampleServer at "host:port" or a Unix socket path and yields
+    every message it sends, starting with the snapshot.
+    """
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        sock = socket.create_connection((host, int(port)), timeout=timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+    with sock, sock.makefile('rb') as stream:
+        for line in stream:
+            yield json.loads(line)
+
+
+if __name__ == '__main__':
+    import sys
+
+    for message in subscribe(sys.argv[1] if len(sys.argv) > 1 else '127.0.0.1:8765'):
+        print(message)
@@ -0,0 +1,582 @@
+import argparse
+import dataclasses
+import json
+import math
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, get_args
+
+from .deadline_timer import DeadlineTimer
+from .hvps.hvps_api import Channels, HVPSv3
+from .hvps.ramp import HVPSRamp
+from .rf.rfgenerator_control import RFGenerator
+from .rf.vrg_api import Telemetry
+
+RF_SIGNALS = tuple(field.name for field in dataclasses.fields(Telemetry))
+HVPS_CHANNELS: tuple[str, ...] = get_args(Channels)
+HVPS_QUANTITIES = ('voltage', 'current')
+
+
+@dataclass(frozen=True, slots=True)
+class Action:
+    """One entry of the action table"""
+
+    device: str | None  # 'rf', 'hvps' or None if the action needs no device
+    required: tuple[str, ...] = ()  # parameters the step must give
+    optional: tuple[str, ...] = ()  # parameters the step may give
+
+
+ACTIONS: dict[str, Action] = {
+    'rf_enable': Action('rf'),
+    'rf_disable': Action('rf'),
+    'rf_power': Action('rf', ('value',)),  # W
+    'rf_frequency': Action('rf', ('value',)),  # MHz
+    'rf_autotune': Action('rf', (), ('narrow',)),
+    'hv_enable': Action('hvps'),
+    'hv_disable': Action('hvps'),
+    'hv_voltage': Action('hvps', ('channel', 'value')),  # V
+    'hv_ramp': Action(  # see HVPSRamp
+        'hvps',
+        ('targets', 'rates'),
+        (
+            'step_interval',
+            'current_limits',
+            'voltage_tolerance',
+            'settle_timeout',
+            'synchronized',
+            'disable_on_abort',
+        ),
+    ),
+    'solenoid_enable': Action('hvps'),
+    'solenoid_disable': Action('hvps'),
+    'solenoid_current': Action('hvps', ('value',)),  # A
+    'wobble': Action('hvps', ('channel', 'amplitude')),  # amplitude 0 disables
+    'wait': Action(None, ('seconds',)),
+    'wait_until': Action(
+        None, ('signal', 'timeout'), ('minimum', 'maximum', 'hold', 'interval')
+    ),
+    'measure': Action(None, ('signals', 'duration'), ('interval',)),
+}
+
+# What each step parameter must hold
+PARAMETER_TYPES: dict[str, str] = {
+    'value': 'number',
+    'amplitude': 'number',
+    'seconds': 'number',
+    'timeout': 'number',
+    'minimum': 'number',
+    'maximum': 'number',
+    'hold': 'number',
+    'interval': 'number',
+    'duration': 'number',
+    'step_interval': 'number',
+    'settle_timeout': 'number',
+    'voltage_tolerance': 'number or null',
+    'narrow': 'boolean',
+    'synchronized': 'boolean',
+    'disable_on_abort': 'boolean',
+    'channel': 'channel',
+    'targets': 'number per channel',
+    'rates': 'number per channel',
+    'current_limits': 'number per channel',
+    'signal': 'signal',
+    'signals': 'list of signals',
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Step:
+    """One validated step of a sequence"""
+
+    index: str  # position in the script, "3" or "3.1" inside a parallel group
+    action: str  # key of ACTIONS, or 'parallel'
+    label: str
+    params: dict[str, Any]
+    at: float | None = None  # seconds after the sequence start, None to run at once
+    parallel: tuple['Step', ...] = ()  # steps run together when action == 'parallel'
+
+
+@dataclass(frozen=True, slots=True)
+class Sequence:
+    name: str
+    steps: tuple[Step, ...]
+    on_failure: tuple[Step, ...]  # run after a step fails, e.g. to turn HV off
+    devices: frozenset[str]  # devices the script needs
+
+
+@dataclass(frozen=True, slots=True)
+class StepResult:
+    """Outcome of one step"""
+
+    index: str
+    label: str
+    action: str
+    started: float  # seconds after the sequence start
+    duration: float  # seconds
+    ok: bool
+    value: Any = None  # action result, e.g. measurement statistics
+    error: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class SequenceResult:
+    name: str
+    completed: bool  # True if every step succeeded
+    started_at: float  # seconds since the epoch
+    duration: float  # seconds
+    steps: list[StepResult]
+
+
+def parse_sequence(script: dict[str, Any]) -> Sequence:
+    """
+    Validates a script and returns its steps. Everything is checked before any
+    device is touched, so a typo cannot stop a run half way through.
+    """
+    devices: set[str] = set()
+
+    def parse_step(entry: dict[str, Any], index: str, nested: bool) -> Step:
+        if not isinstance(entry, dict):
+            raise TypeError(f'Step {index}: expected an object, got {entry!r}')
+        params = dict(entry)
+        at = params.pop('at', None)
+        label = params.pop('label', None)
+        if at is not None and (not isinstance(at, (int, float)) or at < 0):
+            raise ValueError(f'Step {index}: "at" must be a non-negative number')
+
+        if 'parallel' in params:
+            if nested:
+                raise ValueError(f'Step {index}: parallel groups cannot be nested')
+            children = tuple(
+                parse_step(child, f'{index}.{i}', nested=True)
+                for i, child in enumerate(params.pop('parallel'), 1)
+            )
+            if params:
+                raise ValueError(
+                    f'Step {index}: a parallel group has no parameter '
+                    f'{", ".join(params)}'
+                )
+            return Step(index, 'parallel', label or 'parallel', params, at, children)
+
+        action = params.pop('action', None)
+        if action not in ACTIONS:
+            raise ValueError(
+                f'Step {index}: unknown action {action!r}. Actions: {", ".join(ACTIONS)}'
+            )
+        allowed = ACTIONS[action].required + ACTIONS[action].optional
+        missing = [p for p in ACTIONS[action].required if p not in params]
+        if missing:
+            raise ValueError(f'Step {index}: {action} needs {", ".join(missing)}')
+        unknown = [p for p in params if p not in allowed]
+        if unknown:
+            raise ValueError(
+                f'Step {index}: {action} has no parameter {", ".join(unknown)}. '
+                f'Parameters: {", ".join(allowed) or "none"}'
+            )
+        for name, value in params.items():
+            devices.update(check_parameter(name, value, index))
+        if ACTIONS[action].device is not None:
+            devices.add(ACTIONS[action].device)
+        return Step(index, action, label or action, params, at)
+
+    steps = tuple(
+        parse_step(entry, str(i), nested=False)
+        for i, entry in enumerate(script.get('steps', []), 1)
+    )
+    on_failure = tuple(
+        parse_step(entry, f'on_failure.{i}', nested=False)
+        for i, entry in enumerate(script.get('on_failure', []), 1)
+    )
+    return Sequence(
+        script.get('name', 'sequence'), steps, on_failure, frozenset(devices)
+    )
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_parameter(name: str, value: Any, index: str) -> set[str]:
+    """
+    Checks a step parameter against PARAMETER_TYPES. Returns the devices its
+    signals are read from.
+    """
+    kind = PARAMETER_TYPES[name]
+    if kind == 'signal':
+        return {check_signal(value, index)}
+    if kind == 'list of signals':
+        if not isinstance(value, list):
+            raise TypeError(f'Step {index}: {name} must be a list of signals')
+        return {check_signal(signal, index) for signal in value}
+
+    if kind == 'number per channel':
+        if not isinstance(value, dict):
+            raise TypeError(f'Step {index}: {name} must map HVPS channels to numbers')
+        channels, values = list(value), list(value.values())
+    elif kind == 'channel':
+        channels, values = [value], []
+    else:
+        channels, values = [], [value]
+
+    for channel in channels:
+        if channel not in HVPS_CHANNELS:
+            raise ValueError(
+                f'Step {index}: unknown HVPS channel {channel!r} in {name}. '
+                f'Channels: {", ".join(HVPS_CHANNELS)}'
+            )
+    for v in values:
+        ok = isinstance(v, bool) if kind == 'boolean' else _is_number(v)
+        if not ok and not (kind == 'number or null' and v is None):
+            raise TypeError(f'Step {index}: {name} must be a {kind}, got {v!r}')
+    return set()
+
+
+def check_signal(signal: str, index: str) -> str:
+    """
+    Signals are "rf.<telemetry field>" or "hvps.<channel>.<voltage|current>".
+    Returns the device the signal is read from.
+    """
+    parts = signal.split('.') if isinstance(signal, str) else ['']
+    if parts[0] == 'rf' and len(parts) == 2 and parts[1] in RF_SIGNALS:
+        return 'rf'
+    if (
+        parts[0] == 'hvps'
+        and len(parts) == 3
+        and parts[1] in HVPS_CHANNELS
+        and parts[2] in HVPS_QUANTITIES
+    ):
+        return 'hvps'
+    raise ValueError(
+        f'Step {index}: unknown signal "{signal}". Use rf.<{"|".join(RF_SIGNALS)}> '
+        f'or hvps.<channel>.<{"|".join(HVPS_QUANTITIES)}>'
+    )
+
+
+def load_sequence(path: str | Path) -> Sequence:
+    with open(path) as f:
+        return parse_sequence(json.load(f))
+
+
+class SequenceAborted(Exception):
+    """The sequence was stopped with `SequenceRunner.abort`"""
+
+
+class SequenceRunner:
+    """
+    Runs a sequence of device commands, waits and measurements.
+
+    Timing is taken from the monotonic clock. A step with "at" starts that many
+    seconds after the sequence started, whatever the earlier steps took; other
+    steps start as soon as the previous one finishes. The steps of a parallel
+    group run at the same time, so commands to different devices overlap. The
+    sequence stops at the first failed step, then runs the script's on_failure
+    steps.
+    """
+
+    def __init__(
+        self, rf_generator: RFGenerator | None = None, hvps: HVPSv3 | None = None
+    ) -> None:
+        self.rf_generator = rf_generator
+        self.hvps = hvps
+        self._stop_event = threading.Event()
+        self._t0 = 0.0
+
+    def abort(self) -> None:
+        """Stops the sequence at the next wait; the on_failure steps still run"""
+        self._stop_event.set()
+
+    def run(
+        self,
+        sequence: Sequence,
+        on_step: Callable[[StepResult], None] | None = None,
+    ) -> SequenceResult:
+        """
+        Runs the sequence and returns the results. `on_step` is called with each
+        step result as soon as the step finishes.
+        """
+        available = {'rf': self.rf_generator, 'hvps': self.hvps}
+        missing = [d for d in sorted(sequence.devices) if available[d] is None]
+        if missing:
+            raise ValueError(
+                f'Sequence needs {", ".join(missing)} but it is not connected'
+            )
+
+        self._stop_event.clear()
+        started_at = time.time()
+        self._t0 = time.monotonic()
+        results: list[StepResult] = []
+
+        def record(step_results: list[StepResult]) -> bool:
+            results.extend(step_results)
+            if on_step is not None:
+                for result in step_results:
+                    on_step(result)
+            return all(result.ok for result in step_results)
+
+        with ThreadPoolExecutor(thread_name_prefix='SequenceRunner') as executor:
+            completed = True
+            for step in sequence.steps:
+                if not record(self._run_step(step, executor)):
+                    completed = False
+                    break
+
+            if not completed:
+                # Clean up even after an abort
+                self._stop_event.clear()
+                for step in sequence.on_failure:
+                    record(self._run_step(step, executor))
+
+        return SequenceResult(
+            sequence.name,
+            completed,
+            started_at,
+            time.monotonic() - self._t0,
+            results,
+        )
+
+    def _run_step(self, step: Step, executor: ThreadPoolExecutor) -> list[StepResult]:
+        if step.action != 'parallel':
+            return [self._execute(step)]
+        result = self._execute(step)  # waits for the group's start time
+        if not result.ok:
+            return [result]
+        futures = [
+            executor.submit(self._run_step, child, executor) for child in step.parallel
+        ]
+        return [result for future in futures for result in future.result()]
+
+    def _execute(self, step: Step) -> StepResult:
+        started = time.monotonic()
+        try:
+            if step.at is not None:
+                self._sleep(self._t0 + step.at - time.monotonic(), step)
+                started = time.monotonic()
+            if self._stop_event.is_set():
+                raise SequenceAborted('Sequence aborted')
+            value = getattr(self, f'_do_{step.action}')(step, **step.params)
+            error = None
+        except Exception as e:  # noqa: BLE001 - recorded as the step's failure
+            value, error = None, f'{type(e).__name__}: {e}'
+        return StepResult(
+            step.index,
+            step.label,
+            step.action,
+            started - self._t0,
+            time.monotonic() - started,
+            error is None,
+            value,
+            error,
+        )
+
+    def _sleep(self, seconds: float, step: Step) -> None:
+        if seconds > 0 and self._stop_event.wait(seconds):
+            raise SequenceAborted(f'Sequence aborted before step {step.index}')
+
+    def _do_parallel(self, step: Step) -> None:
+        pass  # the group's steps are run by _run_step
+
+    def _read_signals(self, signals: list[str]) -> dict[str, float]:
+        """Reads each device at most once for all the requested signals"""
+        values: dict[str, float] = {}
+        telemetry = None
+        readings = None
+        for signal in signals:
+            parts = signal.split('.')
+            if parts[0] == 'rf':
+                telemetry = telemetry or self.rf_generator.get_telemetry()
+                values[signal] = float(getattr(telemetry, parts[1]))
+            else:
+                readings = readings or self.hvps.read_all_channels()
+                reading = readings.get(parts[1])
+                if reading is None:
+                    raise ValueError(f'HVPS channel {parts[1]} is not installed')
+                values[signal] = getattr(reading, parts[2])
+        return values
+
+    ##### RF generator #####
+
+    def _do_rf_enable(self, step: Step) -> None:
+        self.rf_generator.enable().result()
+
+    def _do_rf_disable(self, step: Step) -> None:
+        self.rf_generator.disable().result()
+
+    def _do_rf_power(self, step: Step, value: int) -> None:
+        self.rf_generator.set_power(int(value)).result()
+
+    def _do_rf_frequency(self, step: Step, value: float) -> None:
+        self.rf_generator.set_frequency(float(value)).result()
+
+    def _do_rf_autotune(self, step: Step, narrow: bool = False) -> None:
+        if narrow:
+            self.rf_generator.narrow_auto_tune().result()
+        else:
+            self.rf_generator.auto_tune().result()
+
+    ##### HVPS #####
+
+    def _do_hv_enable(self, step: Step) -> str:
+        return self.hvps.enable_high_voltage()
+
+    def _do_hv_disable(self, step: Step) -> str:
+        return self.hvps.disable_high_voltage()
+
+    def _do_hv_voltage(self, step: Step, channel: str, value: float) -> str:
+        return self.hvps.set_voltage(channel, f'{round(value):d}')
+
+    def _do_hv_ramp(self, step: Step, **params: Any) -> dict[str, Any]:
+        ramp = HVPSRamp(self.hvps, **params)
+        future = ramp.start()
+        while not future.done():
+            if self._stop_event.wait(0.05):
+                ramp.abort()  # the ramp stops after the step in progress
+                break
+        result = future.result()
+        if not result.completed:
+            raise RuntimeError(result.reason)
+        return {
+            'steps': result.steps,
+            'duration': result.duration,
+            'voltages': {c: r.voltage for c, r in result.readings.items()},
+        }
+
+    def _do_solenoid_enable(self, step: Step) -> str:
+        return self.hvps.enable_solenoid_current()
+
+    def _do_solenoid_disable(self, step: Step) -> str:
+        return self.hvps.disable_solenoid_current()
+
+    def _do_solenoid_current(self, step: Step, value: float) -> str | None:
+        return self.hvps.set_solenoid_current(str(value))
+
+    def _do_wobble(self, step: Step, channel: str, amplitude: int) -> str | None:
+        if int(amplitude) == 0:
+            return self.hvps.disable_wobble(channel)
+        return self.hvps.enable_wobble(channel, str(int(amplitude)))
+
+    ##### Timing and measurement #####
+
+    def _do_wait(self, step: Step, seconds: float) -> None:
+        self._sleep(seconds, step)
+
+    def _do_wait_until(
+        self,
+        step: Step,
+        signal: str,
+        timeout: float,
+        minimum: float = -math.inf,
+        maximum: float = math.inf,
+        hold: float = 0.0,
+        interval: float = 0.1,
+    ) -> float:
+        """
+        Polls `signal` until it has stayed within [minimum, maximum] for `hold`
+        seconds.
+        Returns the seconds it took, measured to the start of the held stretch.
+        """
+        start = time.monotonic()
+        timer = DeadlineTimer(interval)
+        timer.start(start)
+        held_since: float | None = None
+        while timer.wait(self._stop_event):
+            now = time.monotonic()
+            value = self._read_signals([signal])[signal]
+            if minimum <= value <= maximum:
+                held_since = now if held_since is None else held_since
+                if now - held_since >= hold:
+                    return held_since - start
+            else:
+                held_since = None
+            if now - start >= timeout:
+                raise TimeoutError(
+                    f'{signal} = {value} not within [{minimum}, {maximum}] for {hold} s '
+                    f'after {timeout} s'
+                )
+        raise SequenceAborted('Sequence aborted')
+
+    def _do_measure(
+        self, step: Step, signals: list[str], duration: float, interval: float = 1.0
+    ) -> dict[str, dict[str, float]]:
+        """Samples the signals every `interval` seconds and returns their statistics"""
+        samples: dict[str, list[float]] = {signal: [] for signal in signals}
+        start = time.monotonic()
+        timer = DeadlineTimer(interval)
+        timer.start(start)
+        while time.monotonic() - start < duration:
+            if not timer.wait(self._stop_event):
+                raise SequenceAborted('Sequence aborted')
+            for signal, value in self._read_signals(signals).items():
+                samples[signal].append(value)
+        return {
+            signal: {
+                'count': len(values),
+                'mean': sum(values) / len(values) if values else math.nan,
+                'min': min(values, default=math.nan),
+                'max': max(values, default=math.nan),
+            }
+            for signal, values in samples.items()
+        }
+
+
+def write_results(result: SequenceResult, path: str | Path) -> None:
+    with open(path, 'w') as f:
+        json.dump(dataclasses.asdict(result), f, indent=2)
+
+
+def main() -> None:
+    from .device_cache import DEFAULT_CACHE_FILE, DeviceCache
+    from .ini_reader import (
+        find_cache_file,
+        find_comport_device,
+        find_IP_device,
+        load_config,
+    )
+
+    parser = argparse.ArgumentParser(description='Run a test stand sequence script')
+    parser.add_argument('script', help='JSON sequence script')
+    parser.add_argument('--config', default='hyperionTestStandControl.ini')
+    parser.add_argument('--output', help='write the step results to this JSON file')
+    args = parser.parse_args()
+
+    sequence = load_sequence(args.script)
+    config_data = load_config(args.config)
+    rfg = None
+    hvps = None
+    try:
+        if 'rf' in sequence.devices:
+            rf_device, com_port = find_comport_device(config_data, 'RFGenerator')
+            cache = DeviceCache(
+                find_cache_file(config_data, 'Cache') or DEFAULT_CACHE_FILE
+            )
+            rfg = RFGenerator(f'ASRL{com_port}::INSTR', rf_device, cache=cache)
+        if 'hvps' in sequence.devices:
+            _, ip, port = find_IP_device(config_data, 'HVPS')
+            hvps = HVPSv3(ip, port)
+            hvps.connect()
+            if hvps.sock is None:
+                raise ConnectionError(f'Could not connect to HVPS at {ip}:{port}')
+
+        def report(result: StepResult) -> None:
+            status = 'ok' if result.ok else f'FAILED {result.error}'
+            print(
+                f'{result.started:9.3f} s  {result.index:>6} {result.label}: {status}'
+            )
+
+        result = SequenceRunner(rfg, hvps).run(sequence, on_step=report)
+        print(
+            f'{sequence.name}: {"completed" if result.completed else "FAILED"} in {result.duration:.1f} s'
+        )
+        if args.output:
+            write_results(result, args.output)
+    finally:
+        if rfg is not None:
+            rfg.close()
+        if hvps is not None:
+            hvps.disconnect()
+
+
+if __name__ == '__main__':
+    main()
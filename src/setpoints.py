@@ -0,0 +1,190 @@
+import threading
+from collections.abc import Callable, Hashable
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from typing import Any
+
+from .command_dispatcher import CommandDispatcher, Priority
+from .hvps.hvps_api import HVPSv3
+from .instrumentation import METRICS
+from .rf.rfgenerator_control import RFGenerator
+
+
+@dataclass(slots=True)
+class _Setpoint:
+    confirmed: Any = None  # last value the device acknowledged, None if unknown
+    in_flight: bool = False
+    sending: Any = None  # value of the write in flight
+    sending_waiters: list[Future] = field(default_factory=list)
+    pending: tuple[Any, Callable[[], Future]] | None = None  # (value, send)
+    pending_waiters: list[Future] = field(default_factory=list)
+
+
+class SetpointWriter:
+    """
+    Write-behind cache of device set points, at most one write in flight per key.
+
+    - A write of the value the device last confirmed is dropped.
+    - A write made while another to the same key is in flight is held back. Only
+      the newest held value is sent once the write in flight completes; the values
+      it replaced are never sent.
+    - Every caller gets a Future that completes when its value, or the newer value
+      that replaced it, has been written.
+
+    A failed write forgets the confirmed value, so the next write is always sent.
+    Call `invalidate` when a set point may have changed behind the writer's back,
+    e.g. after an autotune or a reconnect.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._setpoints: dict[Hashable, _Setpoint] = {}
+        self._lock = threading.Lock()
+
+    def write(self, key: Hashable, value: Any, send: Callable[[], Future]) -> Future:
+        """
+        Writes `value` to `key`. `send` starts the device write and returns its
+        Future; it is only called if the value actually has to go out.
+        """
+        future: Future = Future()
+        with self._lock:
+            setpoint = self._setpoints.setdefault(key, _Setpoint())
+            if setpoint.in_flight:
+                if setpoint.pending is None and value == setpoint.sending:
+                    # Same value as the write in flight: wait for that one
+                    METRICS.increment(f'{self.name}.suppressed')
+                    setpoint.sending_waiters.append(future)
+                else:
+                    if setpoint.pending is not None:
+                        METRICS.increment(f'{self.name}.coalesced')
+                    setpoint.pending = (value, send)
+                    setpoint.pending_waiters.append(future)
+                return future
+
+            if value == setpoint.confirmed:
+                METRICS.increment(f'{self.name}.suppressed')
+                future.set_result(None)
+                return future
+            setpoint.in_flight = True
+            setpoint.sending = value
+            setpoint.sending_waiters.append(future)
+
+        self._send(key, send)
+        return future
+
+    def confirmed(self, key: Hashable) -> Any:
+        """Returns the last value the device acknowledged for `key`, or None"""
+        with self._lock:
+            setpoint = self._setpoints.get(key)
+            return setpoint.confirmed if setpoint is not None else None
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """Forgets the confirmed value of `key`, or of every key"""
+        with self._lock:
+            for k, setpoint in self._setpoints.items():
+                if key is None or k == key:
+                    setpoint.confirmed = None
+
+    def _send(self, key: Hashable, send: Callable[[], Future]) -> None:
+        try:
+            write = send()
+        except Exception as e:  # noqa: BLE001 - handed to the waiters' Futures
+            write = Future()
+            write.set_exception(e)
+        write.add_done_callback(lambda f: self._on_done(key, f))
+
+    def _on_done(self, key: Hashable, write: Future) -> None:
+        if write.cancelled():
+            error: BaseException | None = RuntimeError('set point write cancelled')
+        else:
+            error = write.exception()
+        result = write.result() if error is None else None
+        next_send: Callable[[], Future] | None = None
+        superseded: list[Future] = []
+
+        with self._lock:
+            setpoint = self._setpoints[key]
+            waiters, setpoint.sending_waiters = setpoint.sending_waiters, []
+            setpoint.confirmed = setpoint.sending if error is None else None
+            setpoint.in_flight = False
+            setpoint.sending = None
+
+            if setpoint.pending is not None:
+                value, send = setpoint.pending
+                setpoint.pending = None
+                if value == setpoint.confirmed:
+                    METRICS.increment(f'{self.name}.suppressed')
+                    superseded = setpoint.pending_waiters
+                else:
+                    setpoint.in_flight = True
+                    setpoint.sending = value
+                    setpoint.sending_waiters = setpoint.pending_waiters
+                    next_send = send
+                setpoint.pending_waiters = []
+
+        # Complete the Futures outside the lock, their callbacks may write again
+        for future in waiters:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        for future in superseded:
+            future.set_result(result)
+        if next_send is not None:
+            self._send(key, next_send)
+
+
+class RFSetpoints:
+    """Coalescing front end for the power and frequency set points of an RFGenerator"""
+
+    def __init__(self, rf_generator: RFGenerator) -> None:
+        self.rf_generator = rf_generator
+        self.writer = SetpointWriter('RFSetpoints')
+
+    def set_power(self, power: int) -> 'Future[None]':
+        return self.writer.write(
+            'power', power, lambda: self.rf_generator.set_power(power)
+        )
+
+    def set_frequency(self, freq: float) -> 'Future[None]':
+        return self.writer.write(
+            'frequency', freq, lambda: self.rf_generator.set_frequency(freq)
+        )
+
+    def frequency_changed(self) -> None:
+        """Call after anything else moved the frequency, such as an autotune"""
+        self.writer.invalidate('frequency')
+
+
+class HVPSSetpoints:
+    """
+    Coalescing front end for the channel voltages and solenoid current of an
+    HVPSv3. Writes run on a command dispatcher so callers never block on the socket.
+    """
+
+    def __init__(self, hvps: HVPSv3, executor: Executor | None = None) -> None:
+        self.hvps = hvps
+        self.writer = SetpointWriter('HVPSSetpoints')
+        self.dispatcher = CommandDispatcher('HVPSSetpoints', executor)
+
+    def set_voltage(self, channel: str, voltage: str) -> 'Future[str]':
+        self.hvps.voltage_command(channel, voltage)  # validate now, not on the worker
+        return self.writer.write(
+            ('voltage', channel),
+            float(voltage),
+            lambda: self.dispatcher.submit(
+                self.hvps.set_voltage, channel, voltage, priority=Priority.CONTROL
+            ),
+        )
+
+    def set_solenoid_current(self, current: str) -> 'Future[str | None]':
+        return self.writer.write(
+            'solenoid_current',
+            round(float(current), 2),  # the command carries two decimals
+            lambda: self.dispatcher.submit(
+                self.hvps.set_solenoid_current, current, priority=Priority.CONTROL
+            ),
+        )
+
+    def close(self) -> None:
+        self.dispatcher.shutdown()
@@ -0,0 +1,183 @@
+import argparse
+import random
+import re
+import socketserver
+import threading
+import time
+
+CHANNELS = ('BM', 'EX', 'L1', 'L2', 'L3', 'L4', 'SL')
+
+_SET_VOLTAGE = re.compile(r'ST(BM|EX|L[1-4])T([+-])(\d{5})')
+_SET_SOLENOID = re.compile(r'STSLT00(\d\.\d\d)')
+_READ = re.compile(r'RD(BM|EX|L[1-4]|SL)([VC])')
+_WOBBLE_ON = re.compile(r'ST(EX|L[1-4])WE1A(\d{3})')
+_WOBBLE_OFF = re.compile(r'ST(EX|L[1-4])WEA0000')
+
+
+class SimulatedHVPS:
+    """
+    Model of an HVPSv3 answering the same newline-terminated commands.
+
+    Set commands are answered with NAK0, malformed commands with NAK1 and out of
+    range values with NAK2. Output voltages slew towards their set points at
+    `slew_rate` V/s while high voltage is enabled and readings carry Gaussian `noise`.
+    """
+
+    def __init__(
+        self,
+        occupied_channels: tuple[str, ...] = CHANNELS,
+        latency: float = 0.001,
+        noise: float = 0.001,
+        slew_rate: float = 500.0,
+        max_voltage: float = 10000.0,
+        seed: int | None = None,
+    ) -> None:
+        self.occupied_channels = occupied_channels
+        self.latency = latency
+        self.noise = noise
+        self.slew_rate = slew_rate
+        self.max_voltage = max_voltage
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.hv_enabled = False
+        self.solenoid_enabled = False
+        self.solenoid_current = 0.0
+        self.setpoints = {ch: 0.0 for ch in occupied_channels if ch != 'SL'}
+        self.wobble = {ch: 0 for ch in occupied_channels if ch not in ('BM', 'SL')}
+        self._outputs = dict.fromkeys(self.setpoints, 0.0)
+        self._updated = time.monotonic()
+        self.leakage = 1e-8  # output current in A per V
+
+    def _update_outputs(self) -> None:
+        now = time.monotonic()
+        step = self.slew_rate * (now - self._updated)
+        self._updated = now
+        for channel, output in self._outputs.items():
+            target = self.setpoints[channel] if self.hv_enabled else 0.0
+            delta = max(-step, min(step, target - output))
+            self._outputs[channel] = output + delta
+
+    def _noisy(self, value: float) -> float:
+        return value + abs(value) * self._random.gauss(0, self.noise)
+
+    def handle(self, command: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._update_outputs()
+            return self._handle(command)
+
+    def _handle(self, command: str) -> str:
+        if match := _READ.fullmatch(command):
+            channel, quantity = match.groups()
+            if channel not in self.occupied_channels:
+                return 'NAK2'
+            if channel == 'SL':
+                current = self.solenoid_current if self.solenoid_enabled else 0.0
+                if quantity == 'C':
+                    return f'{self._noisy(current):.3f}'
+                return f'{self._noisy(current * 8.0):.2f}'  # coil resistance
+            voltage = self._outputs[channel]
+            if quantity == 'V':
+                return f'{self._noisy(voltage):+.1f}'
+            return f'{self._noisy(abs(voltage) * self.leakage) * 1e6:.2f}'  # uA
+
+        if match := _SET_VOLTAGE.fullmatch(command):
+            channel, sign, digits = match.groups()
+            if channel not in self.setpoints or float(digits) > self.max_voltage:
+                return 'NAK2'
+            self.setpoints[channel] = float(f'{sign}{digits}')
+            return 'NAK0'
+
+        if match := _SET_SOLENOID.fullmatch(command):
+            current = float(match.group(1))
+            if 'SL' not in self.occupied_channels or current > 3.0:
+                return 'NAK2'
+            self.solenoid_current = current
+            return 'NAK0'
+
+        if match := _WOBBLE_ON.fullmatch(command):
+            channel, amplitude = match.groups()
+            if channel not in self.wobble:
+                return 'NAK2'
+            self.wobble[channel] = int(amplitude)
+            return 'NAK0'
+
+        if match := _WOBBLE_OFF.fullmatch(command):
+            if match.group(1) not in self.wobble:
+                return 'NAK2'
+            self.wobble[match.group(1)] = 0
+            return 'NAK0'
+
+        if command in ('STHV1', 'STHV0'):
+            self.hv_enabled = command == 'STHV1'
+            return 'NAK0'
+        if command in ('STSL1', 'STSL0'):
+            self.solenoid_enabled = command == 'STSL1'
+            return 'NAK0'
+        if command == 'RDSTA':
+            return f'HV{int(self.hv_enabled)}SL{int(self.solenoid_enabled)}'
+        return 'NAK1'
+
+
+class _HVPSRequestHandler(socketserver.StreamRequestHandler):
+    server: 'SimulatedHVPSServer'
+    disable_nagle_algorithm = True  # send each response as soon as it is written
+
+    def handle(self) -> None:
+        for raw in self.rfile:
+            command = raw.decode(errors='replace').strip()
+            if not command:
+                continue
+            if command == 'DSCON':
+                break
+            response = self.server.device.handle(command)
+            self.wfile.write(f'{response}\r\n'.encode())
+
+
+class SimulatedHVPSServer(socketserver.ThreadingTCPServer):
+    """
+    Local TCP server speaking the HVPSv3 protocol. Use port 0 to pick a free port
+    and read the chosen one from `port` after construction.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        device: SimulatedHVPS | None = None,
+    ) -> None:
+        super().__init__((host, port), _HVPSRequestHandler)
+        self.device = device if device is not None else SimulatedHVPS()
+        self.host, self.port = self.server_address[:2]
+        self.thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Serves from a background thread"""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulated HVPSv3 TCP server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=49076)
+    parser.add_argument('--latency', type=float, default=0.001, help='seconds')
+    parser.add_argument('--noise', type=float, default=0.001, help='fraction')
+    args = parser.parse_args()
+
+    device = SimulatedHVPS(latency=args.latency, noise=args.noise)
+    with SimulatedHVPSServer(args.host, args.port, device) as server:
+        print(f'Simulated HVPS listening on {server.host}:{server.port}')
+        server.serve_forever()
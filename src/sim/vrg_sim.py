@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+from collections import deque
+
+
+class SimulatedVRGResource:
+    """
+    Stand-in for the pyvisa serial resource of a VRG RF generator.
+
+    Implements the subset of `MessageBasedResource` used by `VRG` and answers the
+    RQ/RO/RF/RR/RB/R1/R2/RI/ER/DR/PM/SP/SF/TW/TT commands. A response is ready
+    `latency` seconds after its command was written, then takes its transmission
+    time at `baud` on a line it shares with the other responses. Commands written
+    back-to-back therefore wait out their latencies together, and only the
+    transmissions queue up, like on the real serial line. Power readings follow a
+    simple resonance model with Gaussian `noise` (fraction of the reading).
+    """
+
+    write_termination = '\r\n'
+    read_termination = '\r\n'
+
+    def __init__(
+        self,
+        latency: float = 0.005,
+        noise: float = 0.01,
+        baud: int = 9600,
+        timeout: float = 2.0,
+        resonance_kHz: int | None = None,
+        tune_time: float = 1.5,
+        seed: int | None = None,
+    ) -> None:
+        self.latency = latency
+        self.noise = noise
+        self.baud = baud
+        self.timeout = timeout * 1000  # pyvisa timeouts are in ms
+        self.tune_time = tune_time
+        self._random = random.Random(seed)
+
+        self.serial_number = '607'
+        self.reboots = 171
+        self.min_freq_kHz = 25000
+        self.max_freq_kHz = 42000
+        self.resonance_kHz = (
+            resonance_kHz
+            if resonance_kHz is not None
+            else self._random.randint(39500, 41500)
+        )
+        self.bandwidth_kHz = 250  # detuning that reflects half the power
+
+        self.enabled = False
+        self.power_mode = 0
+        self.power_setting = 800
+        self.freq_kHz = 40650
+        self._tune_from = self.freq_kHz
+        self._tune_to = self.freq_kHz
+        self._tune_start = 0.0
+
+        self._responses: deque[tuple[float, str]] = deque()
+        self._last_ready = 0.0
+        self._lock = threading.Lock()
+        self._readable = threading.Condition(self._lock)
+
+    ###########################################################################
+    ############################ resource interface ###########################
+    ###########################################################################
+
+    def write(self, message: str) -> int:
+        self.write_raw(f'{message}{self.write_termination}'.encode())
+        return len(message)
+
+    def write_raw(self, message: bytes) -> int:
+        now = time.monotonic()
+        with self._lock:
+            for line in message.decode().replace('\r', '\n').split('\n'):
+                command = line.strip()
+                if not command:
+                    continue
+                response = self._handle(command)
+                if response is None:
+                    continue
+                response += self.read_termination
+                transmit = 10 * len(response) / self.baud  # 8N1 is 10 bits a byte
+                ready = max(now + self.latency, self._last_ready) + transmit
+                self._last_ready = ready
+                self._responses.append((ready, response))
+            self._readable.notify_all()
+        return len(message)
+
+    def read(self) -> str:
+        deadline = time.monotonic() + self.timeout / 1000
+        with self._lock:
+            while not self._responses:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    from pyvisa import constants
+                    from pyvisa.errors import VisaIOError
+
+                    raise VisaIOError(constants.StatusCode.error_timeout)
+                self._readable.wait(remaining)
+            ready, response = self._responses.popleft()
+        delay = ready - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return response
+
+    def query(self, message: str) -> str:
+        self.write(message)
+        return self.read()
+
+    def close(self) -> None:
+        with self._lock:
+            self._responses.clear()
+
+    ###########################################################################
+    ############################# device model ################################
+    ###########################################################################
+
+    def _frequency_kHz(self) -> float:
+        elapsed = time.monotonic() - self._tune_start
+        if elapsed >= self.tune_time:
+            return self._tune_to
+        # Tuning sweeps linearly from the old to the new frequency.
+        return self._tune_from + (self._tune_to - self._tune_from) * (
+            elapsed / self.tune_time
+        )
+
+    def _start_tune(self, target_kHz: float) -> None:
+        self._tune_from = self._frequency_kHz()
+        self._tune_to = target_kHz
+        self._tune_start = time.monotonic()
+
+    def _noisy(self, value: float) -> float:
+        return max(0.0, value * (1 + self._random.gauss(0, self.noise)))
+
+    def _powers(self) -> tuple[float, float, float]:
+        """Forward, reflected and absorbed power in watts"""
+        if not self.enabled:
+            return 0.0, 0.0, 0.1
+        detuning = (self._frequency_kHz() - self.resonance_kHz) / self.bandwidth_kHz
+        reflected_fraction = detuning**2 / (1 + detuning**2)
+        if self.power_mode == 0:
+            forward = float(self.power_setting)
+        else:  # absorbed power mode raises forward power to make up the reflection
+            forward = min(1000.0, self.power_setting / (1 - reflected_fraction))
+        forward = self._noisy(forward)
+        reflected = self._noisy(forward * reflected_fraction)
+        return forward, reflected, max(0.0, forward - reflected)
+
+    def _handle(self, command: str) -> str | None:
+        code, argument = command[:2], command[2:]
+
+        if command == '!':
+            return '!'
+        if code == 'RQ':
+            return f'RQ{round(self._frequency_kHz()):05d}'
+        if code == 'RO':
+            return f'RO{self.power_setting:04d}'
+        if code == 'R1':
+            return f'R1{self.min_freq_kHz:05d}'
+        if code == 'R2':
+            return f'R2{self.max_freq_kHz:05d}'
+        if code in ('RF', 'RR', 'RB'):
+            forward, reflected, absorbed = self._powers()
+            if code == 'RF':
+                return f'RF{round(forward):04d}'
+            if code == 'RR':
+                return f'RR{round(reflected):04d}'
+            return f'RB{absorbed:06.1f}'
+        if code == 'RI':
+            hours = 22426
+            return f'RI{self.serial_number} {self.reboots:05d} {hours:06d} 017180 00000 00000'
+        if code == 'ER':
+            self.enabled = True
+        elif code == 'DR':
+            self.enabled = False
+        elif code == 'PM' and argument in ('0', '1'):
+            self.power_mode = int(argument)
+        elif code == 'SP' and argument.isdigit():
+            self.power_setting = min(int(argument), 1000)
+        elif code == 'SF' and argument.isdigit():
+            freq = min(max(int(argument), self.min_freq_kHz), self.max_freq_kHz)
+            self._start_tune(freq)
+            self._tune_start -= self.tune_time  # set points apply immediately
+        elif code == 'TW':
+            self._start_tune(self.resonance_kHz)
+        elif code == 'TT':
+            # Narrow tune only finds the resonance if it is within 1 MHz.
+            if abs(self._frequency_kHz() - self.resonance_kHz) <= 1000:
+                self._start_tune(self.resonance_kHz)
+            return None  # VRG.narrow_autotune does not read a response
+        else:
+            return '?'
+        return command  # set commands are acknowledged with an echo
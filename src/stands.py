@@ -0,0 +1,244 @@
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from .command_dispatcher import CommandDispatcher
+from .deadline_timer import DeadlineTimer
+from .device_cache import DeviceCache
+from .hvps.hvps_api import ChannelReading, HVPSv3, parse_all_channels
+from .hvps.hvps_codec import COMMANDS
+from .ini_reader import ConfigData, find_comport_device, find_IP_device, find_stands
+from .rf.rfgenerator_control import RFGenerator
+
+if TYPE_CHECKING:
+    from .rf.vrg_api import Telemetry
+
+
+@dataclass(slots=True)
+class StandStatus:
+    """Latest state of one stand. Fields are replaced, never changed in place."""
+
+    name: str
+    rf: str = 'not configured'  # connection state of the RF generator
+    hvps: str = 'not configured'  # connection state of the HVPS
+    telemetry: 'Telemetry | None' = None
+    hv_channels: dict[str, ChannelReading] | None = None
+    hv_state: str | None = None  # e.g. "HV1SL0"
+    rf_error: str | None = None  # why the latest RF poll failed, None if it worked
+    hvps_error: str | None = None  # why the latest HVPS poll failed
+    updated: float = 0.0  # seconds since the epoch of the newest reading
+    skipped_polls: int = 0  # polls skipped because the previous one was unanswered
+
+
+class Stand:
+    """
+    The RF generator and HVPS of one test stand.
+
+    Connecting and polling only ever submit work to the executor shared by all
+    stands, so a stand costs no threads of its own. Each device still runs one
+    command at a time through its command dispatcher.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        config_data: ConfigData,
+        sections: dict[str, str],
+        executor: ThreadPoolExecutor,
+        cache: DeviceCache | None = None,
+    ) -> None:
+        self.name = name
+        self.config_data = config_data
+        self.sections = sections
+        self.executor = executor
+        self.cache = cache
+        self.status = StandStatus(name)
+        self.rf_generator: RFGenerator | None = None
+        self.hvps: HVPSv3 | None = None
+        self.hvps_dispatcher: CommandDispatcher | None = None
+        self._polls: dict[str, Future] = {}  # device -> poll in flight
+        self._closed = False
+
+    def connect(self) -> None:
+        """Starts connecting every configured device on the shared executor"""
+        if 'RFGenerator' in self.sections:
+            self._connect('rf', self._connect_rf)
+        if 'HVPS' in self.sections:
+            self._connect('hvps', self._connect_hvps)
+
+    def _connect(self, device: str, connect: Callable[[], None]) -> None:
+        def run() -> None:
+            try:
+                connect()
+            except Exception as e:  # noqa: BLE001 - shown in the stand's status
+                print(f'Stand {self.name}: {device} connection failed: {e}')
+                setattr(self.status, device, f'failed: {e}')
+            else:
+                setattr(self.status, device, 'connected')
+
+        setattr(self.status, device, 'connecting')
+        self.executor.submit(run)
+
+    def _connect_rf(self) -> None:
+        rf_device, com_port = find_comport_device(
+            self.config_data, self.sections['RFGenerator']
+        )
+        rf_generator = RFGenerator(
+            f'ASRL{com_port}::INSTR',
+            rf_device,
+            executor=self.executor,
+            cache=self.cache,
+        )
+        if self._closed:
+            # Closed while connecting, the shared executor may already be gone
+            rf_generator.dispatcher.shutdown()
+            rf_generator.rf_device.close()
+            return
+        self.rf_generator = rf_generator
+
+    def _connect_hvps(self) -> None:
+        _, ip, port = find_IP_device(self.config_data, self.sections['HVPS'])
+        hvps = HVPSv3(ip, port)
+        hvps.connect()
+        if hvps.sock is None:
+            raise ConnectionError(f'Could not connect to HVPS at {ip}:{port}')
+        if self._closed:
+            hvps.disconnect()
+            return
+        self.hvps_dispatcher = CommandDispatcher(f'HVPS {self.name}', self.executor)
+        self.hvps = hvps
+
+    def poll(self) -> None:
+        """
+        Queues one reading of every connected device without waiting for it. A
+        device whose previous reading has not come back yet is skipped, so a slow
+        or hung device never builds up a backlog.
+        """
+        if self.rf_generator is not None:
+            self._poll(
+                'rf', self.rf_generator.dispatcher, self._read_rf, self._on_telemetry
+            )
+        if self.hvps is not None:
+            self._poll('hvps', self.hvps_dispatcher, self._read_hvps, self._on_hvps)
+
+    def _poll(
+        self,
+        device: str,
+        dispatcher: CommandDispatcher,
+        read: Callable,
+        on_done: Callable[[Future], None],
+    ) -> None:
+        previous = self._polls.get(device)
+        if previous is not None and not previous.done():
+            self.status.skipped_polls += 1
+            return
+        try:
+            self._polls[device] = future = dispatcher.submit(read)
+        except RuntimeError:
+            return  # shut down
+        future.add_done_callback(on_done)
+
+    def _read_rf(self) -> 'Telemetry':
+        # A unit that does not answer at all is an error, not a row of zeros
+        return self.rf_generator.rf_device.read_telemetry(raise_on_timeout=True)
+
+    def _read_hvps(self) -> tuple[dict[str, ChannelReading], str]:
+        # Channel readbacks and the enable state in one pipelined exchange
+        commands = self.hvps.all_channels_readback_commands()
+        commands.append(COMMANDS['read_state'].template)
+        responses = self.hvps.send_queries(commands)
+        channels = parse_all_channels(
+            self.hvps.occupied_channels, commands[:-1], responses[:-1]
+        )
+        return channels, responses[-1]
+
+    def _on_telemetry(self, future: Future) -> None:
+        if self._poll_failed('rf', future):
+            return
+        self.status.telemetry = future.result()
+        self.status.updated = time.time()
+
+    def _on_hvps(self, future: Future) -> None:
+        if self._poll_failed('hvps', future):
+            return
+        self.status.hv_channels, self.status.hv_state = future.result()
+        self.status.updated = time.time()
+
+    def _poll_failed(self, device: str, future: Future) -> bool:
+        # Records the error of a failed poll, or clears it once a poll works
+        if future.cancelled():
+            message = 'poll cancelled'
+        elif (error := future.exception()) is not None:
+            message = str(error) or type(error).__name__
+        else:
+            message = None
+        if message is not None and message != getattr(self.status, f'{device}_error'):
+            print(f'Stand {self.name}: {device} poll failed: {message}')
+        setattr(self.status, f'{device}_error', message)
+        return message is not None
+
+    def close(self) -> None:
+        self._closed = True
+        if self.rf_generator is not None:
+            self.rf_generator.close()
+        if self.hvps_dispatcher is not None:
+            self.hvps_dispatcher.shutdown()
+        if self.hvps is not None:
+            self.hvps.disconnect()
+
+
+class StandManager:
+    """
+    Every test stand defined in the ini file, polled from one scheduler thread and
+    served by one bounded pool of I/O workers shared by all devices. The number of
+    threads stays the same however many stands there are.
+    """
+
+    def __init__(
+        self,
+        config_data: ConfigData,
+        poll_interval: float = 1.0,
+        max_workers: int = 4,
+        cache: DeviceCache | None = None,
+    ) -> None:
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='Stands')
+        self.stands = {
+            name: Stand(name, config_data, sections, self.executor, cache)
+            for name, sections in find_stands(config_data).items()
+        }
+        self.timer = DeadlineTimer(poll_interval)
+        self.running = False
+        self.thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+
+    def start(self) -> None:
+        """Connects every stand in the background and starts polling"""
+        if self.running:
+            return
+        for stand in self.stands.values():
+            stand.connect()
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='StandManager')
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        self._stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        for stand in self.stands.values():
+            stand.close()
+        self.executor.shutdown(wait=True)
+
+    def _run(self) -> None:
+        self.timer.start()
+        while self.running:
+            if not self.timer.wait(self._stop_event):
+                break
+            for stand in self.stands.values():
+                stand.poll()
@@ -0,0 +1,80 @@
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+from src.acquisition_process import AcquisitionProcess
+from src.instrumentation import METRICS
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Runs in its own interpreter, so a crash while the shared memory is torn down
+# shows in the exit status instead of taking the test run with it
+SCRIPT = textwrap.dedent(
+    """
+    import time
+
+    from src.acquisition_process import AcquisitionProcess
+
+    if __name__ == '__main__':
+        process = AcquisitionProcess(
+            'SIM::VRG', 'VRGSim', rf_interval=0.05, capacity=100, quiet=True
+        )
+        process.start()
+        deadline = time.monotonic() + 10
+        while len(process.history) < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert len(process.history) >= 3, 'no samples from the worker'
+        held = process.history.since(0)  # still referenced at stop
+        process.stop()
+        try:
+            held['timestamp'][0]
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('view outlived the shared memory')
+    """
+)
+
+
+def test_start_and_stop_exits_cleanly():
+    result = subprocess.run(
+        [sys.executable, '-c', SCRIPT],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=False,
+    )
+    assert result.returncode == 0, result.stderr
+    assert 'leaked shared_memory' not in result.stderr
+    assert 'still in use' not in result.stdout
+
+
+def test_worker_metrics_reach_this_process(tmp_path):
+    cache_file = tmp_path / 'devices.json'
+    METRICS.reset()
+    METRICS.set_enabled(True)
+    process = AcquisitionProcess(
+        'SIM::VRG',
+        'VRGSim',
+        rf_interval=0.05,
+        capacity=100,
+        quiet=True,
+        cache_file=cache_file,
+    )
+    try:
+        process.start()
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            latency = METRICS.snapshot()['latency']
+            if any(name.startswith('worker.') for name in latency):
+                break
+            time.sleep(0.1)
+        assert any(name.startswith('worker.VRG.') for name in latency)
+        assert cache_file.exists()  # the worker stored the generator's identity
+    finally:
+        process.stop()
+        METRICS.set_enabled(False)
+        METRICS.reset()
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from src.hvps.async_hvps_api import AsyncHVPSv3
+from src.sim.hvps_sim import SimulatedHVPS, SimulatedHVPSServer
+
+
+@pytest.fixture
+def server():
+    server = SimulatedHVPSServer(device=SimulatedHVPS(latency=0.0, seed=1))
+    server.start()
+    yield server
+    server.stop()
+
+
+def test_reconnects_after_a_stalled_exchange(server):
+    async def run() -> None:
+        hvps = AsyncHVPSv3(server.host, str(server.port), timeout=0.2)
+        await hvps.connect()
+        assert await hvps.get_state() == 'HV0SL0'
+
+        server.device.latency = 0.5  # the simulator stalls once
+        with pytest.raises(TimeoutError):
+            await hvps.get_state()
+        assert hvps.writer is None
+        server.device.latency = 0.0
+
+        # The late reply to the stalled command must not be taken as this one's
+        assert await hvps.enable_high_voltage() == 'NAK0'
+        assert await hvps.get_state() == 'HV1SL0'
+        await hvps.disconnect()
+
+    asyncio.run(run())
+
+
+def test_disconnect_does_not_reconnect(server):
+    async def run() -> None:
+        hvps = AsyncHVPSv3(server.host, str(server.port), timeout=0.2)
+        await hvps.connect()
+        await hvps.disconnect()
+        with pytest.raises(ConnectionError):
+            await hvps.get_state()
+
+    asyncio.run(run())
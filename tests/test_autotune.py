@@ -0,0 +1,56 @@
+import pytest
+
+from src.rf.autotune import Autotune
+from src.rf.rf_data_acquisition import DataAcquisition
+from src.rf.rfgenerator_control import RFGenerator
+from src.sim.vrg_sim import SimulatedVRGResource
+
+
+@pytest.fixture
+def make_acquisition():
+    started = []
+
+    def make(resonance_kHz: int) -> DataAcquisition:
+        resource = SimulatedVRGResource(
+            latency=0.001,
+            baud=115200,
+            resonance_kHz=resonance_kHz,
+            tune_time=0.5,
+            seed=0,
+        )
+        rfg = RFGenerator('SIM::VRG', 'VRG', instrument=resource)
+        acquisition = DataAcquisition(rfg, interval=0.2)
+        acquisition.start(enable_rf=False)
+        started.append(acquisition)
+        return acquisition
+
+    yield make
+    for acquisition in started:
+        acquisition.stop()
+        acquisition.rf_generator.close()
+
+
+def test_waits_for_the_tune_when_the_frequency_is_already_stable(make_acquisition):
+    # The simulator starts at 40.65 MHz, so a tune to that resonance never moves
+    acquisition = make_acquisition(resonance_kHz=40650)
+    autotune = Autotune(
+        acquisition.rf_generator, acquisition, settle_window=0.2, min_tune_time=0.6
+    )
+    result = autotune.start().result(timeout=5)
+
+    assert result.settled
+    assert result.settle_time >= 0.6
+    assert result.frequency == pytest.approx(40.65)
+    assert acquisition.interval == 0.2
+
+
+def test_settles_after_the_frequency_has_moved(make_acquisition):
+    acquisition = make_acquisition(resonance_kHz=41000)
+    autotune = Autotune(
+        acquisition.rf_generator, acquisition, settle_window=0.2, min_tune_time=5.0
+    )
+    result = autotune.start().result(timeout=5)
+
+    assert result.settled
+    assert 0.4 <= result.settle_time < 5.0  # the 0.5 s sweep, not the dwell
+    assert result.frequency == pytest.approx(41.0)
@@ -0,0 +1,56 @@
+import time
+
+from src.poll_scheduler import PollScheduler
+
+
+def test_signals_due_together_are_read_in_one_group_read():
+    reads: list[list[str]] = []
+    rounds: list[dict] = []
+
+    def read(names: list[str]) -> dict[str, float]:
+        reads.append(names)
+        return {name: 1.0 for name in names if name != 'missing'}
+
+    scheduler = PollScheduler()
+    scheduler.add_group('device', read)
+    scheduler.add_signal('fast', None, 20, priority=1, group='device')
+    scheduler.add_signal('slow', None, 5, group='device')
+    scheduler.add_signal('missing', None, 5, group='device')
+    scheduler.add_group_listener(lambda group, timestamp, values: rounds.append(values))
+    scheduler.start()
+    time.sleep(0.52)
+    scheduler.stop()
+
+    # Every slow deadline is also a fast one, so no read is for the slow ones alone
+    assert ['fast', 'slow', 'missing'] in reads
+    assert all('fast' in names for names in reads)
+    assert len(rounds) == len(reads)
+    stats = scheduler.stats()
+    assert stats['fast']['reads'] >= 10
+    assert stats['missing']['reads'] == 0
+    assert stats['missing']['errors'] == stats['slow']['reads']
+
+
+def test_set_rate_and_remove_signal():
+    counts = {'a': 0, 'b': 0}
+
+    def counter(name: str):
+        def read() -> None:
+            counts[name] += 1
+
+        return read
+
+    scheduler = PollScheduler()
+    scheduler.add_signal('a', counter('a'), 1)
+    scheduler.add_signal('b', counter('b'), 50)
+    scheduler.start()
+    scheduler.set_rate('a', 50)
+    time.sleep(0.3)
+    scheduler.remove_signal('b')
+    removed_at = counts['b']
+    time.sleep(0.1)
+    scheduler.stop()
+
+    assert counts['a'] >= 10  # the faster rate took effect without waiting 1 s
+    assert counts['b'] <= removed_at + 1  # at most a read already under way
+    assert 'b' not in scheduler.stats()